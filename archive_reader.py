@@ -0,0 +1,372 @@
+# archive_reader.py
+"""
+Acesso aos arquivos zip do GDELT, compartilhado pelos três loaders.
+
+Os zips podem ter dois layouts:
+
+    flat   -> o CSV está direto no zip (caso normal do GDELT 2.0)
+    nested -> o zip contém outro zip, que contém o CSV
+
+Os CSVs são entregues como streams binários descomprimidos sob demanda, então
+o pandas lê direto do zip sem cópias intermediárias (nada de
+io.BytesIO(inner.read())). A origem pode ser:
+
+    - um caminho no disco ou um arquivo seekable (ex.: BytesIO): usa zipfile,
+      com acesso pelo diretório central;
+    - um stream não seekable (ex.: resposta HTTP com stream=True): os membros
+      são lidos em sequência pelos cabeçalhos locais, sem bufferizar o zip.
+
+Um zip aninhado é sempre lido em sequência a partir do membro externo; se ele
+estiver armazenado sem compressão (STORED) em um arquivo seekable, é aberto
+diretamente no trecho correspondente do arquivo externo.
+
+Uso:
+    with archive_reader.open_archive(file_content) as archive:
+        for name, f in archive.iter_csv():
+            df = pd.read_csv(f, ...)
+"""
+import io
+import logging
+import os
+import struct
+import zipfile
+import zlib
+
+_CHUNK = 64 * 1024
+
+_LOCAL_HEADER = struct.Struct("<4sHHHHHIIIHH")
+_LOCAL_SIGNATURE = b"PK\x03\x04"
+_DESCRIPTOR_SIGNATURE = b"PK\x07\x08"
+_ZIP64_EXTRA = 0x0001
+_FLAG_ENCRYPTED = 0x1
+_FLAG_DESCRIPTOR = 0x8
+_FLAG_UTF8 = 0x800
+
+FLAT = "flat"
+NESTED = "nested"
+
+
+def _is_csv(name):
+    return name.lower().endswith(".csv")
+
+
+def _is_zip(name):
+    return name.lower().endswith(".zip")
+
+
+# --- Leitura sequencial (streams não seekable) ---
+class _PushbackReader:
+    """Leitor sequencial que permite devolver bytes lidos a mais."""
+
+    def __init__(self, raw):
+        self._raw = raw
+        self._pending = b""
+
+    def read(self, size):
+        if self._pending:
+            data, self._pending = self._pending[:size], self._pending[size:]
+            return data
+        return self._raw.read(size)
+
+    def read_exact(self, size):
+        data = b""
+        while len(data) < size:
+            part = self.read(size - len(data))
+            if not part:
+                break
+            data += part
+        return data
+
+    def unread(self, data):
+        self._pending = data + self._pending
+
+
+class _StreamMember(io.RawIOBase):
+    """Conteúdo de um membro do zip, descomprimido à medida que é lido."""
+
+    def __init__(self, reader, name, method, crc, compressed_size, has_descriptor, zip64):
+        super().__init__()
+        if method == zipfile.ZIP_DEFLATED:
+            self._decompressor = zlib.decompressobj(-15)
+        elif method == zipfile.ZIP_STORED:
+            if has_descriptor and not compressed_size:
+                raise zipfile.BadZipFile(f"Membro '{name}' sem compressão e sem tamanho no cabeçalho local")
+            self._decompressor = None
+        else:
+            raise zipfile.BadZipFile(f"Método de compressão {method} não suportado no membro '{name}'")
+        self.name = name
+        self._reader = reader
+        self._crc_expected = crc
+        # Com data descriptor o tamanho no cabeçalho local costuma ser 0 (desconhecido)
+        self._remaining = compressed_size if compressed_size or not has_descriptor else None
+        self._has_descriptor = has_descriptor
+        self._zip64 = zip64
+        self._buffer = b""
+        self._crc = 0
+        self._done = False
+
+    def readable(self):
+        return True
+
+    def _fill(self):
+        if self._decompressor is None:
+            data = self._reader.read(min(_CHUNK, self._remaining)) if self._remaining else b""
+            if self._remaining and not data:
+                raise zipfile.BadZipFile(f"Membro '{self.name}' truncado")
+            self._remaining -= len(data)
+            out = data
+            finished = self._remaining == 0
+        else:
+            data = self._decompressor.unconsumed_tail
+            if not data:
+                size = _CHUNK if self._remaining is None else min(_CHUNK, self._remaining)
+                data = self._reader.read(size) if size else b""
+                if self._remaining is not None:
+                    self._remaining -= len(data)
+            out = self._decompressor.decompress(data, _CHUNK)
+            if not data and not out and not self._decompressor.eof:
+                raise zipfile.BadZipFile(f"Membro '{self.name}' truncado")
+            finished = self._decompressor.eof
+            if finished and self._decompressor.unused_data:
+                # Bytes do data descriptor / próximo membro
+                self._reader.unread(self._decompressor.unused_data)
+
+        self._crc = zlib.crc32(out, self._crc)
+        self._buffer += out
+        if finished:
+            self._finish()
+
+    def _finish(self):
+        self._done = True
+        if self._has_descriptor:
+            head = self._reader.read_exact(4)
+            if head != _DESCRIPTOR_SIGNATURE:
+                self._reader.unread(head)  # A assinatura do descriptor é opcional
+            size_len = 8 if self._zip64 else 4
+            descriptor = self._reader.read_exact(4 + 2 * size_len)
+            self._crc_expected = struct.unpack("<I", descriptor[:4])[0]
+        if self._crc != self._crc_expected:
+            raise zipfile.BadZipFile(f"CRC inválido no membro '{self.name}'")
+
+    def readinto(self, b):
+        while not self._buffer and not self._done:
+            self._fill()
+        n = min(len(b), len(self._buffer))
+        b[:n] = self._buffer[:n]
+        self._buffer = self._buffer[n:]
+        return n
+
+    def drain(self):
+        """Consome o restante do membro (necessário para chegar ao próximo)."""
+        while not self._done:
+            self._buffer = b""
+            self._fill()
+        self._buffer = b""
+
+
+def iter_stream_members(fileobj):
+    """
+    Lê um zip em sequência, pelos cabeçalhos locais (sem diretório central).
+
+    Yields:
+        Tuplas (nome, stream binário). Cada stream só é válido até o próximo
+        membro ser pedido; o que não for lido é descartado.
+    """
+    reader = _PushbackReader(fileobj)
+    while True:
+        header = reader.read_exact(_LOCAL_HEADER.size)
+        if len(header) < _LOCAL_HEADER.size or header[:4] != _LOCAL_SIGNATURE:
+            return  # Fim dos membros (diretório central) ou stream vazio
+        (_, _, flags, method, _, _, crc, compressed_size, size, name_len, extra_len) = _LOCAL_HEADER.unpack(header)
+        raw_name = reader.read_exact(name_len)
+        extra = reader.read_exact(extra_len)
+        name = raw_name.decode("utf-8" if flags & _FLAG_UTF8 else "cp437")
+        if flags & _FLAG_ENCRYPTED:
+            raise zipfile.BadZipFile(f"Membro criptografado não suportado: '{name}'")
+
+        zip64 = False
+        pos = 0
+        while pos + 4 <= len(extra):
+            tag, length = struct.unpack("<HH", extra[pos : pos + 4])
+            if tag == _ZIP64_EXTRA:
+                zip64 = True
+                values = extra[pos + 4 : pos + 4 + length]
+                sizes = [struct.unpack("<Q", values[i : i + 8])[0] for i in range(0, len(values) - 7, 8)]
+                if size == 0xFFFFFFFF and sizes:
+                    size = sizes.pop(0)
+                if compressed_size == 0xFFFFFFFF and sizes:
+                    compressed_size = sizes.pop(0)
+            pos += 4 + length
+
+        member = _StreamMember(
+            reader, name, method, crc, compressed_size,
+            has_descriptor=bool(flags & _FLAG_DESCRIPTOR), zip64=zip64,
+        )
+        yield name, io.BufferedReader(member, _CHUNK)
+        member.drain()
+
+
+# --- Zip aninhado STORED dentro de arquivo seekable ---
+class _FileWindow(io.RawIOBase):
+    """Trecho [start, start + length) de um arquivo seekable, visto como arquivo."""
+
+    def __init__(self, fileobj, start, length):
+        super().__init__()
+        self._fileobj = fileobj
+        self._start = start
+        self._length = length
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence == os.SEEK_CUR:
+            offset += self._pos
+        elif whence == os.SEEK_END:
+            offset += self._length
+        self._pos = max(0, min(offset, self._length))
+        return self._pos
+
+    def readinto(self, b):
+        n = min(len(b), self._length - self._pos)
+        if n <= 0:
+            return 0
+        # O arquivo é compartilhado com o ZipFile externo: sempre reposiciona
+        self._fileobj.seek(self._start + self._pos)
+        data = self._fileobj.read(n)
+        b[: len(data)] = data
+        self._pos += len(data)
+        return len(data)
+
+
+def _stored_member_window(fileobj, info):
+    fileobj.seek(info.header_offset)
+    header = fileobj.read(_LOCAL_HEADER.size)
+    name_len, extra_len = _LOCAL_HEADER.unpack(header)[-2:]
+    start = info.header_offset + _LOCAL_HEADER.size + name_len + extra_len
+    return _FileWindow(fileobj, start, info.compress_size)
+
+
+# --- Camada de acesso ---
+class Archive:
+    """
+    Zip do GDELT (flat ou nested) aberto a partir de caminho, arquivo ou stream.
+
+    Attributes:
+        layout: FLAT, NESTED ou None (ainda não determinado / sem CSV).
+    """
+
+    def __init__(self, source):
+        self._owned = None
+        if isinstance(source, (str, bytes, os.PathLike)):
+            source = self._owned = open(source, "rb")
+        self._fileobj = source
+        self._seekable = bool(getattr(source, "seekable", lambda: False)())
+        self._zip = zipfile.ZipFile(source) if self._seekable else None
+        self._consumed = False
+        self.layout = None
+
+    def close(self):
+        if self._zip is not None:
+            self._zip.close()
+        if self._owned is not None:
+            self._owned.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _set_layout(self, layout):
+        if self.layout is None:
+            self.layout = layout
+            logging.debug("Layout do zip: %s", layout)
+
+    def _iter_nested(self, name, stream):
+        for inner_name, inner in iter_stream_members(stream):
+            if _is_csv(inner_name):
+                self._set_layout(NESTED)
+                yield inner_name, inner
+            else:
+                logging.debug("Arquivo '%s' dentro de '%s' não é um CSV. Ignorando.", inner_name, name)
+
+    def iter_csv(self):
+        """
+        Gera (nome, stream binário) para cada CSV do zip, inclusive dentro de
+        zips aninhados. Cada stream é válido até o próximo ser pedido.
+
+        Com origem não seekable só é possível percorrer o zip uma vez.
+        """
+        if self._zip is None:
+            if self._consumed:
+                raise ValueError("Stream do zip já foi consumido")
+            self._consumed = True
+            for name, stream in iter_stream_members(self._fileobj):
+                if _is_csv(name):
+                    self._set_layout(FLAT)
+                    yield name, stream
+                elif _is_zip(name):
+                    yield from self._iter_nested(name, stream)
+            return
+
+        for info in self._zip.infolist():
+            if _is_csv(info.filename):
+                self._set_layout(FLAT)
+                with self._zip.open(info) as f:
+                    yield info.filename, f
+            elif _is_zip(info.filename):
+                if info.compress_type == zipfile.ZIP_STORED and not info.flag_bits & _FLAG_ENCRYPTED:
+                    # Zip interno sem compressão: acesso direto ao trecho do arquivo externo
+                    with zipfile.ZipFile(_stored_member_window(self._fileobj, info)) as inner_zip:
+                        for inner in inner_zip.infolist():
+                            if _is_csv(inner.filename):
+                                self._set_layout(NESTED)
+                                with inner_zip.open(inner) as f:
+                                    yield inner.filename, f
+                else:
+                    with self._zip.open(info) as outer_member:
+                        yield from self._iter_nested(info.filename, outer_member)
+
+
+def open_archive(source):
+    """Abre um zip do GDELT (caminho, arquivo seekable ou stream); use com `with`."""
+    return Archive(source)
+
+
+class _PrefixedReader(io.RawIOBase):
+    def __init__(self, prefix, stream):
+        super().__init__()
+        self._prefix = prefix
+        self._stream = stream
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        if self._prefix:
+            n = min(len(b), len(self._prefix))
+            b[:n] = self._prefix[:n]
+            self._prefix = self._prefix[n:]
+            return n
+        data = self._stream.read(len(b))
+        b[: len(data)] = data
+        return len(data)
+
+
+def peek_line(stream):
+    """
+    Lê a primeira linha de um stream sem perdê-la.
+
+    Returns:
+        (linha em bytes, stream equivalente ao original desde o início).
+    """
+    line = stream.readline()
+    return line, io.BufferedReader(_PrefixedReader(line, stream), _CHUNK)
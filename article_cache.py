@@ -0,0 +1,266 @@
+# article_cache.py
+"""
+Cache local (em disco) do texto extraído dos artigos.
+
+Cada artigo é guardado em um arquivo cujo nome é o SHA-256 da URL
+normalizada. O arquivo tem uma linha JSON com os metadados (url, ETag,
+Last-Modified, data do download) seguida do texto comprimido com zlib.
+
+    - Entradas mais novas que config.ARTICLE_CACHE_TTL são usadas sem rede.
+    - Entradas mais antigas são revalidadas com GET condicional
+      (If-None-Match / If-Modified-Since); um 304 reaproveita o texto.
+    - evict() remove as entradas menos usadas recentemente (LRU, pela data
+      de modificação do arquivo, atualizada a cada acerto) até o cache caber
+      em config.ARTICLE_CACHE_MAX_BYTES, e as não usadas há mais de
+      config.ARTICLE_CACHE_MAX_AGE segundos.
+    - maybe_evict() (chamado após cada lote de downloads) só percorre o
+      diretório quando o tamanho estimado passa de ARTICLE_CACHE_MAX_BYTES ou
+      a cada ARTICLE_CACHE_EVICT_INTERVAL segundos. A estimativa vem da última
+      varredura mais os bytes gravados por put() neste processo (outros
+      processos no mesmo diretório entram na varredura periódica).
+
+Configurações (opcionais em config.py):
+    ARTICLE_CACHE_ENABLED        -> usa o cache (padrão: True)
+    ARTICLE_CACHE_DIR            -> diretório (padrão: article_cache/ ao lado deste arquivo)
+    ARTICLE_CACHE_TTL            -> segundos sem revalidar (padrão: 7 dias)
+    ARTICLE_CACHE_MAX_BYTES      -> tamanho máximo (padrão: 2 GB)
+    ARTICLE_CACHE_MAX_AGE        -> idade máxima sem uso, em segundos (padrão: 90 dias)
+    ARTICLE_CACHE_EVICT_INTERVAL -> segundos entre varreduras completas (padrão: 3600)
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import zlib
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import config
+
+_DEFAULT_PORTS = {"http": "80", "https": "443"}
+
+
+def normalize_url(url):
+    """
+    Normaliza a URL para servir de chave: esquema e host em minúsculas, sem
+    porta padrão, sem fragmento, sem parâmetros utm_* e com a query ordenada.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and str(parts.port) != _DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith("utm_")
+    )
+    return urlunsplit((scheme, host, parts.path or "/", urlencode(query), ""))
+
+
+class CachedArticle:
+    """Entrada do cache: texto extraído + metadados de revalidação."""
+
+    def __init__(self, url, text, etag=None, last_modified=None, fetched_at=None):
+        self.url = url
+        self.text = text
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fetched_at = fetched_at or time.time()
+
+    def is_fresh(self, ttl):
+        return time.time() - self.fetched_at < ttl
+
+    def conditional_headers(self):
+        """Cabeçalhos para o GET condicional."""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class ArticleCache:
+    """Cache de artigos em disco, endereçado pelo hash da URL normalizada."""
+
+    def __init__(self, directory, ttl=7 * 86400, max_bytes=2 * 1024 ** 3, max_age=90 * 86400,
+                 evict_interval=3600):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.evict_interval = evict_interval
+        self._lock = threading.Lock()
+        self._size = None  # Bytes estimados (None: ainda sem varredura)
+        self._last_scan = 0.0
+        self._counters = {"hits": 0, "misses": 0, "revalidated": 0, "stores": 0, "evictions": 0}
+        os.makedirs(directory, exist_ok=True)
+
+    # --- Contadores ---
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def count_revalidated(self):
+        """Registra um 304 (entrada antiga reaproveitada sem baixar de novo)."""
+        self._count("revalidated")
+
+    def count_miss(self):
+        """Registra uma entrada antiga cuja página foi baixada de novo."""
+        self._count("misses")
+
+    def stats(self):
+        """Cópia dos contadores (hits, misses, revalidated, stores, evictions)."""
+        with self._lock:
+            counters = dict(self._counters)
+        lookups = counters["hits"] + counters["misses"]
+        counters["hit_ratio"] = counters["hits"] / lookups if lookups else 0.0
+        return counters
+
+    # --- Leitura e escrita ---
+    def _path(self, url):
+        key = hashlib.sha256(normalize_url(url).encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, key[:2], key + ".art")
+
+    def get(self, url):
+        """
+        Retorna o CachedArticle da URL, ou None se não estiver no cache.
+
+        Uma entrada encontrada atualiza a data de uso do arquivo (ordem do
+        LRU). Só uma entrada fresca (is_fresh(ttl)) conta como acerto; uma
+        entrada antiga é contada pelo chamador depois de revalidar
+        (count_revalidated) ou baixar de novo (count_miss).
+        """
+        path = self._path(url)
+        try:
+            with open(path, "rb") as f:
+                meta = json.loads(f.readline())
+                text = zlib.decompress(f.read()).decode("utf-8")
+            os.utime(path)
+        except FileNotFoundError:
+            self._count("misses")
+            return None
+        except (OSError, ValueError, zlib.error) as e:
+            logging.warning(f"Entrada inválida no cache de artigos ({path}): {e}")
+            self._count("misses")
+            return None
+        article = CachedArticle(url, text, meta.get("etag"), meta.get("last_modified"), meta.get("fetched_at"))
+        if article.is_fresh(self.ttl):
+            self._count("hits")
+        return article
+
+    def put(self, url, text, etag=None, last_modified=None, fetched_at=None):
+        """Grava (ou substitui) a entrada da URL de forma atômica."""
+        path = self._path(url)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        meta = {
+            "url": url,
+            "etag": etag,
+            "last_modified": last_modified,
+            "fetched_at": fetched_at or time.time(),
+        }
+        try:
+            old_size = os.path.getsize(path)
+        except OSError:
+            old_size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(json.dumps(meta).encode("utf-8") + b"\n")
+                f.write(zlib.compress(text.encode("utf-8"), 6))
+                new_size = f.tell()
+            os.replace(tmp_path, path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+        with self._lock:
+            self._counters["stores"] += 1
+            if self._size is not None:
+                self._size += new_size - old_size
+
+    def touch(self, article):
+        """Renova a data de download após um 304 (o texto continua válido)."""
+        self.put(article.url, article.text, article.etag, article.last_modified)
+
+    # --- Remoção ---
+    def maybe_evict(self):
+        """
+        Chama evict() só se o tamanho estimado passou de max_bytes, se ainda
+        não houve varredura ou se a última foi há mais de evict_interval
+        segundos (entradas antigas). Retorna quantas entradas removeu.
+        """
+        with self._lock:
+            due = (
+                self._size is None
+                or self._size > self.max_bytes
+                or time.time() - self._last_scan >= self.evict_interval
+            )
+        return self.evict() if due else 0
+
+    def evict(self):
+        """
+        Remove entradas não usadas há mais de max_age e, se o cache passar de
+        max_bytes, as menos usadas recentemente até 90% de max_bytes (folga
+        para que maybe_evict não varra o diretório a cada lote). Retorna
+        quantas removeu.
+        """
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(".art"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        entries.sort()  # Mais antigo (menos usado) primeiro
+        total = sum(size for _, size, _ in entries)
+        oldest_allowed = time.time() - self.max_age
+        target = self.max_bytes if total <= self.max_bytes else int(self.max_bytes * 0.9)
+        removed = 0
+        for mtime, size, path in entries:
+            if mtime >= oldest_allowed and total <= target:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+
+        with self._lock:
+            self._size = total
+            self._last_scan = time.time()
+        if removed:
+            self._count("evictions", removed)
+            logging.info(f"Cache de artigos: {removed} entradas removidas ({total} bytes restantes).")
+        return removed
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_cache():
+    """Cache padrão configurado por config.ARTICLE_CACHE_*, ou None se desativado."""
+    global _default_cache
+    if not getattr(config, "ARTICLE_CACHE_ENABLED", True):
+        return None
+    with _default_lock:
+        if _default_cache is None:
+            directory = getattr(config, "ARTICLE_CACHE_DIR", None) or os.path.join(
+                os.path.dirname(os.path.abspath(__file__)), "article_cache"
+            )
+            _default_cache = ArticleCache(
+                directory,
+                ttl=getattr(config, "ARTICLE_CACHE_TTL", 7 * 86400),
+                max_bytes=getattr(config, "ARTICLE_CACHE_MAX_BYTES", 2 * 1024 ** 3),
+                max_age=getattr(config, "ARTICLE_CACHE_MAX_AGE", 90 * 86400),
+                evict_interval=getattr(config, "ARTICLE_CACHE_EVICT_INTERVAL", 3600),
+            )
+        return _default_cache
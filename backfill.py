@@ -0,0 +1,320 @@
+# backfill.py
+"""
+Backfill em vários processos: divide os arquivos de um intervalo de datas do
+masterfile entre N processos de trabalho.
+
+O parse no pandas e a conversão para documentos são limitados pelo GIL, então
+as threads do pipeline não passam de um núcleo. Aqui cada worker é um processo
+(método "spawn") com seu próprio cliente do MongoDB (mongo_pool), seus sinks e
+seu registro de métricas. Todos consomem a mesma fila de arquivos: quem
+termina pega o próximo, então um worker preso em um GKG grande não atrasa os
+outros. Os arquivos entram na fila do maior para o menor (pelo tamanho do
+masterfile), o que deixa os pequenos para o fim e equilibra a carga.
+
+Cada worker registra o estado dos seus arquivos no manifesto. O coordenador
+recebe de cada worker o resultado de cada arquivo (linhas, bytes, duração,
+erro), atualiza as métricas, reporta o progresso periodicamente e repõe um
+worker que morra no meio de um arquivo (o arquivo em andamento é registrado
+como falha). Os logs dos workers passam
+por uma fila e são gravados pelos handlers do coordenador.
+
+Uso:
+    python backfill.py --start 20150218 --end 20200218 --workers 32
+    python backfill.py --start 20150218 --end 20150218 --streams events mentions
+
+Configurações (opcionais em config.py):
+    BACKFILL_WORKERS            -> processos de trabalho (padrão: os.cpu_count())
+    BACKFILL_PROGRESS_INTERVAL  -> segundos entre relatórios de progresso (padrão: 30)
+"""
+import argparse
+import logging
+import logging.handlers
+import multiprocessing
+import os
+import queue
+import time
+import traceback
+
+import config
+import db_indexes
+import manifest
+import masterfile
+import metrics
+import mirror
+import mongo_pool
+import sinks
+import utils
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+_START = "start"
+_DONE = "done"
+_EXIT = "exit"
+
+
+# --- Worker ---
+def ingest_file(size, file_hash, url, file_type):
+    """
+    Baixa e grava um arquivo com o loader do tipo (mesmo fluxo do modo serial),
+    registrando o estado no manifesto.
+
+    Returns:
+        Tupla (linhas gravadas ou None, bytes baixados, erro ou None).
+    """
+    from db_operations import events_db, mentions_db, gkg_db
+    loaders = {
+        "events": events_db.insert_events_data,
+        "mentions": mentions_db.insert_mentions_data,
+        "gkg": gkg_db.insert_gkg_data,
+    }
+    file_content = mirror.download(url, size, file_hash)
+    if not file_content:
+        manifest.mark(url, manifest.FAILED, size, file_hash, error="download")
+        return None, 0, "download"
+    file_bytes = utils.content_size(file_content)
+    manifest.mark(url, manifest.DOWNLOADED, size, file_hash)
+    rows_written = loaders[file_type](file_content, url)
+    if rows_written is None:
+        manifest.mark(url, manifest.FAILED, size, file_hash, error="parse/write")
+        return None, file_bytes, "parse/write"
+    manifest.mark(url, manifest.WRITTEN, size, file_hash, rows_written=rows_written)
+    return rows_written, file_bytes, None
+
+
+def _worker(worker_id, task_queue, result_queue, log_queue):
+    # Processo novo (spawn): logging vai para a fila do coordenador
+    root = logging.getLogger()
+    root.handlers[:] = [logging.handlers.QueueHandler(log_queue)]
+    root.setLevel(getattr(config, "LOG_LEVEL", "INFO"))
+    try:
+        while True:
+            task = task_queue.get()
+            if task is None:
+                break
+            size, file_hash, url, file_type = task
+            result_queue.put((_START, worker_id, url))
+            started = time.perf_counter()
+            try:
+                rows_written, file_bytes, error = ingest_file(size, file_hash, url, file_type)
+            except Exception as e:
+                traceback.print_exc()
+                rows_written, file_bytes, error = None, 0, f"{type(e).__name__}: {e}"
+            result_queue.put((_DONE, worker_id, url, rows_written, file_bytes, time.perf_counter() - started, error))
+    finally:
+        sinks.close_sinks()
+        mongo_pool.close_client()
+        result_queue.put((_EXIT, worker_id))
+
+
+# --- Coordenador ---
+class _Progress:
+    """Contadores do coordenador e relatório periódico de progresso."""
+
+    def __init__(self, total, interval):
+        self.total = total
+        self.interval = interval
+        self.processed = 0
+        self.failed = 0
+        self.rows = 0
+        self.bytes = 0
+        self.started = time.perf_counter()
+        self._last_report = self.started
+
+    @property
+    def finished(self):
+        return self.processed + self.failed
+
+    def record(self, url, file_type, rows_written, file_bytes, seconds, error, worker_id):
+        metrics.observe("etl_stage_seconds", seconds, stage="backfill_file", file_type=file_type)
+        if error is None:
+            self.processed += 1
+            self.rows += rows_written
+            self.bytes += file_bytes
+            metrics.inc("etl_files_total", file_type=file_type, status="written")
+            metrics.inc("etl_rows_total", rows_written, file_type=file_type)
+            metrics.inc("etl_bytes_total", file_bytes, file_type=file_type)
+            logging.info(
+                "Arquivo gravado: %s", url,
+                extra={"url": url, "file_type": file_type, "rows": rows_written, "bytes": file_bytes,
+                       "worker": worker_id, "stage_seconds": {"total": round(seconds, 4)}},
+            )
+        else:
+            self.failed += 1
+            metrics.inc("etl_files_total", file_type=file_type, status="failed")
+            logging.error(f"Backfill: falha em {url} (worker {worker_id}): {error}")
+
+    def maybe_report(self, force=False):
+        now = time.perf_counter()
+        if not force and now - self._last_report < self.interval:
+            return
+        self._last_report = now
+        elapsed = now - self.started
+        rate = self.finished / elapsed if elapsed else 0.0
+        remaining = (self.total - self.finished) / rate if rate else float("nan")
+        logging.info(
+            f"Backfill: {self.finished}/{self.total} arquivos ({self.failed} falhas), "
+            f"{self.rows} linhas, {self.bytes / 1e6:.1f} MB, {rate * 60:.1f} arquivos/min, "
+            f"restante ~{remaining / 60:.1f} min."
+        )
+
+
+def run_backfill(entries, workers=None, progress_interval=None):
+    """
+    Processa os arquivos com `workers` processos consumindo uma fila compartilhada.
+
+    Args:
+        entries: Lista de MasterfileEntry (ou tuplas (size, file_hash, url)).
+        workers: Número de processos (padrão: config.BACKFILL_WORKERS ou os.cpu_count()).
+        progress_interval: Segundos entre relatórios de progresso.
+
+    Returns:
+        Dicionário com 'total', 'processed', 'failed', 'rows' e 'seconds'.
+    """
+    workers = workers or getattr(config, "BACKFILL_WORKERS", None) or os.cpu_count() or 1
+    progress_interval = progress_interval or getattr(config, "BACKFILL_PROGRESS_INTERVAL", 30)
+
+    tasks = []
+    for entry in entries:
+        size, file_hash, url = entry[:3]
+        file_type = masterfile.detect_file_type(url)
+        if file_type is None:
+            logging.warning(f"Tipo de arquivo desconhecido para URL: {url}")
+            continue
+        tasks.append((size, file_hash, url, file_type))
+    # Maiores primeiro: os arquivos pequenos preenchem o fim e os workers terminam juntos
+    tasks.sort(key=lambda task: int(task[0]) if str(task[0]).isdigit() else 0, reverse=True)
+    by_url = {task[2]: task for task in tasks}
+    progress = _Progress(len(tasks), progress_interval)
+    if not tasks:
+        return {"total": 0, "processed": 0, "failed": 0, "rows": 0, "seconds": 0.0}
+
+    context = multiprocessing.get_context("spawn")
+    task_queue = context.Queue()
+    result_queue = context.Queue()
+    log_queue = context.Queue()
+    log_listener = logging.handlers.QueueListener(log_queue, *logging.getLogger().handlers, respect_handler_level=True)
+    log_listener.start()
+
+    for task in tasks:
+        task_queue.put(task)
+
+    workers = min(workers, len(tasks))
+    processes = {}
+    in_flight = {}  # worker_id -> URL em processamento
+    unfinished = set(by_url)
+    next_id = 0
+
+    def lost(url, worker_id, reason):
+        # Arquivo de um worker que morreu: registrado como falha
+        size, file_hash, _, file_type = by_url[url]
+        unfinished.discard(url)
+        manifest.mark(url, manifest.FAILED, size, file_hash, error=reason)
+        progress.record(url, file_type, None, 0, 0.0, reason, worker_id)
+
+    def start_worker():
+        nonlocal next_id
+        process = context.Process(
+            target=_worker, args=(next_id, task_queue, result_queue, log_queue),
+            name=f"backfill-{next_id}", daemon=True,
+        )
+        process.start()
+        task_queue.put(None)  # Uma sentinela por worker, depois das tarefas
+        processes[next_id] = process
+        next_id += 1
+
+    logging.info(f"Backfill iniciado: {len(tasks)} arquivos, {workers} processos.")
+    for _ in range(workers):
+        start_worker()
+
+    def handle(message):
+        kind, worker_id = message[0], message[1]
+        if kind == _START:
+            in_flight[worker_id] = message[2]
+        elif kind == _DONE:
+            _, _, url, rows_written, file_bytes, seconds, error = message
+            in_flight.pop(worker_id, None)
+            unfinished.discard(url)
+            progress.record(url, by_url[url][3], rows_written, file_bytes, seconds, error, worker_id)
+            metrics.set_gauge("backfill_files_remaining", progress.total - progress.finished)
+        elif kind == _EXIT:
+            process = processes.pop(worker_id, None)
+            if process is not None:
+                process.join()
+
+    def reap_dead():
+        # Worker morto sem mensagem de saída (ex.: OOM killer), conferido a cada
+        # volta do laço: com a fila sempre movimentada um timeout nunca acontece
+        dead = [worker_id for worker_id, process in processes.items() if not process.is_alive()]
+        if not dead:
+            return
+        # Mensagens que o worker enviou antes de morrer (ex.: _DONE, _EXIT) vêm primeiro
+        while True:
+            try:
+                handle(result_queue.get_nowait())
+            except queue.Empty:
+                break
+        for worker_id in dead:
+            process = processes.pop(worker_id, None)
+            if process is None:
+                continue  # Saiu normalmente (_EXIT)
+            url = in_flight.pop(worker_id, None)
+            logging.error(f"Backfill: worker {worker_id} terminou (exit code {process.exitcode}).")
+            if url is not None:
+                lost(url, worker_id, f"worker morto (exit code {process.exitcode})")
+            if unfinished:
+                start_worker()
+
+    try:
+        while processes:
+            try:
+                handle(result_queue.get(timeout=1.0))
+            except queue.Empty:
+                pass
+            reap_dead()
+            progress.maybe_report()
+
+        # A mensagem de início pode se perder se o worker morrer logo depois
+        for url in sorted(unfinished):
+            lost(url, None, "worker morto")
+    finally:
+        for process in processes.values():
+            process.terminate()
+        log_listener.stop()
+
+    progress.maybe_report(force=True)
+    seconds = time.perf_counter() - progress.started
+    logging.info(
+        f"Backfill concluído: {progress.processed}/{progress.total} arquivos, {progress.failed} falhas, "
+        f"{progress.rows} linhas em {seconds:.1f}s."
+    )
+    return {
+        "total": progress.total, "processed": progress.processed, "failed": progress.failed,
+        "rows": progress.rows, "seconds": round(seconds, 3),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backfill do GDELT em vários processos.")
+    parser.add_argument("--start", default=None, help="Data inicial (YYYYMMDD)")
+    parser.add_argument("--end", default=None, help="Data final (YYYYMMDD, inclusive)")
+    parser.add_argument("--streams", nargs="+", choices=masterfile.FILE_TYPES, default=None)
+    parser.add_argument("--workers", type=int, default=None, help="Processos de trabalho (padrão: núcleos)")
+    parser.add_argument("--masterfile", default=os.path.join(BASE_DIR, "gdelt2.txt"))
+    args = parser.parse_args(argv)
+
+    utils.setup_logging(config.LOG_FILE)
+    metrics.start_exporter()
+    try:
+        index = masterfile.MasterfileIndex(args.masterfile)
+        selected = index.select(args.start, args.end, streams=args.streams or getattr(config, "STREAMS", None))
+        entries = manifest.filter_pending([(entry.size, entry.file_hash, entry.url) for entry in selected])
+        # Índices criados uma vez aqui, não em cada worker
+        db_indexes.ensure_indexes()
+        return run_backfill(entries, workers=args.workers)
+    finally:
+        mongo_pool.close_client()
+        metrics.stop_exporter()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,343 @@
+# benchmark_ingest.py
+"""
+Benchmark reproduzível da ingestão (events_db, mentions_db, gkg_db).
+
+Roda cada loader sobre os zips de exemplo do repositório e sobre cópias
+sintéticas ampliadas (o CSV repetido N vezes, com IDs deslocados para não
+colidirem) e mede, para cada caso:
+
+    unzip      -> descompressão do CSV (archive_reader, sem parse)
+    parse      -> parse_*_data menos o tempo de unzip
+    transform  -> DataFrame -> documentos (to_dict, loc GeoJSON, gkg_fields)
+    write      -> write_*_data menos a conversão em documentos
+    rows/s, MB/s (do CSV descomprimido) e pico de memória (RSS)
+
+Cada execução roda em um processo novo, então o pico de RSS
+(resource.getrusage) é só daquele caso. O destino das escritas pode ser:
+
+    null      -> coleção em processo que só codifica os documentos em BSON
+                 (mede o custo do lado do cliente, sem servidor; padrão)
+    mongomock -> mongomock em processo (requer o pacote mongomock)
+    mongo     -> mongod real (config.MONGODB_URL), no banco --db, que é
+                 apagado antes de cada execução
+
+Os resultados são gravados em JSON para comparar versões:
+
+    python benchmark_ingest.py --scale 1 10 --repeat 3
+    python benchmark_ingest.py --gkg amostra.gkg.csv.zip --backend mongo
+    python benchmark_ingest.py --compare benchmark_results/ingest-antigo.json
+"""
+import argparse
+import datetime
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import types
+import zipfile
+
+import config
+import mongo_pool
+import archive_reader
+import gkg_fields
+from db_operations import events_db, mentions_db, gkg_db
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+FIXTURES = {
+    "events": os.path.join(BASE_DIR, "20150218224500.translation.export.CSV.zip"),
+    "mentions": os.path.join(BASE_DIR, "20150218224500.translation.mentions.CSV.zip"),
+    "gkg": None,  # O repositório não traz uma amostra do GKG: use --gkg
+}
+
+PARSERS = {
+    "events": events_db.parse_events_data,
+    "mentions": mentions_db.parse_mentions_data,
+    "gkg": gkg_db.parse_gkg_data,
+}
+
+WRITERS = {
+    "events": events_db.write_events_data,
+    "mentions": mentions_db.write_mentions_data,
+    "gkg": gkg_db.write_gkg_data,
+}
+
+_ID_OFFSET = 10 ** 12  # Deslocamento dos IDs numéricos em cada cópia sintética
+
+
+# --- Destinos das escritas ---
+class _NullCollection:
+    """Coleção em processo: codifica os documentos em BSON e os descarta."""
+
+    def __init__(self, name):
+        self.name = name
+
+    def insert_many(self, documents, ordered=True):
+        import bson
+
+        ids = []
+        for document in documents:
+            document.setdefault("_id", bson.ObjectId())
+            bson.encode(document)
+            ids.append(document["_id"])
+        return types.SimpleNamespace(inserted_ids=ids)
+
+    def bulk_write(self, operations, ordered=True):
+        import bson
+
+        for operation in operations:
+            bson.encode({"q": operation._filter, "u": {"pipeline": operation._doc}
+                         if isinstance(operation._doc, list) else operation._doc})
+        return types.SimpleNamespace(upserted_count=len(operations), modified_count=0)
+
+    def create_indexes(self, indexes):
+        return []
+
+
+def _use_backend(backend, db_name):
+    if backend == "null":
+        collections = {}
+        mongo_pool.get_collection = lambda name, db_name=None, url=None: collections.setdefault(
+            name, _NullCollection(name)
+        )
+        return
+    if backend == "mongomock":
+        import mongomock
+        import pymongo
+
+        pymongo.MongoClient = mongomock.MongoClient
+        mongo_pool.MongoClient = mongomock.MongoClient
+    config.DB_NAME = db_name
+    mongo_pool.get_client().drop_database(db_name)
+
+
+# --- Fixtures sintéticas ---
+def _shift_first_field(line, copy):
+    first, sep, rest = line.partition(b"\t")
+    if first.isdigit():
+        first = str(int(first) + copy * _ID_OFFSET).encode()
+    else:
+        first = first + f"-c{copy}".encode()
+    return first + sep + rest
+
+
+def build_scaled_fixture(path, file_type, scale, work_dir):
+    """
+    Gera um zip com o CSV de `path` repetido `scale` vezes (IDs deslocados
+    por cópia, header do GKG V2 mantido uma vez só). scale=1 usa o original.
+    """
+    if scale == 1:
+        return path
+    target = os.path.join(work_dir, f"x{scale}.{os.path.basename(path)}")
+    if os.path.exists(target):
+        return target
+    csv_name = os.path.basename(path)[:-4] or f"{file_type}.csv"
+    with zipfile.ZipFile(target, "w", zipfile.ZIP_DEFLATED) as out_zip:
+        with out_zip.open(csv_name, "w", force_zip64=True) as out:
+            for copy in range(scale):
+                with archive_reader.open_archive(path) as archive:
+                    for _, f in archive.iter_csv():
+                        first_line, f = archive_reader.peek_line(f)
+                        has_header = file_type == "gkg" and not gkg_db._is_gkg_v1(first_line.split(b"\t", 1)[0])
+                        if has_header:
+                            f.readline()
+                            if copy == 0:
+                                out.write(first_line)
+                        for line in f:
+                            out.write(_shift_first_field(line, copy) if copy else line)
+                        break
+    return target
+
+
+# --- Execução de um caso (em processo separado) ---
+def _time_unzip(path):
+    started = time.perf_counter()
+    size = 0
+    with archive_reader.open_archive(path) as archive:
+        for _, f in archive.iter_csv():
+            while True:
+                block = f.read(1 << 20)
+                if not block:
+                    break
+                size += len(block)
+    return time.perf_counter() - started, size
+
+
+def _time_transform(file_type, df):
+    started = time.perf_counter()
+    records = df.to_dict("records")
+    if file_type == "events":
+        events_db.build_geo_points(df)
+    return time.perf_counter() - started, len(records)
+
+
+def run_case(case):
+    """Executa um caso e retorna as medições (chamado no processo filho)."""
+    logging.basicConfig(level=logging.INFO if case["verbose"] else logging.WARNING)
+    _use_backend(case["backend"], case["db"])
+    file_type, path = case["file_type"], case["path"]
+    url = os.path.basename(path)
+
+    parse_fields = file_type == "gkg" and gkg_fields.is_enabled()
+    config.GKG_PARSE_FIELDS = False  # O parse dos campos do GKG é medido como transform
+
+    total_started = time.perf_counter()
+    unzip_seconds, csv_bytes = _time_unzip(path)
+
+    started = time.perf_counter()
+    df = PARSERS[file_type](path, url)
+    parse_seconds = time.perf_counter() - started - unzip_seconds
+    if df is None:
+        raise RuntimeError(f"Falha no parse de {path}")
+
+    started = time.perf_counter()
+    if parse_fields:
+        df = gkg_fields.parse_fields(df)
+    fields_seconds = time.perf_counter() - started
+    records_seconds, rows = _time_transform(file_type, df)
+
+    started = time.perf_counter()
+    written = WRITERS[file_type](df, url)
+    write_seconds = time.perf_counter() - started - records_seconds
+    if written is None:
+        raise RuntimeError(f"Falha na escrita de {path}")
+    total_seconds = time.perf_counter() - total_started - records_seconds  # A conversão é feita só uma vez
+
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_rss_mb = peak_rss / (1024 * 1024 if sys.platform == "darwin" else 1024)  # bytes no macOS, KB no Linux
+    return {
+        "rows": rows,
+        "zip_bytes": os.path.getsize(path),
+        "csv_bytes": csv_bytes,
+        "seconds": {
+            "unzip": round(unzip_seconds, 4),
+            "parse": round(max(parse_seconds, 0.0), 4),
+            "transform": round(fields_seconds + records_seconds, 4),
+            "write": round(max(write_seconds, 0.0), 4),
+            "total": round(total_seconds, 4),
+        },
+        "rows_per_s": round(rows / total_seconds, 1) if total_seconds else None,
+        "mb_per_s": round(csv_bytes / (1024 * 1024) / total_seconds, 2) if total_seconds else None,
+        "peak_rss_mb": round(peak_rss_mb, 1),
+    }
+
+
+# --- Relatório ---
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _case_key(result):
+    return result["file_type"], result["scale"]
+
+
+def print_report(results, baseline=None):
+    previous = {_case_key(r): r for r in (baseline or {}).get("results", [])}
+    header = f"{'tipo':<9}{'escala':>7}{'linhas':>10}{'linhas/s':>12}{'MB/s':>8}{'unzip':>8}{'parse':>8}{'transf.':>8}{'write':>8}{'RSS MB':>9}"
+    if previous:
+        header += f"{'vs base':>10}"
+    print(header)
+    for result in results:
+        best = result["best"]
+        seconds = best["seconds"]
+        line = (
+            f"{result['file_type']:<9}{result['scale']:>7}{best['rows']:>10}{best['rows_per_s']:>12.0f}"
+            f"{best['mb_per_s']:>8.2f}{seconds['unzip']:>8.2f}{seconds['parse']:>8.2f}"
+            f"{seconds['transform']:>8.2f}{seconds['write']:>8.2f}{best['peak_rss_mb']:>9.1f}"
+        )
+        old = previous.get(_case_key(result))
+        if old and old["best"].get("rows_per_s"):
+            change = best["rows_per_s"] / old["best"]["rows_per_s"] - 1
+            line += f"{change:>+10.1%}"
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark da ingestão do GDELT.")
+    parser.add_argument("--types", nargs="+", choices=sorted(FIXTURES), help="Loaders a medir (padrão: os que têm fixture)")
+    parser.add_argument("--events", default=FIXTURES["events"], help="Zip de eventos")
+    parser.add_argument("--mentions", default=FIXTURES["mentions"], help="Zip de menções")
+    parser.add_argument("--gkg", default=FIXTURES["gkg"], help="Zip do GKG")
+    parser.add_argument("--scale", nargs="+", type=int, default=[1, 10], help="Fatores de ampliação")
+    parser.add_argument("--repeat", type=int, default=3, help="Execuções por caso (vale a mais rápida)")
+    parser.add_argument("--backend", choices=["null", "mongomock", "mongo"], default="null")
+    parser.add_argument("--db", default="gdelt_benchmark", help="Banco usado com --backend mongo/mongomock")
+    parser.add_argument("--work-dir", default=None, help="Diretório das fixtures ampliadas (padrão: temporário)")
+    parser.add_argument("--output", default=None, help="Arquivo JSON de saída")
+    parser.add_argument("--compare", default=None, help="JSON de uma execução anterior para comparar")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args(argv)
+
+    paths = {"events": args.events, "mentions": args.mentions, "gkg": args.gkg}
+    file_types = args.types or [file_type for file_type, path in paths.items() if path]
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="gdelt-bench-")
+    os.makedirs(work_dir, exist_ok=True)
+
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for file_type in file_types:
+        if not paths[file_type] or not os.path.exists(paths[file_type]):
+            print(f"Fixture de {file_type} não encontrada ({paths[file_type]}); pulando.")
+            continue
+        for scale in args.scale:
+            path = build_scaled_fixture(paths[file_type], file_type, scale, work_dir)
+            case = {
+                "file_type": file_type, "path": path, "backend": args.backend,
+                "db": args.db, "verbose": args.verbose,
+            }
+            runs = []
+            for _ in range(args.repeat):
+                with context.Pool(1) as pool:  # Processo novo: RSS e caches limpos
+                    runs.append(pool.apply(run_case, (case,)))
+            results.append({
+                "file_type": file_type,
+                "scale": scale,
+                "fixture": os.path.basename(paths[file_type]),
+                "runs": runs,
+                "best": min(runs, key=lambda run: run["seconds"]["total"]),
+            })
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(results, baseline)
+
+    now = datetime.datetime.now()
+    output = args.output or os.path.join(BASE_DIR, "benchmark_results", f"ingest-{now:%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    report = {
+        "meta": {
+            "created_at": now.isoformat(timespec="seconds"),
+            "git_commit": _git_commit(),
+            "backend": args.backend,
+            "repeat": args.repeat,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "pandas": __import__("pandas").__version__,
+            "config": {
+                name: getattr(config, name, None)
+                for name in ("EVENTS_WRITE_STRATEGY", "EVENTS_WRITE_BATCH_SIZE", "GKG_CHUNK_SIZE", "GKG_PARSE_FIELDS")
+            },
+        },
+        "results": results,
+    }
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Resultados gravados em {output}")
+
+
+if __name__ == "__main__":
+    main()
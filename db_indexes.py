@@ -0,0 +1,68 @@
+# db_indexes.py
+"""
+Declaração dos índices das coleções do GDELT, criados uma única vez na
+inicialização (e não a cada consulta).
+
+    eventos:  GlobalEventID (único), Day, DATEADDED, _ingested_at, EventRootCode, loc (2dsphere)
+    menções:  GlobalEventID, MentionIdentifier
+    GKG:      GKGRECORDID (único), Themes (multikey), Tone.tone, Locations.loc (2dsphere)
+
+create_indexes é idempotente no MongoDB: se o índice já existe com as mesmas
+opções, nada é feito.
+"""
+import logging
+import threading
+
+from pymongo import ASCENDING, GEOSPHERE, IndexModel
+
+import config
+import mongo_pool
+
+# nome do atributo em config.py com o nome da coleção -> índices
+INDEXES = {
+    "EVENTS_COLLECTION_NAME": [
+        IndexModel([("GlobalEventID", ASCENDING)], unique=True, name="GlobalEventID_unique"),
+        IndexModel([("Day", ASCENDING)], name="Day"),
+        IndexModel([("DATEADDED", ASCENDING)], name="DATEADDED"),  # Watermark do event_store
+        IndexModel([("_ingested_at", ASCENDING)], name="_ingested_at"),  # Watermark de related_events
+        IndexModel([("EventRootCode", ASCENDING)], name="EventRootCode"),
+        IndexModel([("loc", GEOSPHERE)], name="loc_2dsphere"),
+    ],
+    "MENTIONS_COLLECTION_NAME": [
+        IndexModel([("GlobalEventID", ASCENDING)], name="GlobalEventID"),
+        IndexModel([("MentionIdentifier", ASCENDING)], name="MentionIdentifier"),
+    ],
+    "GKG_COLLECTION_NAME": [
+        IndexModel([("GKGRECORDID", ASCENDING)], unique=True, name="GKGRECORDID_unique"),
+        # Campos gerados por gkg_fields (config.GKG_PARSE_FIELDS)
+        IndexModel([("Themes", ASCENDING)], name="Themes"),
+        IndexModel([("Tone.tone", ASCENDING)], name="Tone_tone"),
+        IndexModel([("Locations.loc", GEOSPHERE)], name="Locations_loc_2dsphere"),
+    ],
+}
+
+_done = set()  # bancos já preparados neste processo
+_lock = threading.Lock()
+
+
+def ensure_indexes(db=None, force=False):
+    """
+    Cria os índices declarados em INDEXES (uma vez por banco e processo).
+
+    Args:
+        db: Banco de dados (padrão: mongo_pool.get_database()).
+        force: Recria a verificação mesmo se já foi feita neste processo.
+    """
+    db = db if db is not None else mongo_pool.get_database()
+    with _lock:
+        if db.name in _done and not force:
+            return
+        for config_name, indexes in INDEXES.items():
+            collection_name = getattr(config, config_name)
+            try:
+                created = db[collection_name].create_indexes(indexes)
+                logging.info(f"Índices de '{collection_name}' verificados: {', '.join(created)}.")
+            except Exception as e:
+                # Ex.: dados duplicados impedem um índice único; a ingestão continua
+                logging.error(f"Erro ao criar índices em '{collection_name}': {e}")
+        _done.add(db.name)
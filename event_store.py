@@ -0,0 +1,235 @@
+# event_store.py
+"""
+Armazenamento compacto, em memória, dos campos "quentes" dos eventos para as
+análises (related_events, dashboards, notebooks).
+
+Cada evento vira uma linha de um array estruturado do NumPy (40 bytes):
+
+    GlobalEventID (int64), Day (int32), DATEADDED (int64),
+    EventRootCode (int16, -1 se ausente), GoldsteinScale (float32),
+    ActionGeo_Lat / ActionGeo_Long (float32, NaN se ausente),
+    Actor1CountryCode / Actor2CountryCode (3 bytes)
+
+em vez de um dict do Python por documento. As linhas ficam ordenadas por Day,
+então um intervalo de dias é selecionado por busca binária.
+
+O snapshot é gravado em um diretório (np.save + meta.json) e carregado com
+memory-map (np.load(mmap_mode="r")): um job de análise abre milhões de
+eventos em milissegundos e o sistema operacional só lê as páginas usadas.
+refresh() traz do MongoDB apenas os eventos com DATEADDED acima do watermark
+do snapshot e os insere nas posições certas. Um store criado com um filtro
+(from_mongo(query)) guarda o filtro, inclusive no snapshot, e refresh() só
+traz os eventos novos que também o atendem.
+
+Uso:
+    store = event_store.EventStore.load()        # ou EventStore.from_mongo()
+    store.refresh()                              # só os eventos novos
+    store.save()
+    rows = store.select(20150218, 20150221, root_codes=[14, 18])
+    df = store.to_frame(rows)                    # ex.: related_events.match_related_events
+
+Configurações (opcionais em config.py):
+    EVENT_STORE_DIR  -> diretório do snapshot (padrão: event_store/ ao lado deste arquivo)
+"""
+import datetime
+import json
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+from bson import json_util
+
+import config
+import mongo_pool
+
+EVENT_DTYPE = np.dtype([
+    ("GlobalEventID", "<i8"),
+    ("Day", "<i4"),
+    ("DATEADDED", "<i8"),
+    ("EventRootCode", "<i2"),
+    ("GoldsteinScale", "<f4"),
+    ("ActionGeo_Lat", "<f4"),
+    ("ActionGeo_Long", "<f4"),
+    ("Actor1CountryCode", "S3"),
+    ("Actor2CountryCode", "S3"),
+])
+SNAPSHOT_VERSION = 1
+_BATCH = 50000  # Documentos convertidos por vez ao ler do MongoDB
+
+
+def _default_dir():
+    return getattr(config, "EVENT_STORE_DIR", None) or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "event_store"
+    )
+
+
+def _events_collection():
+    return mongo_pool.get_collection(config.EVENTS_COLLECTION_NAME)
+
+
+def records_from_frame(df):
+    """Converte um DataFrame de eventos (colunas do MongoDB) em linhas EVENT_DTYPE."""
+    rows = np.empty(len(df), dtype=EVENT_DTYPE)
+    rows["GlobalEventID"] = df["GlobalEventID"].to_numpy(dtype=np.int64)
+    rows["Day"] = df["Day"].to_numpy(dtype=np.int32)
+    rows["DATEADDED"] = pd.to_numeric(df["DATEADDED"], errors="coerce").fillna(0).to_numpy(dtype=np.int64)
+    rows["EventRootCode"] = (
+        pd.to_numeric(df["EventRootCode"].astype("object"), errors="coerce").fillna(-1).to_numpy(dtype=np.int16)
+    )
+    for name in ("GoldsteinScale", "ActionGeo_Lat", "ActionGeo_Long"):
+        rows[name] = pd.to_numeric(df[name], errors="coerce").to_numpy(dtype=np.float32)
+    for name in ("Actor1CountryCode", "Actor2CountryCode"):
+        rows[name] = df[name].astype("object").fillna("").astype(str).str.slice(0, 3).to_numpy(dtype="S3")
+    return rows
+
+
+def _read_mongo(query):
+    projection = {"_id": 0, **{name: 1 for name in EVENT_DTYPE.names}}
+    cursor = _events_collection().find(query, projection, batch_size=10000)
+    parts, batch = [], []
+    for doc in cursor:
+        batch.append(doc)
+        if len(batch) >= _BATCH:
+            parts.append(records_from_frame(pd.DataFrame(batch, columns=EVENT_DTYPE.names)))
+            batch = []
+    if batch or not parts:
+        parts.append(records_from_frame(pd.DataFrame(batch, columns=EVENT_DTYPE.names)))
+    return np.concatenate(parts)
+
+
+class EventStore:
+    """Eventos em um array estruturado ordenado por Day (ver EVENT_DTYPE)."""
+
+    def __init__(self, events=None, watermark=0, query=None):
+        self.events = events if events is not None else np.empty(0, dtype=EVENT_DTYPE)
+        self.watermark = int(watermark)  # Maior DATEADDED já carregado
+        self.query = query or {}  # Filtro dos eventos do store (from_mongo)
+
+    def __len__(self):
+        return len(self.events)
+
+    @property
+    def nbytes(self):
+        return self.events.nbytes
+
+    # --- Carga ---
+    @classmethod
+    def from_mongo(cls, query=None):
+        """Carrega os eventos do MongoDB (opcionalmente filtrados por `query`, mantido em refresh())."""
+        events = _read_mongo(query or {})
+        events = events[np.argsort(events["Day"], kind="stable")]
+        watermark = int(events["DATEADDED"].max()) if len(events) else 0
+        logging.info(f"Event store: {len(events)} eventos carregados do MongoDB ({events.nbytes / 1e6:.1f} MB).")
+        return cls(events, watermark, query)
+
+    def append(self, rows):
+        """
+        Insere linhas novas mantendo a ordem por Day.
+
+        Eventos que já existem (mesmo GlobalEventID) são substituídos pela
+        versão nova.
+        """
+        if not len(rows):
+            return 0
+        rows = rows[np.argsort(rows["Day"], kind="stable")]
+        events = self.events
+        replaced = np.isin(events["GlobalEventID"], rows["GlobalEventID"])
+        if replaced.any():
+            events = events[~replaced]
+        positions = np.searchsorted(events["Day"], rows["Day"], side="right")
+        self.events = np.insert(events, positions, rows)  # Cópia em memória (sai do memory-map)
+        self.watermark = max(self.watermark, int(rows["DATEADDED"].max()))
+        return len(rows)
+
+    def refresh(self):
+        """Traz do MongoDB só os eventos com DATEADDED acima do watermark (e que atendem a self.query)."""
+        query = {"DATEADDED": {"$gt": self.watermark}}
+        if self.query:
+            query = {"$and": [self.query, query]}
+        rows = _read_mongo(query)
+        added = self.append(rows)
+        logging.info(f"Event store: {added} eventos novos (watermark {self.watermark}).")
+        return added
+
+    # --- Snapshot ---
+    def save(self, directory=None):
+        """Grava o snapshot (events.npy + meta.json) de forma atômica."""
+        directory = directory or _default_dir()
+        os.makedirs(directory, exist_ok=True)
+        array_path = os.path.join(directory, "events.npy")
+        tmp_path = os.path.join(directory, f"events.{os.getpid()}.tmp.npy")
+        np.save(tmp_path, np.ascontiguousarray(self.events), allow_pickle=False)
+        os.replace(tmp_path, array_path)
+
+        meta = {
+            "version": SNAPSHOT_VERSION,
+            "count": len(self.events),
+            "watermark": self.watermark,
+            "query": json.loads(json_util.dumps(self.query)),  # Extended JSON (preserva datas etc.)
+            "dtype": EVENT_DTYPE.descr,
+            "saved_at": datetime.datetime.utcnow().isoformat(timespec="seconds"),
+        }
+        meta_path = os.path.join(directory, "meta.json")
+        with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(meta_path + ".tmp", meta_path)
+        logging.info(f"Event store: snapshot com {len(self.events)} eventos gravado em {directory}.")
+        return directory
+
+    @classmethod
+    def load(cls, directory=None, mmap=True):
+        """
+        Abre um snapshot (memory-mapped por padrão).
+
+        Retorna um EventStore vazio se não houver snapshot ou se ele for de
+        outra versão do formato (refresh() recarrega tudo do MongoDB).
+        """
+        directory = directory or _default_dir()
+        try:
+            with open(os.path.join(directory, "meta.json"), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            logging.info(f"Event store: nenhum snapshot em {directory}.")
+            return cls()
+        if meta.get("version") != SNAPSHOT_VERSION:
+            logging.warning(f"Event store: snapshot de versão {meta.get('version')} ignorado.")
+            return cls()
+        events = np.load(os.path.join(directory, "events.npy"), mmap_mode="r" if mmap else None, allow_pickle=False)
+        query = json_util.loads(json.dumps(meta.get("query") or {}))
+        return cls(events, meta["watermark"], query)
+
+    # --- Consultas ---
+    def select(self, start_day=None, end_day=None, root_codes=None, max_goldstein=None, with_geo=False):
+        """
+        Índices das linhas que atendem aos filtros.
+
+        Args:
+            start_day, end_day: Intervalo de Day (YYYYMMDD, inclusive), por busca binária.
+            root_codes: EventRootCode aceitos (ex.: [14, 18] ou ["14", "18"]).
+            max_goldstein: Só eventos com GoldsteinScale menor que este valor.
+            with_geo: Só eventos com ActionGeo_Lat/Long.
+        """
+        days = self.events["Day"]
+        lo = np.searchsorted(days, start_day, side="left") if start_day is not None else 0
+        hi = np.searchsorted(days, end_day, side="right") if end_day is not None else len(days)
+        rows = self.events[lo:hi]
+        mask = np.ones(len(rows), dtype=bool)
+        if root_codes is not None:
+            mask &= np.isin(rows["EventRootCode"], np.asarray([int(code) for code in root_codes], dtype=np.int16))
+        if max_goldstein is not None:
+            mask &= rows["GoldsteinScale"] < max_goldstein
+        if with_geo:
+            mask &= ~(np.isnan(rows["ActionGeo_Lat"]) | np.isnan(rows["ActionGeo_Long"]))
+        return lo + np.flatnonzero(mask)
+
+    def to_frame(self, rows=None):
+        """
+        DataFrame das linhas (todas, se `rows` for None), com as colunas
+        usadas por related_events.match_related_events.
+        """
+        events = self.events if rows is None else self.events[rows]
+        df = pd.DataFrame({name: events[name] for name in EVENT_DTYPE.names})
+        for name in ("Actor1CountryCode", "Actor2CountryCode"):
+            df[name] = df[name].str.decode("ascii")
+        return df.astype({"Day": "int64", "ActionGeo_Lat": "float64", "ActionGeo_Long": "float64"})
@@ -1,115 +1,168 @@
 # db_operations/events_db.py
-from pymongo import MongoClient, UpdateOne
+from pymongo import UpdateOne
 import logging
 import traceback
 import config
+import mongo_pool
+import sinks
+import metrics
+import schemas
+import archive_reader
 import pandas as pd
-import zipfile
-import io
+import time
+import datetime
 
 
 def insert_events_data(file_content, url):
-    """Insere dados de eventos no MongoDB, evitando duplicatas."""
-    client = None  # Inicializa a variável client
+    """
+    Insere dados de eventos no MongoDB, evitando duplicatas.
+
+    Retorna o número de linhas gravadas, ou None se a leitura/gravação falhar.
+    """
+    df = parse_events_data(file_content, url)
+    if df is None:
+        return None
+    if not sinks.begin("events", url):
+        return None
+    return sinks.write("events", df, url)  # MongoDB (write_events_data) e demais sinks configurados
+
+
+def parse_events_data(file_content, url):
+    """
+    Lê o CSV de eventos contido no zip e retorna um DataFrame já renomeado.
+
+    Retorna None se não houver CSV ou se a leitura falhar.
+    """
+    df = None
+    # --- Lógica de leitura do CSV de EVENTOS ---
     try:
-        client = MongoClient(config.MONGODB_URL)
-        db = client[config.DB_NAME]
-        collection = db[config.EVENTS_COLLECTION_NAME]
-
-        # --- Lógica de leitura do CSV de EVENTOS ---
-        try:
-            with zipfile.ZipFile(file_content) as outer_zip:
-                for filename in outer_zip.namelist():
-                    if filename.lower().endswith('.csv'):
-                        with outer_zip.open(filename) as f:
-                            df = pd.read_csv(f, sep='\t', header=None)
-                            logging.info(f"Arquivo CSV '{filename}' lido (eventos de {url}).")
-                            df.dropna(subset=[0], inplace=True)
-                            columns_to_drop = [  # Adapte!
-                                8, 9, 10, 11, 13, 14, 15,
-                                21, 22, 23, 24, 25,
-                                37, 43, 44, 51, 52, 59
-                            ]
-                            existing_columns = [col for col in columns_to_drop if col in df.columns]
-                            df.drop(columns=existing_columns, inplace=True, errors='ignore')
-                            # --- RENOMEAR COLUNAS (Eventos) ---
-                            df = df.rename(columns={
-                                0: "GlobalEventID",
-                                1: "Day",
-                                2: "MonthYear",
-                                3: "Year",
-                                4: "FractionDate",
-                                5: "Actor1Code",
-                                6: "Actor1Name",
-                                7: "Actor1CountryCode",
-                                12: "Actor1Type1Code",
-                                16: "Actor2Code",
-                                17: "Actor2Name",
-                                18: "Actor2CountryCode",
-                                19: "Actor2KnownGroupCode",
-                                20: "Actor2EthnicCode",
-                                26: "IsRootEvent",
-                                27: "EventCode",
-                                28: "EventBaseCode",
-                                29: "EventRootCode",
-                                30: "QuadClass",
-                                31: "GoldsteinScale",
-                                32: "NumMentions",
-                                33: "NumSources",
-                                34: "NumArticles",
-                                35: "AvgTone",
-                                36: "Actor1Geo_Type",
-                                38: "Actor1Geo_CountryCode",
-                                39: "Actor1Geo_ADM1Code",
-                                40: "Actor1Geo_ADM2Code",
-                                41: "Actor1Geo_Lat",
-                                42: "Actor1Geo_Long",
-                                45: "Actor2Geo_FullName",
-                                46: "Actor2Geo_CountryCode",
-                                47: "Actor2Geo_ADM1Code",
-                                48: "Actor2Geo_ADM2Code",
-                                49: "Actor2Geo_Lat",
-                                50: "Actor2Geo_Long",
-                                53: "ActionGeo_FullName",
-                                54: "ActionGeo_CountryCode",
-                                55: "ActionGeo_ADM1Code",
-                                56: "ActionGeo_ADM2Code",
-                                57: "ActionGeo_Lat",
-                                58: "ActionGeo_Long",
-                                60: "DATEADDED",
-                                61: "SOURCEURL",  # Já existe para eventos
-                            })
-
-
-        except Exception as e:
-            logging.error(f"Erro ao ler CSV de eventos de {url}: {e}")
-            traceback.print_exc()
-            return
-
-        # --- FIM da lógica de leitura ---
-
-        operations = []
-        for record in df.to_dict("records"):
-            operations.append(
-                UpdateOne(
-                    {"GlobalEventID": record["GlobalEventID"]},
-                    {"$set": record},
-                    upsert=True,
-                )
-            )
+        with archive_reader.open_archive(file_content) as archive:
+            for filename, f in archive.iter_csv():
+                # Nomes, colunas carregadas e dtypes vêm do esquema central
+                df = pd.read_csv(f, **schemas.read_csv_kwargs("events"))
+                logging.info(f"Arquivo CSV '{filename}' lido (eventos de {url}).")
+
+
+    except Exception as e:
+        logging.error(f"Erro ao ler CSV de eventos de {url}: {e}")
+        traceback.print_exc()
+        return None
+
+    # --- FIM da lógica de leitura ---
+
+    if df is None:
+        logging.warning(f"Nenhum CSV encontrado em: {url}")
+    return df
+
+
+def build_geo_points(df):
+    """
+    Monta o campo 'loc' (GeoJSON Point) a partir de ActionGeo_Long/ActionGeo_Lat.
+
+    Retorna uma lista com um Point por linha, ou None quando as coordenadas
+    estão ausentes ou fora dos limites (nesses casos 'loc' não é gravado, já
+    que o índice 2dsphere rejeita geometrias inválidas).
+    """
+    lat = pd.to_numeric(df["ActionGeo_Lat"], errors="coerce").to_numpy(dtype="float64")
+    lon = pd.to_numeric(df["ActionGeo_Long"], errors="coerce").to_numpy(dtype="float64")
+    valid = (lat >= -90) & (lat <= 90) & (lon >= -180) & (lon <= 180)  # NaN -> False
+    return [
+        {"type": "Point", "coordinates": [x, y]} if ok else None
+        for x, y, ok in zip(lon.tolist(), lat.tolist(), valid.tolist())
+    ]
+
+
+def _upsert_records(collection, records):
+    # Um UpdateOne(upsert=True) por linha, em bulk não ordenado
+    operations = [
+        UpdateOne(
+            {"GlobalEventID": record["GlobalEventID"]},
+            {"$set": record},
+            upsert=True,
+        )
+        for record in records
+    ]
+    result = collection.bulk_write(operations, ordered=False)
+    return result.upserted_count, result.modified_count
 
-        if operations:
-            result = collection.bulk_write(operations)
-            logging.info(
-                f"Eventos de {url}: Inseridos/Atualizados {result.upserted_count} documentos, "
-                f"{result.modified_count} modificados."
+
+def _insert_first_records(collection, records):
+    # Tenta inserir tudo; só os GlobalEventID que já existem voltam pelo caminho de upsert
+    inserted, duplicates = mongo_pool.insert_unordered(collection, records)
+    if not duplicates:
+        return inserted, 0
+    retry = [records[i] for i in duplicates]
+    for record in retry:
+        record.pop("_id", None)  # _id gerado pelo insert_many não pode ir no $set
+    upserted, modified = _upsert_records(collection, retry)
+    return inserted + upserted, modified
+
+
+_WRITE_STRATEGIES = {
+    "upsert": _upsert_records,
+    "insert_first": _insert_first_records,
+}
+
+
+def write_events_data(df, url):
+    """
+    Grava um DataFrame de eventos no MongoDB, evitando duplicatas.
+
+    A escrita é feita em lotes não ordenados de config.EVENTS_WRITE_BATCH_SIZE
+    linhas (padrão: 5000), com a estratégia de config.EVENTS_WRITE_STRATEGY:
+        "upsert"       -> UpdateOne(upsert=True) para cada linha (padrão)
+        "insert_first" -> insert_many não ordenado; apenas os GlobalEventID
+                          que já existem (erro de chave duplicada) são
+                          regravados com upsert. Bem mais rápido em backfill.
+
+    Cada documento recebe _ingested_at (data/hora UTC da gravação), usado como
+    watermark pela passagem incremental de related_events: arquivos ingeridos
+    fora da ordem de DATEADDED (backfill, novas tentativas) não ficam para trás.
+
+    Retorna o número de linhas gravadas, ou None em caso de erro.
+    """
+    try:
+        collection = mongo_pool.get_collection(config.EVENTS_COLLECTION_NAME)
+        strategy = getattr(config, "EVENTS_WRITE_STRATEGY", "upsert")
+        write_batch = _WRITE_STRATEGIES[strategy]
+        batch_size = getattr(config, "EVENTS_WRITE_BATCH_SIZE", 5000)
+
+        records = df.to_dict("records")
+        ingested_at = datetime.datetime.utcnow()
+        for record, loc in zip(records, build_geo_points(df)):
+            record["_ingested_at"] = ingested_at
+            if loc is not None:
+                record["loc"] = loc  # Usado pelas consultas $nearSphere de related_events
+
+        if not records:
+            logging.info(f"Nenhum dado de evento para inserir de {url}.")
+            return 0
+
+        written = modified = 0
+        started = time.perf_counter()
+        for i in range(0, len(records), batch_size):
+            batch = records[i : i + batch_size]
+            batch_started = time.perf_counter()
+            batch_written, batch_modified = write_batch(collection, batch)
+            written += batch_written
+            modified += batch_modified
+            batch_seconds = time.perf_counter() - batch_started
+            metrics.observe("mongo_write_batch_seconds", batch_seconds, collection="events", strategy=strategy)
+            logging.debug(
+                "Eventos de %s: lote %d (%d linhas, %s) gravado em %.3fs.",
+                url, i // batch_size + 1, len(batch), strategy, batch_seconds,
             )
-        else:
-            logging.info("Nenhum dado de evento para inserir de {url}.")
+
+        logging.info(
+            f"Eventos de {url}: Inseridos/Atualizados {written} documentos, "
+            f"{modified} modificados ({strategy}, {time.perf_counter() - started:.2f}s)."
+        )
+        return len(records)
 
     except Exception as e:
         logging.error(f"Erro ao inserir dados de eventos de {url} no MongoDB: {e}")
         traceback.print_exc()
-    finally:
-        if client:  # Fecha a conexão, se existir
-            client.close()
\ No newline at end of file
+        return None
+
+
+sinks.register_mongo_writer("events", write_events_data)
@@ -0,0 +1,167 @@
+# follower.py
+"""
+Modo contínuo da ingestão: acompanha o manifesto "lastupdate" do GDELT e
+ingere cada atualização de 15 minutos assim que ela é publicada.
+
+O manifesto tem o mesmo formato do masterfile ("tamanho hash url", uma linha
+por arquivo: export, mentions e GKG da última atualização) e pode ser uma URL
+HTTP(S) ou um arquivo local (útil para testes). A cada consulta, os arquivos
+novos passam pelo pipeline (pipeline.run_pipeline) e, se houver um arquivo de
+eventos, roda a passagem incremental de related_events
+(find_related_events_incremental: só os eventos gravados desde a última
+passagem, pelo _ingested_at, e os da janela de tempo dos seus dias).
+
+O processo fica vivo entre as consultas, então o cliente do MongoDB
+(mongo_pool), a sessão HTTP do manifesto, os sinks e os módulos de parse
+continuam prontos para a próxima atualização.
+
+Uso:
+    python follower.py
+
+Configurações (opcionais em config.py):
+    FOLLOW_MANIFEST_URL    -> URL ou caminho do manifesto (padrão: lastupdate-translation.txt do GDELT)
+    FOLLOW_INTERVAL        -> segundos entre consultas (padrão: 30)
+    FOLLOW_RELATED_EVENTS  -> roda a passagem incremental de related_events (padrão: True)
+    STREAMS                -> tipos de arquivo ingeridos (padrão: todos)
+"""
+import calendar
+import logging
+import signal
+import threading
+import time
+import traceback
+
+import requests
+
+import config
+import db_indexes
+import manifest
+import masterfile
+import metrics
+import mongo_pool
+import pipeline
+import related_events
+import sinks
+import utils
+
+DEFAULT_MANIFEST_URL = "http://data.gdeltproject.org/gdeltv2/lastupdate-translation.txt"
+
+
+class Follower:
+    """Consulta o manifesto periodicamente e ingere os arquivos novos."""
+
+    def __init__(self, manifest_url=None, interval=None, streams=None):
+        self.manifest_url = manifest_url or getattr(config, "FOLLOW_MANIFEST_URL", DEFAULT_MANIFEST_URL)
+        self.interval = interval or getattr(config, "FOLLOW_INTERVAL", 30)
+        self.streams = streams or getattr(config, "STREAMS", None)
+        self._session = requests.Session()  # Conexão HTTP reaproveitada entre consultas
+        self._done = set()  # URLs já ingeridas por este processo
+        self._stop = threading.Event()
+
+    def stop(self, *args):
+        """Encerra o laço de run() após a consulta em andamento."""
+        self._stop.set()
+
+    def fetch_manifest(self):
+        """Lê o manifesto e retorna as entradas (MasterfileEntry) dos tipos seguidos."""
+        if self.manifest_url.startswith(("http://", "https://")):
+            response = self._session.get(self.manifest_url, timeout=getattr(config, "REQUEST_TIMEOUT", 30))
+            response.raise_for_status()
+            text = response.text
+        else:
+            with open(self.manifest_url, "r", encoding="utf-8") as f:
+                text = f.read()
+        entries = [masterfile.parse_line(line) for line in text.splitlines() if line.strip()]
+        return [
+            entry for entry in entries
+            if entry is not None and entry.file_type is not None
+            and (not self.streams or entry.file_type in self.streams)
+        ]
+
+    def poll_once(self):
+        """
+        Uma consulta: ingere os arquivos novos do manifesto e relaciona os
+        eventos recém-adicionados.
+
+        Returns:
+            Dicionário com 'files' (arquivos novos), 'processed', 'failed' e
+            'related' (eventos relacionados).
+        """
+        current = self.fetch_manifest()
+        # Mantém só as URLs do manifesto atual (o conjunto não cresce sem limite)
+        self._done &= {entry.url for entry in current}
+        entries = [entry for entry in current if entry.url not in self._done]
+        pending = manifest.filter_pending([(entry.size, entry.file_hash, entry.url) for entry in entries])
+        pending_urls = {url for _, _, url in pending}
+        self._done.update(entry.url for entry in entries if entry.url not in pending_urls)
+        if not pending:
+            return {"files": 0, "processed": 0, "failed": 0, "related": 0}
+
+        logging.info(f"Follower: {len(pending)} arquivos novos no manifesto.")
+        result = pipeline.run_pipeline(pending)
+        if not result["failed"]:
+            self._done.update(pending_urls)  # Com falhas, a próxima consulta tenta de novo
+
+        new_entries = [entry for entry in entries if entry.url in pending_urls]
+        now = time.time()
+        for entry in new_entries:
+            published = calendar.timegm(time.strptime(  # Timestamps do GDELT são UTC
+                str(entry.timestamp), "%Y%m%d%H%M%S")
+            )
+            metrics.set_gauge("follower_lag_seconds", now - published, file_type=entry.file_type)
+
+        related = 0
+        event_entries = [entry for entry in new_entries if entry.file_type == "events"]
+        if event_entries and getattr(config, "FOLLOW_RELATED_EVENTS", True):
+            with metrics.timer("etl_stage_seconds", stage="related_events"):
+                related = related_events.find_related_events_incremental(
+                    config.MONGODB_URL, config.DB_NAME, config.EVENTS_COLLECTION_NAME,
+                    config.MENTIONS_COLLECTION_NAME,
+                )
+        return {"files": len(pending), **{k: result[k] for k in ("processed", "failed")}, "related": related}
+
+    def run(self, max_polls=None):
+        """Consulta o manifesto a cada `interval` segundos até stop() (ou `max_polls` consultas)."""
+        logging.info(f"Follower iniciado: {self.manifest_url} a cada {self.interval}s.")
+        polls = 0
+        while not self._stop.is_set():
+            started = time.perf_counter()
+            try:
+                summary = self.poll_once()
+                if summary["files"]:
+                    logging.info(
+                        f"Follower: {summary['processed']}/{summary['files']} arquivos ingeridos, "
+                        f"{summary['failed']} falhas, {summary['related']} eventos relacionados "
+                        f"em {time.perf_counter() - started:.1f}s."
+                    )
+                metrics.inc("follower_polls_total", status="ok")
+            except Exception as e:
+                # Manifesto indisponível etc.: tenta de novo na próxima consulta
+                metrics.inc("follower_polls_total", status="error")
+                logging.error(f"Erro na consulta do follower ({self.manifest_url}): {e}")
+                traceback.print_exc()
+            polls += 1
+            if max_polls is not None and polls >= max_polls:
+                break
+            self._stop.wait(max(0.0, self.interval - (time.perf_counter() - started)))
+        self._session.close()
+        logging.info("Follower encerrado.")
+
+
+def main():
+    utils.setup_logging(config.LOG_FILE)
+    metrics.start_exporter()
+    follower = Follower()
+    signal.signal(signal.SIGTERM, follower.stop)
+    signal.signal(signal.SIGINT, follower.stop)
+    try:
+        db_indexes.ensure_indexes()
+        follower.run()
+    finally:
+        sinks.close_sinks()
+        mongo_pool.close_client()
+        metrics.stop_exporter()
+
+
+if __name__ == "__main__":
+    main()
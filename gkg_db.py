@@ -1,137 +1,168 @@
 # db_operations/gkg_db.py
-from pymongo import MongoClient
 import logging
 import traceback
 import config
+import mongo_pool
+import sinks
+import schemas
+import archive_reader
+import gkg_fields
 import pandas as pd
-import zipfile
-import io
 
 def insert_gkg_data(file_content, url):
-    """Insere dados do GKG no MongoDB."""
-    client = None  # Inicializa a variável client
+    """
+    Insere dados do GKG no MongoDB.
+
+    Com config.GKG_STREAMING (padrão: True) o CSV é lido e inserido em blocos
+    de config.GKG_CHUNK_SIZE linhas, então a memória não cresce com o arquivo.
+
+    Retorna o número de linhas gravadas, ou None se a leitura/gravação falhar.
+    """
+    if not getattr(config, "GKG_STREAMING", True):
+        df = parse_gkg_data(file_content, url)
+        if df is None or not sinks.begin("gkg", url):
+            return None
+        return sinks.write("gkg", df, url)  # MongoDB (write_gkg_data) e demais sinks configurados
+
+    if not sinks.begin("gkg", url):
+        return None
+    total = 0
+    try:
+        for part, chunk in enumerate(iter_gkg_chunks(file_content, url)):
+            written = sinks.write("gkg", chunk, url, part)
+            if written is None:
+                return None
+            total += written
+    except Exception as e:
+        logging.error(f"Erro ao ler CSV do GKG de {url}: {e}")
+        traceback.print_exc()
+        return None
+    return total
+
+
+def parse_gkg_data(file_content, url):
+    """
+    Lê o CSV do GKG contido no zip e retorna um DataFrame já renomeado.
+
+    Retorna None se não houver CSV ou se a leitura falhar.
+    """
+    try:
+        chunks = list(iter_gkg_chunks(file_content, url))
+    except Exception as e:
+        logging.error(f"Erro ao ler CSV do GKG de {url}: {e}")
+        traceback.print_exc()
+        return None
+
+    if not chunks:
+        logging.warning(f"Nenhum dado do GKG lido de: {url}")
+        return None
+    return pd.concat(chunks, ignore_index=True)
+
+
+def _is_gkg_v1(first_field):
+    """GKG V2.1 e V2.0 possuem header, a V1.0 não possui: o 1º campo da V1.0 é numérico."""
+    try:
+        # Tenta converter para float
+        float(first_field)
+        return True
+    except (ValueError, TypeError):
+        return False
+
+
+def iter_gkg_chunks(file_content, url, chunksize=None):
+    """
+    Lê o CSV do GKG em blocos e gera DataFrames já renomeados e limpos.
+
+    Apenas a primeira linha é lida antes para detectar a versão (V1.0 sem
+    header, V2.0/V2.1 com header); o restante é consumido em blocos de
+    `chunksize` linhas (padrão: config.GKG_CHUNK_SIZE). Com
+    config.GKG_PARSE_FIELDS os campos delimitados de cada bloco são
+    convertidos por gkg_fields.parse_fields.
+
+    Args:
+        file_content: Arquivo zip (caminho, arquivo ou stream; ver archive_reader).
+        url: URL de origem (usada nos logs).
+        chunksize: Número máximo de linhas por bloco.
+
+    Yields:
+        DataFrames com no máximo `chunksize` linhas.
+
+    Raises:
+        ValueError: Zip sem CSV ou arquivo sem a coluna GKGRECORDID (ex.: V2.1
+            sem header), para que o arquivo seja registrado como falha.
+    """
+    chunksize = chunksize or getattr(config, "GKG_CHUNK_SIZE", 5000)
+    found = False
+    with archive_reader.open_archive(file_content) as archive:
+        for filename, f in archive.iter_csv():
+            found = True
+            # Lê só a primeira linha para detectar a versão do arquivo
+            first_line, f = archive_reader.peek_line(f)
+            fields = first_line.decode("utf-8", errors="replace").rstrip("\r\n").split("\t")
+            is_v1 = _is_gkg_v1(fields[0])
+            logging.info("Detectado GKG V1.0" if is_v1 else "Detectado GKG V2.0/V2.1")
+
+            if is_v1:
+                kwargs = schemas.read_csv_kwargs("gkg", columns=schemas.GKG_COLUMNS[:len(fields)])
+            else:
+                # O header é substituído pelos nomes finais (V2.1X -> V2_1X)
+                header = fields
+                kwargs = schemas.read_csv_kwargs(
+                    "gkg", columns=[schemas.GKG_V2_RENAMES.get(name, name) for name in header]
+                )
+                kwargs["header"] = 0
+                if "GKGRECORDID" not in kwargs["names"]:
+                    raise ValueError(f"Coluna GKGRECORDID não encontrada no arquivo GKG: {url}")
+
+            # Nomes, colunas carregadas e dtypes vêm do esquema central
+            reader = pd.read_csv(f, chunksize=chunksize, **kwargs)
+
+            rows = 0
+            for chunk in reader:
+                # Removendo linhas com GKGRECORDID nulo
+                chunk = chunk.dropna(subset=["GKGRECORDID"])
+                rows += len(chunk)
+                if len(chunk):
+                    if gkg_fields.is_enabled():
+                        # Temas, pessoas, locais, tom e GCAM em arrays/subdocumentos
+                        chunk = gkg_fields.parse_fields(chunk)
+                    yield chunk
+
+            logging.info(f"Arquivo CSV '{filename}' lido (GKG de {url}, {rows} linhas).")
+    if not found:
+        raise ValueError(f"Nenhum CSV encontrado em: {url}")
+
+
+def write_gkg_data(df, url):
+    """
+    Grava um DataFrame do GKG no MongoDB.
+
+    GKGRECORDID é usado como _id e o insert é não ordenado: registros que já
+    existem (chave duplicada) são ignorados, então reprocessar um arquivo não
+    duplica documentos.
+
+    Retorna o número de documentos inseridos (sem os que já existiam), ou
+    None em caso de erro.
+    """
     try:
-        client = MongoClient(config.MONGODB_URL)
-        db = client[config.DB_NAME]
-        collection = db[config.GKG_COLLECTION_NAME]  # Coleção do GKG
-
-        # --- Lógica de leitura do CSV do GKG ---
-        try:
-            with zipfile.ZipFile(file_content) as outer_zip:
-                for filename in outer_zip.namelist():
-                    if filename.lower().endswith('.csv'):
-                        with outer_zip.open(filename) as f:
-                            # Especifica os tipos para evitar problemas e warnings
-                            df = pd.read_csv(f, sep='\t', header=None, dtype={0: str})
-                            logging.info(f"Arquivo CSV '{filename}' lido (GKG de {url}).")
-
-                            # GKG V2.1 e V2.0 possuem header, a V1.0 não possui
-                            # Verifica se a versão do arquivo é 1.0
-                            first_row = df.iloc[0]
-                            is_v1 = False
-                            try:
-                                # Tenta converter para float
-                                float(first_row[0])
-                                is_v1 = True
-                            except (ValueError, TypeError):
-                                pass
-
-                            if is_v1:
-                                logging.info("Detectado GKG V1.0")
-                                # --- LIMPEZA PARCIAL (GKG) ---
-                                # Removendo linhas com GKGRECORDID nulo
-                                df.dropna(subset=[0], inplace=True)
-                                columns_to_drop = []  # Adicione as colunas para remover
-                                existing_columns = [col for col in columns_to_drop if col in df.columns]
-                                df.drop(columns=existing_columns, inplace=True, errors='ignore')
-                                # --- RENOMEAR COLUNAS (GKG v1) ---
-                                df = df.rename(columns={
-                                    0: "GKGRECORDID",
-                                    1: "DATE",
-                                    2: "SourceCollectionIdentifier",
-                                    3: "SourceCommonName",
-                                    4: "DocumentIdentifier",
-                                    5: "V2Themes",
-                                    6: "V2Locations",
-                                    7: "V2Persons",
-                                    8: "V2Organizations",
-                                    9: "V1Counts",
-                                    10: "V2Tone",
-                                    11: "V2GCAM",
-                                    12: "V2_1EnhancedThemes",
-                                    13: "V2_1EnhancedLocations",
-                                    14: "V2_1EnhancedPersons",
-                                    15: "V2_1EnhancedOrganizations",
-                                    16: "V2_1Amounts",
-                                    17: "V2_1Quotations",
-                                    18: "V2_1AllNames",
-                                    19: "V2_1Amounts",
-                                    20: "V2_1TranslationInfo",
-                                    21: "Extras"
-                                })
-                            else:
-                                logging.info("Detectado GKG V2.0/V2.1")
-                                # Remove a primeira linha, que contem o header
-                                df = df.iloc[1:, :]
-                                # --- LIMPEZA PARCIAL (GKG) ---
-                                # Removendo linhas com GKGRECORDID nulo
-                                columns = df.columns.tolist()
-                                if "GKGRECORDID" not in columns:
-                                    logging.error(f"Coluna GKGRECORDID não encontrada no arquivo GKG: {url}")
-                                    return
-                                df.dropna(subset=["GKGRECORDID"], inplace=True)
-                                columns_to_drop = []  # Adicione as colunas para remover
-                                existing_columns = [col for col in columns_to_drop if col in df.columns]
-                                df.drop(columns=existing_columns, inplace=True, errors='ignore')
-                                 # --- RENOMEAR COLUNAS (GKG v2) ---
-                                try:  # Utiliza um try para caso algumas colunas estejam faltando
-                                    df = df.rename(columns={
-                                        "GKGRECORDID": "GKGRECORDID",
-                                        "DATE": "DATE",
-                                        "SourceCollectionIdentifier": "SourceCollectionIdentifier",
-                                        "SourceCommonName": "SourceCommonName",
-                                        "DocumentIdentifier": "DocumentIdentifier",
-                                        "V2Themes": "V2Themes",
-                                        "V2Locations": "V2Locations",
-                                        "V2Persons": "V2Persons",
-                                        "V2Organizations": "V2Organizations",
-                                        "V1Counts": "V1Counts",
-                                        "V2Tone": "V2Tone",
-                                        "V2GCAM": "V2GCAM",
-                                        "V2.1EnhancedThemes": "V2_1EnhancedThemes",
-                                        "V2.1EnhancedLocations": "V2_1EnhancedLocations",
-                                        "V2.1EnhancedPersons": "V2_1EnhancedPersons",
-                                        "V2.1EnhancedOrganizations": "V2_1EnhancedOrganizations",
-                                        "V2.1Amounts": "V2_1Amounts",
-                                        "V2.1Quotations": "V2_1Quotations",
-                                        "V2.1AllNames": "V2_1AllNames",
-                                        "V2.1Amounts": "V2_1Amounts",  # Corrigido: V2.1Amounts, não V2.1AllNames
-                                        "V2.1TranslationInfo": "V2_1TranslationInfo",
-                                        "Extras": "Extras"
-                                    })
-                                except Exception as e:
-                                    logging.warning(f"Erro ao renomear colunas: {e}")
-                                    # Se der erro, imprime as colunas para ajudar a debugar
-                                    logging.warning(f"Colunas presentes no DataFrame: {df.columns.tolist()}")
-
-        except Exception as e:
-            logging.error(f"Erro ao ler CSV do GKG de {url}: {e}")
-            traceback.print_exc()
-            return
-
-        # --- FIM da lógica de leitura ---
+        collection = mongo_pool.get_collection(config.GKG_COLLECTION_NAME)  # Coleção do GKG
 
         # Inserção (sem UpdateOne, pois GKGRECORDID é único)
         data_to_insert = df.to_dict("records")
+        inserted = 0
         if data_to_insert:
-            result = collection.insert_many(data_to_insert)
-            logging.info(f"GKG de {url}: Inseridos {len(result.inserted_ids)} documentos.")
+            for record in data_to_insert:
+                record["_id"] = record["GKGRECORDID"]
+            inserted, duplicates = mongo_pool.insert_unordered(collection, data_to_insert)
+            logging.info(f"GKG de {url}: Inseridos {inserted} documentos ({len(duplicates)} já existiam).")
         else:
             logging.info(f"Nenhum dado do GKG para inserir de {url} (DataFrame vazio).")
+        return inserted
 
     except Exception as e:
         logging.error(f"Erro ao inserir dados do GKG de {url} no MongoDB: {e}")
         traceback.print_exc()
-    finally:
-        if client:  # Fecha a conexão, se existir
-            client.close()
\ No newline at end of file
+        return None
+
+
+sinks.register_mongo_writer("gkg", write_gkg_data)
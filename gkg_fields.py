@@ -0,0 +1,181 @@
+# gkg_fields.py
+"""
+Parse vetorizado dos campos delimitados do GKG em arrays e subdocumentos.
+
+Os campos do GKG chegam como strings com vários níveis de delimitadores
+(";" entre itens, "," / "#" / ":" dentro de cada item). parse_fields() converte
+um bloco inteiro de uma vez (pandas .str.split / explode / to_numeric), sem
+laço de parse por linha:
+
+    Themes        -> ["TAX", "ECON_INFLATION", ...]            (V2_1EnhancedThemes ou V2Themes)
+    Persons       -> ["joe biden", ...]                        (V2_1EnhancedPersons ou V2Persons)
+    Organizations -> ["united nations", ...]                   (V2_1EnhancedOrganizations ou V2Organizations)
+    Locations     -> [{"type": 4, "name": ..., "country_code": ..., "adm1_code": ...,
+                       "adm2_code": ..., "lat": ..., "lon": ..., "feature_id": ...,
+                       "loc": {"type": "Point", "coordinates": [lon, lat]}}, ...]
+    Tone          -> {"tone": .., "positive": .., "negative": .., "polarity": ..,
+                      "activity_density": .., "self_group_density": .., "word_count": ..}
+    GCAM          -> {"wc": 125, "c2_21": 4, "v10_1": 3.21, ...}  ("." nas chaves vira "_")
+
+Com isso consultas por tema ou tom usam índices multikey/numéricos (ver
+db_indexes.py) em vez de $regex.
+
+Configurações (opcionais em config.py):
+    GKG_PARSE_FIELDS     -> aplica o parse na leitura do GKG (padrão: False)
+    GKG_KEEP_RAW_FIELDS  -> mantém também as strings originais (padrão: False)
+"""
+import numpy as np
+import pandas as pd
+
+import config
+
+# campo gerado -> colunas de origem, em ordem de preferência (a versão "Enhanced" tem offsets)
+LIST_FIELDS = {
+    "Themes": ["V2_1EnhancedThemes", "V2Themes"],
+    "Persons": ["V2_1EnhancedPersons", "V2Persons"],
+    "Organizations": ["V2_1EnhancedOrganizations", "V2Organizations"],
+}
+LOCATION_SOURCES = ["V2_1EnhancedLocations", "V2Locations"]
+TONE_SOURCE = "V2Tone"
+GCAM_SOURCE = "V2GCAM"
+
+TONE_FIELDS = ["tone", "positive", "negative", "polarity", "activity_density", "self_group_density", "word_count"]
+
+# Locations V1 (7 campos) e V2 enhanced (9 campos, com ADM2 e offset)
+_LOCATION_V1 = ["type", "name", "country_code", "adm1_code", "lat", "lon", "feature_id"]
+_LOCATION_V2 = ["type", "name", "country_code", "adm1_code", "adm2_code", "lat", "lon", "feature_id", "offset"]
+
+
+def is_enabled():
+    return getattr(config, "GKG_PARSE_FIELDS", False)
+
+
+def _source(df, names):
+    """Primeira coluna de origem disponível por linha (a enhanced, se preenchida)."""
+    present = [name for name in names if name in df.columns]
+    if not present:
+        return None
+    series = df[present[0]].astype("object")
+    for name in present[1:]:
+        series = series.where(series.notna() & (series != ""), df[name].astype("object"))
+    return series.reset_index(drop=True)
+
+
+def _explode(series, sep):
+    """Itens não vazios de cada linha, indexados pela posição da linha (ordem preservada)."""
+    items = series.str.split(sep).explode()
+    return items[items.notna() & (items != "")]
+
+
+def _group(positions, values, n):
+    """Agrupa valores (já ordenados por posição) em uma lista por linha; None sem itens."""
+    out = [None] * n
+    if len(positions):
+        bounds = np.flatnonzero(np.diff(positions)) + 1
+        starts = np.concatenate(([0], bounds))
+        ends = np.concatenate((bounds, [len(positions)]))
+        for row, start, end in zip(positions[starts].tolist(), starts.tolist(), ends.tolist()):
+            out[row] = values[start:end]
+    return out
+
+
+def parse_list(series):
+    """'A,12;B,40;A,90' -> ['A', 'B'] (sem offsets e sem repetições, na ordem)."""
+    items = _explode(series, ";").str.split(",", n=1).str[0].str.strip()
+    items = items[items != ""]
+    frame = pd.DataFrame({"row": items.index.to_numpy(), "value": items.to_numpy()}).drop_duplicates()
+    return _group(frame["row"].to_numpy(), frame["value"].tolist(), len(series))
+
+
+def parse_locations(series):
+    """Locations ('#' entre campos, ';' entre locais) -> lista de subdocumentos tipados."""
+    items = _explode(series, ";")
+    if not len(items):
+        return [None] * len(series)
+    parts = items.str.split("#", expand=True).to_numpy(dtype=object)
+    # 8-9 campos = V2 enhanced (o offset é opcional); 7 = V1 (os dois podem vir no mesmo bloco)
+    is_v2 = (items.str.count("#") >= len(_LOCATION_V2) - 2).to_numpy()
+
+    def column(name):
+        values = np.full(len(parts), None, dtype=object)
+        for layout, mask in ((_LOCATION_V1, ~is_v2), (_LOCATION_V2, is_v2)):
+            if name in layout and layout.index(name) < parts.shape[1]:
+                values[mask] = parts[mask, layout.index(name)]
+        return pd.Series(values)
+
+    locations = pd.DataFrame({"type": pd.to_numeric(column("type"), errors="coerce").astype("Int8")})
+    for name in ("name", "country_code", "adm1_code", "adm2_code", "feature_id"):
+        values = column(name)
+        locations[name] = values.where(values != "")
+    lat = pd.to_numeric(column("lat"), errors="coerce").to_numpy(dtype="float64")
+    lon = pd.to_numeric(column("lon"), errors="coerce").to_numpy(dtype="float64")
+    locations["lat"] = lat
+    locations["lon"] = lon
+
+    records = locations.astype("object").where(locations.notna(), None).to_dict("records")
+    valid = (lat >= -90) & (lat <= 90) & (lon >= -180) & (lon <= 180)  # NaN -> False
+    for record, x, y, ok in zip(records, lon.tolist(), lat.tolist(), valid.tolist()):
+        if ok:
+            record["loc"] = {"type": "Point", "coordinates": [x, y]}
+    return _group(items.index.to_numpy(), records, len(series))
+
+
+def parse_tone(series):
+    """'1.2,3,4,5,6,7,8' -> {'tone': 1.2, ..., 'word_count': 8} (None se vazio)."""
+    parts = series.str.split(",", expand=True)
+    if parts.shape[1] == 0:
+        return [None] * len(series)
+    # Sempre float64: o tipo não pode variar entre blocos (ex.: schema do Parquet)
+    parts = parts.iloc[:, : len(TONE_FIELDS)].apply(pd.to_numeric, errors="coerce").astype("float64")
+    parts.columns = TONE_FIELDS[: parts.shape[1]]
+    valid = parts.notna().any(axis=1).to_numpy()
+    records = parts.astype("object").where(parts.notna(), None).to_dict("records")
+    return [record if ok else None for record, ok in zip(records, valid.tolist())]
+
+
+def parse_gcam(series):
+    """'wc:125,c2.21:4' -> {'wc': 125.0, 'c2_21': 4.0} (None se vazio)."""
+    items = _explode(series, ",").str.split(":", n=1, expand=True)
+    if items.shape[1] < 2:
+        return [None] * len(series)
+    values = pd.to_numeric(items[1], errors="coerce").astype("float64")
+    keep = values.notna().to_numpy()
+    keys = items[0].str.strip().str.replace(".", "_", regex=False).to_numpy()[keep]
+    positions = items.index.to_numpy()[keep]
+    grouped_keys = _group(positions, keys.tolist(), len(series))
+    grouped_values = _group(positions, values.to_numpy()[keep].tolist(), len(series))
+    return [dict(zip(k, v)) if k is not None else None for k, v in zip(grouped_keys, grouped_values)]
+
+
+def parse_fields(df, keep_raw=None):
+    """
+    Adiciona ao bloco do GKG os campos estruturados (Themes, Persons,
+    Organizations, Locations, Tone, GCAM) a partir das strings delimitadas.
+
+    Args:
+        df: DataFrame do GKG (como gerado por gkg_db.iter_gkg_chunks).
+        keep_raw: Mantém as colunas de origem (padrão: config.GKG_KEEP_RAW_FIELDS).
+
+    Returns:
+        Novo DataFrame; o original não é modificado.
+    """
+    keep_raw = getattr(config, "GKG_KEEP_RAW_FIELDS", False) if keep_raw is None else keep_raw
+    out = df.copy()
+    parsers = [(field, sources, parse_list) for field, sources in LIST_FIELDS.items()]
+    parsers += [
+        ("Locations", LOCATION_SOURCES, parse_locations),
+        ("Tone", [TONE_SOURCE], parse_tone),
+        ("GCAM", [GCAM_SOURCE], parse_gcam),
+    ]
+
+    used = set()
+    for field, sources, parser in parsers:
+        series = _source(df, sources)
+        if series is None:
+            continue
+        out[field] = pd.Series(parser(series), index=df.index, dtype="object")
+        used.update(name for name in sources if name in df.columns)
+
+    if not keep_raw:
+        out = out.drop(columns=sorted(used))
+    return out
@@ -0,0 +1,117 @@
+# html_extraction.py
+"""
+Extração de texto das páginas HTML dos artigos (etapa CPU-bound).
+
+A extração roda em um pool de processos separado das threads de download, então
+o parse do HTML não disputa o GIL com a rede e escala com o número de núcleos.
+
+Extratores disponíveis (todos juntam com " " o texto dos parágrafos <p>):
+    "html.parser" -> BeautifulSoup com o parser puro Python (padrão, comportamento original)
+    "lxml"        -> lxml.html (C), bem mais rápido; requer o pacote lxml
+
+Configurações (opcionais em config.py):
+    HTML_EXTRACTOR     -> nome do extrator (padrão: "html.parser")
+    EXTRACT_WORKERS    -> processos de extração (padrão: número de CPUs;
+                          0 = extrai em uma thread, sem processos extras)
+"""
+import atexit
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from bs4 import BeautifulSoup, UnicodeDammit
+
+import config
+
+try:
+    import lxml.html
+except ImportError:  # lxml é opcional
+    lxml = None
+
+
+def extract_p_text_bs4(html):
+    """Texto dos parágrafos (<p>) com BeautifulSoup + html.parser."""
+    soup = BeautifulSoup(html, "html.parser")
+    # Extrai o texto (método simples, pode precisar de ajustes)
+    return " ".join([p.text for p in soup.find_all("p")])
+
+
+def extract_p_text_lxml(html):
+    """Texto dos parágrafos (<p>) com lxml.html."""
+    if isinstance(html, bytes):
+        # Mesma detecção de encoding (meta charset, BOM, heurística) usada pelo BeautifulSoup
+        html = UnicodeDammit(html, is_html=True).unicode_markup or ""
+    if not html.strip():
+        return ""
+    try:
+        doc = lxml.html.fromstring(html)
+    except (lxml.etree.ParserError, ValueError):
+        return ""  # Documento vazio ou sem elementos
+    return " ".join([p.text_content() for p in doc.iter("p")])
+
+
+EXTRACTORS = {
+    "html.parser": extract_p_text_bs4,
+    "lxml": extract_p_text_lxml,
+}
+
+
+def get_extractor_name(name=None):
+    """
+    Nome do extrator a usar (config.HTML_EXTRACTOR por padrão).
+
+    Se o lxml for pedido e não estiver instalado, usa "html.parser".
+    """
+    name = name or getattr(config, "HTML_EXTRACTOR", "html.parser")
+    if name not in EXTRACTORS:
+        raise ValueError(f"Extrator HTML desconhecido: {name!r} (opções: {', '.join(EXTRACTORS)})")
+    if name == "lxml" and lxml is None:
+        logging.warning("Extrator 'lxml' indisponível (pacote lxml não instalado); usando 'html.parser'.")
+        return "html.parser"
+    return name
+
+
+def extract(html, name="html.parser"):
+    """Extrai o texto de uma página com o extrator indicado (executado nos workers)."""
+    return EXTRACTORS[name](html)
+
+
+# --- Pool de processos ---
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """
+    Pool de extração compartilhado (criado na primeira chamada).
+
+    Usa o método "spawn" para não herdar, via fork, o estado das threads de
+    download e das conexões abertas no processo principal.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            workers = getattr(config, "EXTRACT_WORKERS", os.cpu_count() or 1)
+            if workers <= 0:
+                _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="extract")
+            else:
+                _executor = ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            logging.debug("Pool de extração HTML criado (%d workers).", workers)
+        return _executor
+
+
+def shutdown():
+    """Encerra o pool de extração (registrado no atexit)."""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+            _executor = None
+
+
+atexit.register(shutdown)
@@ -0,0 +1,304 @@
+# keyword_index.py
+"""
+Índice invertido de palavras dos artigos: termo normalizado -> GlobalEventIDs.
+
+Substitui o filtro por palavras-chave com $regex sobre article_content (uma
+varredura da coleção por palavra) por listas de postings ordenadas: cada
+palavra de config.KEYWORDS vira a lista dos eventos cujos artigos a contêm, e
+a consulta com várias palavras é a interseção dessas listas (np.intersect1d).
+
+O índice é alimentado quando o texto dos artigos é extraído
+(url_processing.extract_content_from_urls): cada artigo é tokenizado e seus
+termos apontam para os eventos que citam a URL (SOURCEURL; nas menções,
+parse_mentions_data copia MentionIdentifier para SOURCEURL). Os pares
+(URL, GlobalEventID) já indexados ficam registrados em
+KEYWORD_INDEX_URLS_COLLECTION_NAME, então um artigo servido pelo cache ou
+extraído de novo em outra execução não é indexado duas vezes; só eventos
+novos que citam a URL entram no índice.
+
+Normalização dos termos: minúsculas, sem acentos, apenas letras e números,
+com pelo menos KEYWORD_INDEX_MIN_TOKEN_LENGTH caracteres. As palavras da
+consulta passam pela mesma normalização.
+
+Armazenamento (coleção config.KEYWORD_INDEX_COLLECTION_NAME, padrão
+"keyword_index"): cada lote indexado grava um segmento por termo
+
+    {"term": "protesto", "n": 3, "min": 410479387, "max": 410480012,
+     "dtype": "<u4", "postings": Binary(zlib(deltas))}
+
+com os IDs ordenados guardados como diferenças (deltas) comprimidas. Uma
+consulta une os segmentos de cada termo. Quando um termo gravado passa de
+KEYWORD_INDEX_MAX_SEGMENTS segmentos, eles são juntados em um só
+(compact(); sem argumentos compacta o índice inteiro).
+
+Configurações (opcionais em config.py):
+    KEYWORD_INDEX_ENABLED               -> indexa o texto extraído (padrão: True)
+    KEYWORD_INDEX_COLLECTION_NAME       -> nome da coleção (padrão: "keyword_index")
+    KEYWORD_INDEX_URLS_COLLECTION_NAME  -> URLs/eventos já indexados (padrão: "keyword_index_urls")
+    KEYWORD_INDEX_MIN_TOKEN_LENGTH      -> tamanho mínimo dos termos (padrão: 3)
+    KEYWORD_INDEX_MAX_SEGMENTS          -> segmentos por termo antes de compactar (padrão: 8)
+"""
+import hashlib
+import logging
+import re
+import threading
+import traceback
+import unicodedata
+import zlib
+
+import numpy as np
+import pandas as pd
+from bson import Binary
+from pymongo import ASCENDING, IndexModel, UpdateOne
+
+import config
+import mongo_pool
+
+_TOKEN_RE = re.compile(r"[^\W_]+")
+_SEGMENT_FIELDS = {"_id": 1, "term": 1, "dtype": 1, "postings": 1}
+INDEXES = [IndexModel([("term", ASCENDING)], name="term")]
+
+_indexes_ready = False
+_lock = threading.Lock()
+
+
+def is_enabled():
+    return getattr(config, "KEYWORD_INDEX_ENABLED", True)
+
+
+def _collection():
+    global _indexes_ready
+    collection = mongo_pool.get_collection(getattr(config, "KEYWORD_INDEX_COLLECTION_NAME", "keyword_index"))
+    with _lock:
+        if not _indexes_ready:
+            collection.create_indexes(INDEXES)  # Uma vez por processo
+            _indexes_ready = True
+    return collection
+
+
+def _urls_collection():
+    return mongo_pool.get_collection(getattr(config, "KEYWORD_INDEX_URLS_COLLECTION_NAME", "keyword_index_urls"))
+
+
+def _url_key(url):
+    return hashlib.blake2b(url.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def normalize(text):
+    """Minúsculas e sem acentos ("Ação" -> "acao")."""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def tokenize(text):
+    """Conjunto de termos normalizados de um texto."""
+    if not isinstance(text, str) or not text:
+        return set()
+    min_length = getattr(config, "KEYWORD_INDEX_MIN_TOKEN_LENGTH", 3)
+    return {token for token in _TOKEN_RE.findall(normalize(text)) if len(token) >= min_length}
+
+
+def query_terms(terms):
+    """
+    Termos de consulta normalizados como o texto indexado.
+
+    Uma expressão com várias palavras ("direitos humanos") vira um termo por
+    palavra. Palavras mais curtas que KEYWORD_INDEX_MIN_TOKEN_LENGTH nunca
+    são indexadas: são descartadas com um aviso em vez de não casar com nada.
+    """
+    kept = set()
+    for term in terms:
+        tokens = tokenize(term)
+        dropped = set(_TOKEN_RE.findall(normalize(term))) - tokens if isinstance(term, str) else set()
+        if dropped:
+            logging.warning(
+                f"Índice de palavras: {sorted(dropped)} (de {term!r}) ignorados na consulta, "
+                f"mais curtos que {getattr(config, 'KEYWORD_INDEX_MIN_TOKEN_LENGTH', 3)} caracteres."
+            )
+        kept |= tokens
+    return kept
+
+
+# --- Listas de postings ---
+def encode_postings(ids):
+    """IDs (ordenados, sem repetição) -> (dtype, bytes comprimidos das diferenças)."""
+    ids = np.asarray(ids, dtype=np.int64)
+    deltas = np.diff(ids, prepend=0)
+    dtype = "<u4" if len(deltas) and deltas.min() >= 0 and deltas.max() < 2 ** 32 else "<i8"
+    return dtype, zlib.compress(deltas.astype(dtype).tobytes())
+
+
+def decode_postings(dtype, blob):
+    """Inverso de encode_postings: array int64 ordenado."""
+    return np.cumsum(np.frombuffer(zlib.decompress(blob), dtype=dtype).astype(np.int64))
+
+
+def _segment(term, ids):
+    dtype, blob = encode_postings(ids)
+    return {"term": term, "n": len(ids), "min": int(ids[0]), "max": int(ids[-1]), "dtype": dtype, "postings": Binary(blob)}
+
+
+def build_postings(contents, url_events):
+    """
+    Monta as listas de postings em memória.
+
+    Args:
+        contents: Dicionário {url: texto do artigo}.
+        url_events: DataFrame com as colunas url e GlobalEventID.
+
+    Returns:
+        Dicionário {termo: array int64 ordenado de GlobalEventIDs}.
+    """
+    terms = pd.DataFrame(
+        [(url, sorted(tokenize(text))) for url, text in contents.items()], columns=["url", "term"]
+    ).explode("term").dropna()
+    if terms.empty:
+        return {}
+    pairs = terms.merge(url_events.dropna().drop_duplicates(), on="url")[["term", "GlobalEventID"]]
+    pairs = pairs.astype({"GlobalEventID": "int64"}).drop_duplicates().sort_values(["term", "GlobalEventID"])
+    if pairs.empty:
+        return {}
+    term_values = pairs["term"].to_numpy()
+    ids = pairs["GlobalEventID"].to_numpy()
+    starts = np.flatnonzero(np.r_[True, term_values[1:] != term_values[:-1]])
+    return dict(zip(term_values[starts], np.split(ids, starts[1:])))
+
+
+def _new_pairs(url_events):
+    """Remove os pares (url, GlobalEventID) já registrados como indexados."""
+    keys = {url: _url_key(url) for url in url_events["url"].unique()}
+    indexed = {}
+    for doc in _urls_collection().find({"_id": {"$in": list(keys.values())}}, {"url": 1, "events": 1}):
+        indexed[doc["url"]] = doc.get("events", [])
+    if not indexed:
+        return url_events
+    done = pd.DataFrame(
+        [(url, event_id) for url, events in indexed.items() for event_id in events],
+        columns=["url", "GlobalEventID"],
+    ).astype({"GlobalEventID": "int64"})
+    merged = url_events.merge(done, on=["url", "GlobalEventID"], how="left", indicator=True)
+    return merged.loc[merged["_merge"] == "left_only", ["url", "GlobalEventID"]]
+
+
+def _mark_indexed(url_events):
+    operations = [
+        UpdateOne(
+            {"_id": _url_key(url)},
+            {"$set": {"url": url}, "$addToSet": {"events": {"$each": [int(event_id) for event_id in ids]}}},
+            upsert=True,
+        )
+        for url, ids in url_events.groupby("url")["GlobalEventID"]
+    ]
+    if operations:
+        _urls_collection().bulk_write(operations, ordered=False)
+
+
+def index_articles(contents, df):
+    """
+    Indexa os artigos extraídos de um DataFrame de eventos ou menções.
+
+    Só os pares (URL, GlobalEventID) ainda não indexados são gravados; os
+    termos que passam de KEYWORD_INDEX_MAX_SEGMENTS segmentos são compactados.
+
+    Args:
+        contents: Dicionário {url: texto} (url_processing.fetch_contents).
+        df: DataFrame com GlobalEventID e SOURCEURL.
+
+    Returns:
+        Número de termos gravados, ou None em caso de erro.
+    """
+    if not is_enabled() or not contents or "GlobalEventID" not in df.columns or "SOURCEURL" not in df.columns:
+        return 0
+    try:
+        url_events = df[["SOURCEURL", "GlobalEventID"]].rename(columns={"SOURCEURL": "url"}).dropna()
+        url_events = url_events[url_events["url"].isin(contents.keys())]
+        url_events = url_events.astype({"GlobalEventID": "int64"}).drop_duplicates()
+        if url_events.empty:
+            return 0
+        url_events = _new_pairs(url_events)
+        if url_events.empty:
+            logging.debug("Índice de palavras: %d artigos já indexados.", len(contents))
+            return 0
+
+        urls = url_events["url"].unique()
+        postings = build_postings({url: contents[url] for url in urls}, url_events)
+        if postings:
+            _collection().insert_many([_segment(term, ids) for term, ids in postings.items()], ordered=False)
+        # Registra os pares depois dos segmentos: uma falha no meio só repete IDs (unidos na consulta)
+        _mark_indexed(url_events)
+        logging.info(f"Índice de palavras: {len(postings)} termos de {len(urls)} artigos indexados.")
+        if postings:
+            compact(list(postings), max_segments=getattr(config, "KEYWORD_INDEX_MAX_SEGMENTS", 8))
+        return len(postings)
+
+    except Exception as e:
+        logging.error(f"Erro ao indexar palavras dos artigos: {e}")
+        traceback.print_exc()
+        return None
+
+
+# --- Consulta ---
+def postings(terms):
+    """
+    Dicionário {termo normalizado: array de GlobalEventIDs} (segmentos unidos),
+    com os termos de query_terms(terms).
+    """
+    normalized = query_terms(terms)
+    segments = {term: [] for term in normalized}
+    for doc in _collection().find({"term": {"$in": list(normalized)}}, _SEGMENT_FIELDS):
+        segments[doc["term"]].append(decode_postings(doc["dtype"], doc["postings"]))
+    return {
+        term: (np.unique(np.concatenate(arrays)) if arrays else np.empty(0, dtype=np.int64))
+        for term, arrays in segments.items()
+    }
+
+
+def lookup(keywords, match_all=True):
+    """
+    GlobalEventIDs dos eventos cujos artigos contêm as palavras.
+
+    Args:
+        keywords: Palavras (ex.: config.KEYWORDS); são normalizadas como o texto.
+        match_all: True -> todas as palavras (interseção); False -> qualquer uma (união).
+
+    Returns:
+        Array int64 ordenado de GlobalEventIDs, ou None se nenhuma palavra
+        sobrar depois da normalização (sem filtro, e não "nenhum evento").
+    """
+    lists = sorted(postings(keywords).values(), key=len)  # Menores primeiro: interseção mais barata
+    if not lists:
+        return None
+    result = lists[0]
+    for ids in lists[1:]:
+        if match_all and not len(result):
+            break
+        result = np.intersect1d(result, ids, assume_unique=True) if match_all else np.union1d(result, ids)
+    return result
+
+
+def compact(terms=None, max_segments=1):
+    """
+    Junta em um só os segmentos de cada termo com mais de `max_segments`
+    segmentos (só os `terms` informados, ou o índice inteiro).
+
+    Retorna o número de termos compactados.
+    """
+    collection = _collection()
+    pipeline = [
+        {"$group": {"_id": "$term", "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": max_segments}}},
+    ]
+    if terms is not None:
+        pipeline.insert(0, {"$match": {"term": {"$in": list(terms)}}})
+    compacted = 0
+    for group in collection.aggregate(pipeline, allowDiskUse=True):
+        term = group["_id"]
+        docs = list(collection.find({"term": term}, _SEGMENT_FIELDS))
+        ids = np.unique(np.concatenate([decode_postings(doc["dtype"], doc["postings"]) for doc in docs]))
+        # Insere o segmento unido antes de apagar os antigos: uma consulta no meio só vê repetições
+        collection.insert_one(_segment(term, ids))
+        collection.delete_many({"_id": {"$in": [doc["_id"] for doc in docs]}})
+        compacted += 1
+    if compacted or terms is None:
+        logging.info(f"Índice de palavras: {compacted} termos compactados.")
+    return compacted
@@ -5,9 +5,16 @@ import logging
 import time
 import config
 import utils
-import data_extraction1
 #import data_extraction2 # REMOVIDO
 import url_processing
+import pipeline
+import mongo_pool
+import db_indexes
+import manifest
+import masterfile
+import metrics
+import mirror
+import sinks
 from db_operations import events_db, mentions_db, gkg_db  # IMPORTANTE
 import datetime
 import traceback
@@ -18,17 +25,17 @@ def main():
     Função principal que orquestra o processo de ETL do GDELT.
     """
     utils.setup_logging(config.LOG_FILE)
+    metrics.start_exporter()  # Exporta para config.METRICS_FILE, se definido
     logging.info("Iniciando o processo de ETL do GDELT...")
 
     try:
-        # 1. LER o arquivo gdelt2.txt LOCALMENTE:
+        # 1. INDEXAR o arquivo gdelt2.txt LOCALMENTE (streaming, sem carregar tudo na memória):
         script_dir = os.path.dirname(os.path.abspath(__file__))
         masterfile_path = os.path.join(script_dir, "gdelt2.txt")
         logging.info(f"Lendo a lista de arquivos de: {masterfile_path}")
         try:
-            with open(masterfile_path, "r", encoding="utf-8") as f:
-                masterfile_content = f.read()
-            logging.info(f"Conteúdo do arquivo lido. Tamanho: {len(masterfile_content)} caracteres.")
+            index = masterfile.MasterfileIndex(masterfile_path)
+            logging.info(f"Masterfile indexado: {index.count()} arquivos.")
         except FileNotFoundError:
             logging.error(f"Erro: Arquivo {masterfile_path} não encontrado.")
             return
@@ -53,84 +60,113 @@ def main():
             end_date_str = today.strftime("%Y%m%d")  # Data atual
             logging.info(f"Filtrando dados dos últimos 5 anos: de {start_date_str} a {end_date_str}")
 
-        # 3. Filtrar URLs por data (DESATIVADO PARA O TESTE, se for o caso):
-        urls = []
-        line_number = 0
-        for line in masterfile_content.splitlines():
-            line_number += 1
-            line = line.strip()
-
-            if not line:
-                logging.debug(f"Linha {line_number}: Linha vazia ignorada.")
-                continue
-
-            parts = line.split(" ")
-            if len(parts) != 3:
-                logging.warning(f"Linha {line_number}: Formato inesperado: {line}")
-                continue
-
-            try:
-                # Não precisamos mais converter os dois primeiros campos para int
-                url = parts[2]
-
-                # --- LÓGICA DE FILTRAGEM POR DATA (DESATIVADA PARA O TESTE, se for o caso) ---
-                # ... (mesmo código de antes para filtrar por data, se você quiser) ...
-                # date_str = ...
-                # if start_date_str <= date_str <= end_date_str: ...
+        # 3. Selecionar URLs por data (busca binária no índice do masterfile).
+        # O filtro por data continua DESATIVADO por padrão (ative com config.FILTER_BY_DATE).
+        streams = getattr(config, "STREAMS", None)  # ex.: ["events", "mentions"]
+        if getattr(config, "FILTER_BY_DATE", False):
+            selected = index.select(start_date, end_date, streams=streams)
+        else:
+            selected = index.select(streams=streams)
+        entries = [(entry.size, entry.file_hash, entry.url) for entry in selected]
 
-                # --- ADICIONA TODAS AS URLs (ou apenas as filtradas, se você reativar o filtro) ---
-                logging.debug(f"Linha {line_number}: URL adicionada: {url}")
-                urls.append(url)
+        # Índices criados uma única vez, antes da ingestão (upserts usam o índice único)
+        db_indexes.ensure_indexes()
 
-            except (ValueError, IndexError) as e:
-                logging.warning(f"Linha {line_number}: Formato inesperado: {line} - Erro: {e}")
-                continue
+        # Pula os arquivos que o manifesto registra como já gravados
+        entries = manifest.filter_pending(entries)
+        urls = [url for _, _, url in entries]
+        file_info = {url: (file_size, file_hash) for file_size, file_hash, url in entries}
 
         total_urls = len(urls)
         logging.info(f"Total de URLs a serem processadas: {total_urls}")
         processed_count = 0
 
-        # 4. Processar os arquivos em lotes:
-        for i in range(0, total_urls, config.BATCH_SIZE):
-            batch_urls = urls[i : i + config.BATCH_SIZE]
-            logging.info(
-                f"Processando lote {i // config.BATCH_SIZE + 1}/{ (total_urls + config.BATCH_SIZE - 1) // config.BATCH_SIZE } ({len(batch_urls)} URLs)"
-            )
-
-            for url in batch_urls:
-                logging.info(f"Processando URL: {url}")
-                file_content = data_extraction1.download_gdelt_file(url)
-                if not file_content:
-                    logging.warning(f"Falha ao baixar: {url}")
-                    continue
-
-                # --- DETECÇÃO DE TIPO DE ARQUIVO (CASE-INSENSITIVE) ---
-                url_lower = url.lower()  # Converte a URL para minúsculas
-                is_mentions_file = ".translation.mentions.csv.zip" in url_lower
-                is_gkg_file = ".gkg.csv.zip" in url_lower
-                is_events_file = ".translation.export.csv.zip" in url_lower
-
-                if is_mentions_file:
-                    mentions_db.insert_mentions_data(file_content, url)
-                elif is_gkg_file:
-                    gkg_db.insert_gkg_data(file_content, url)
-                #Agora verifica se é um arquivo de eventos
-                elif is_events_file:
-                    events_db.insert_events_data(file_content, url)
-                else:
-                    logging.warning(f"Tipo de arquivo desconhecido para URL: {url}") #Caso não seja nenhum dos três.
-                    continue  # Pula para a próxima URL
-
-                processed_count += 1
-                progress_percentage = (processed_count / total_urls) * 100
-                logging.info(f"Progresso: {processed_count}/{total_urls} ({progress_percentage:.2f}%)")
-
-            time.sleep(2)
+        # 4. Processar os arquivos:
+        if getattr(config, "PIPELINE_ENABLED", False):
+            # Download, parse e escrita em estágios paralelos, ligados por filas limitadas
+            pipeline.run_pipeline(entries)
+        else:
+            # Modo serial (em lotes):
+            for i in range(0, total_urls, config.BATCH_SIZE):
+                batch_urls = urls[i : i + config.BATCH_SIZE]
+                logging.info(
+                    f"Processando lote {i // config.BATCH_SIZE + 1}/{ (total_urls + config.BATCH_SIZE - 1) // config.BATCH_SIZE } ({len(batch_urls)} URLs)"
+                )
+
+                for url in batch_urls:
+                    logging.info(f"Processando URL: {url}")
+                    file_size, file_hash = file_info[url]
+                    file_type = masterfile.detect_file_type(url)
+                    started = time.perf_counter()
+                    file_content = mirror.download(url, file_size, file_hash)  # Espelho local, se ativo
+                    download_seconds = time.perf_counter() - started
+                    metrics.observe("etl_stage_seconds", download_seconds, stage="download", file_type=file_type)
+                    if not file_content:
+                        logging.warning(f"Falha ao baixar: {url}")
+                        metrics.inc("etl_files_total", file_type=file_type, status="failed")
+                        manifest.mark(url, manifest.FAILED, file_size, file_hash, error="download")
+                        continue
+                    file_bytes = utils.content_size(file_content)
+                    metrics.inc("etl_bytes_total", file_bytes, file_type=file_type)
+                    manifest.mark(url, manifest.DOWNLOADED, file_size, file_hash)
+                    started = time.perf_counter()
+
+                    # --- DETECÇÃO DE TIPO DE ARQUIVO (CASE-INSENSITIVE) ---
+                    url_lower = url.lower()  # Converte a URL para minúsculas
+                    is_mentions_file = ".translation.mentions.csv.zip" in url_lower
+                    is_gkg_file = ".gkg.csv.zip" in url_lower
+                    is_events_file = ".translation.export.csv.zip" in url_lower
+
+                    if is_mentions_file:
+                        rows_written = mentions_db.insert_mentions_data(file_content, url)
+                    elif is_gkg_file:
+                        rows_written = gkg_db.insert_gkg_data(file_content, url)
+                    #Agora verifica se é um arquivo de eventos
+                    elif is_events_file:
+                        rows_written = events_db.insert_events_data(file_content, url)
+                    else:
+                        logging.warning(f"Tipo de arquivo desconhecido para URL: {url}") #Caso não seja nenhum dos três.
+                        continue  # Pula para a próxima URL
+
+                    # No modo serial parse e escrita são medidos juntos
+                    process_seconds = time.perf_counter() - started
+                    metrics.observe("etl_stage_seconds", process_seconds, stage="parse_write", file_type=file_type)
+                    if rows_written is None:
+                        metrics.inc("etl_files_total", file_type=file_type, status="failed")
+                        manifest.mark(url, manifest.FAILED, file_size, file_hash, error="parse/write")
+                    else:
+                        metrics.inc("etl_files_total", file_type=file_type, status="written")
+                        metrics.inc("etl_rows_total", rows_written, file_type=file_type)
+                        manifest.mark(url, manifest.WRITTEN, file_size, file_hash, rows_written=rows_written)
+                        logging.info(
+                            "Arquivo gravado: %s", url,
+                            extra={
+                                "url": url,
+                                "file_type": file_type,
+                                "rows": rows_written,
+                                "bytes": file_bytes,
+                                "stage_seconds": {
+                                    "download": round(download_seconds, 4),
+                                    "parse_write": round(process_seconds, 4),
+                                },
+                            },
+                        )
+
+                    processed_count += 1
+                    progress_percentage = (processed_count / total_urls) * 100
+                    logging.info(f"Progresso: {processed_count}/{total_urls} ({progress_percentage:.2f}%)")
+
+                time.sleep(2)
 
     except Exception as e:
         logging.error(f"Erro inesperado no processo principal: {e}")
         traceback.print_exc()
 
+    finally:
+        sinks.close_sinks()
+        mongo_pool.close_client()
+        metrics.stop_exporter()  # Snapshot final das métricas
+
     logging.info("Processamento concluído.")
 
 
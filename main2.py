@@ -60,7 +60,7 @@ def main():
             line = line.strip()
 
             if not line:
-                logging.debug(f"Linha {line_number}: Linha vazia ignorada.")
+                logging.debug("Linha %d: Linha vazia ignorada.", line_number)
                 continue
 
             parts = line.split(" ")
@@ -77,10 +77,10 @@ def main():
                 if len(date_str) >= 8:
                     date_str = date_str[:8]
                     if start_date_str <= date_str <= end_date_str:
-                        logging.debug(f"Linha {line_number}: URL adicionada: {url}")
+                        logging.debug("Linha %d: URL adicionada: %s", line_number, url)
                         urls.append(url)
                     else:
-                        logging.debug(f"Linha {line_number}: Fora do período de 5 anos: {line}")
+                        logging.debug("Linha %d: Fora do período de 5 anos: %s", line_number, line)
                 else:
                     logging.warning(f"Linha {line_number}: Formato de data inesperado: {line}")
 
@@ -0,0 +1,97 @@
+# manifest.py
+"""
+Manifesto durável da ingestão: registra o estado de cada arquivo do GDELT.
+
+Cada arquivo do masterfile (gdelt2.txt) vira um documento na coleção
+config.MANIFEST_COLLECTION_NAME (padrão: "ingest_manifest"), com _id = URL e os
+campos de tamanho e hash da linha do masterfile. Os estados são:
+
+    downloaded -> arquivo baixado (bytes)
+    parsed     -> CSV lido (rows_parsed)
+    written    -> dados gravados no MongoDB (rows_written)
+    failed     -> erro em algum estágio (error)
+
+Ao reiniciar, os arquivos em "written" com o mesmo tamanho/hash são pulados e
+apenas os incompletos são processados de novo.
+
+Configurações (opcionais em config.py):
+    MANIFEST_ENABLED          -> usa o manifesto (padrão: True)
+    MANIFEST_COLLECTION_NAME  -> nome da coleção (padrão: "ingest_manifest")
+"""
+import datetime
+import logging
+
+import config
+import mongo_pool
+
+DOWNLOADED = "downloaded"
+PARSED = "parsed"
+WRITTEN = "written"
+FAILED = "failed"
+
+_QUERY_BATCH = 10000  # URLs por consulta $in
+
+
+def is_enabled():
+    return getattr(config, "MANIFEST_ENABLED", True)
+
+
+def _collection():
+    return mongo_pool.get_collection(getattr(config, "MANIFEST_COLLECTION_NAME", "ingest_manifest"))
+
+
+def filter_pending(entries):
+    """
+    Remove da lista os arquivos que já foram gravados por completo.
+
+    Args:
+        entries: Lista de tuplas (size, file_hash, url), na ordem do masterfile.
+
+    Returns:
+        Lista com as entradas que ainda precisam ser processadas (mesma ordem).
+    """
+    if not is_enabled() or not entries:
+        return list(entries)
+
+    done = {}
+    collection = _collection()
+    for i in range(0, len(entries), _QUERY_BATCH):
+        urls = [url for _, _, url in entries[i : i + _QUERY_BATCH]]
+        cursor = collection.find(
+            {"_id": {"$in": urls}, "state": WRITTEN},
+            {"size": 1, "hash": 1},
+        )
+        for doc in cursor:
+            done[doc["_id"]] = (doc.get("size"), doc.get("hash"))
+
+    # Só pula se tamanho e hash forem os mesmos (o arquivo pode ter sido republicado)
+    pending = [entry for entry in entries if done.get(entry[2]) != (entry[0], entry[1])]
+    skipped = len(entries) - len(pending)
+    if skipped:
+        logging.info(f"Manifesto: {skipped} arquivos já gravados serão pulados, {len(pending)} pendentes.")
+    return pending
+
+
+def mark(url, state, size=None, file_hash=None, **fields):
+    """
+    Registra o estado de um arquivo no manifesto.
+
+    Args:
+        url: URL do arquivo (chave do manifesto).
+        state: DOWNLOADED, PARSED, WRITTEN ou FAILED.
+        size, file_hash: Campos da linha do masterfile (gravados se informados).
+        **fields: Campos extras, ex.: bytes=..., rows_parsed=..., rows_written=..., error=...
+    """
+    if not is_enabled():
+        return
+    update = {"state": state, "updated_at": datetime.datetime.utcnow()}
+    if size is not None:
+        update["size"] = size
+    if file_hash is not None:
+        update["hash"] = file_hash
+    update.update(fields)
+    try:
+        _collection().update_one({"_id": url}, {"$set": update}, upsert=True)
+    except Exception as e:
+        # O manifesto não deve interromper a ingestão
+        logging.warning(f"Erro ao atualizar o manifesto de {url} ({state}): {e}")
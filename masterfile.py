@@ -0,0 +1,234 @@
+# masterfile.py
+"""
+Leitura do masterfile do GDELT (gdelt2.txt / masterfilelist.txt) sem carregá-lo
+inteiro na memória, com um índice ordenado por timestamp para selecionar
+intervalos de datas por busca binária.
+
+Cada linha do masterfile tem o formato "tamanho hash url". O índice guarda,
+para cada tipo de arquivo ('events', 'mentions', 'gkg'), um array NumPy
+ordenado com o timestamp (YYYYMMDDHHMMSS) e a posição (byte) de cada linha.
+Os arrays ficam em disco (<masterfile>.idx/<tipo>.npy) e são abertos com
+memory-map, então consultar um dia de um masterfile com milhões de linhas só
+lê as linhas selecionadas. Quando o masterfile cresce (novas linhas no fim),
+apenas o trecho novo é indexado.
+
+Uso:
+    index = masterfile.MasterfileIndex("gdelt2.txt")
+    for entry in index.select(start_date, end_date, streams=["events"]):
+        print(entry.url)
+"""
+import collections
+import datetime
+import json
+import logging
+import os
+import zlib
+
+import numpy as np
+
+MasterfileEntry = collections.namedtuple("MasterfileEntry", "size file_hash url timestamp file_type")
+
+INDEX_DTYPE = np.dtype([("ts", "<i8"), ("offset", "<i8")])
+FILE_TYPES = ("events", "mentions", "gkg")
+_HEAD_BYTES = 4096  # Trecho inicial usado para detectar se o arquivo foi reescrito
+
+
+def detect_file_type(url):
+    """Retorna 'events', 'mentions', 'gkg' ou None a partir da URL (case-insensitive)."""
+    url_lower = url.lower()
+    if ".mentions.csv.zip" in url_lower:
+        return "mentions"
+    if ".gkg.csv.zip" in url_lower:
+        return "gkg"
+    if ".export.csv.zip" in url_lower:
+        return "events"
+    return None
+
+
+def parse_line(line):
+    """
+    Converte uma linha do masterfile em MasterfileEntry.
+
+    Retorna None para linhas vazias ou com formato inesperado.
+    """
+    parts = line.strip().split(" ")
+    if len(parts) != 3:
+        return None
+    size, file_hash, url = parts
+    stamp = url.rsplit("/", 1)[-1].split(".", 1)[0]
+    if len(stamp) < 8 or not stamp[:14].isdigit():
+        return None
+    timestamp = int(stamp[:14].ljust(14, "0"))
+    return MasterfileEntry(size, file_hash, url, timestamp, detect_file_type(url))
+
+
+def iter_entries(path, start_offset=0):
+    """
+    Lê o masterfile linha a linha (streaming).
+
+    Yields:
+        Tuplas (offset, MasterfileEntry) para cada linha válida.
+    """
+    with open(path, "rb") as f:
+        f.seek(start_offset)
+        offset = start_offset
+        for raw in f:
+            entry = parse_line(raw.decode("utf-8", errors="replace"))
+            if entry is not None:
+                yield offset, entry
+            elif raw.strip():
+                logging.warning(f"Masterfile: linha inesperada no byte {offset}: {raw[:200]!r}")
+            offset += len(raw)
+
+
+def date_to_timestamp(value, end_of_day=False):
+    """Converte date/datetime/str YYYYMMDD em timestamp YYYYMMDDHHMMSS."""
+    if isinstance(value, datetime.datetime):
+        return int(value.strftime("%Y%m%d%H%M%S"))
+    if isinstance(value, datetime.date):
+        value = value.strftime("%Y%m%d")
+    value = str(value)
+    if len(value) == 14:
+        return int(value)
+    return int(value[:8]) * 1000000 + (235959 if end_of_day else 0)
+
+
+class MasterfileIndex:
+    """Índice persistente (memory-mapped) de um masterfile por tipo e timestamp."""
+
+    def __init__(self, path, index_dir=None):
+        self.path = path
+        self.index_dir = index_dir or path + ".idx"
+        self._arrays = {}
+        self.refresh()
+
+    # --- Persistência ---
+    def _meta_path(self):
+        return os.path.join(self.index_dir, "meta.json")
+
+    def _array_path(self, file_type):
+        return os.path.join(self.index_dir, f"{file_type}.npy")
+
+    def _read_head(self, length):
+        with open(self.path, "rb") as f:
+            return zlib.crc32(f.read(length))
+
+    def _load_meta(self):
+        try:
+            with open(self._meta_path(), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save(self, arrays, meta):
+        os.makedirs(self.index_dir, exist_ok=True)
+        for file_type, array in arrays.items():
+            tmp_path = self._array_path(file_type) + ".tmp"
+            with open(tmp_path, "wb") as f:
+                np.save(f, array)
+            os.replace(tmp_path, self._array_path(file_type))
+        tmp_path = self._meta_path() + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self._meta_path())
+
+    def _load_arrays(self, file_types):
+        self._arrays = {}
+        for file_type in file_types:
+            path = self._array_path(file_type)
+            if os.path.exists(path):
+                self._arrays[file_type] = np.load(path, mmap_mode="r")
+
+    # --- Construção ---
+    def _scan(self, start_offset):
+        rows = collections.defaultdict(list)
+        for offset, entry in iter_entries(self.path, start_offset):
+            rows[entry.file_type or "other"].append((entry.timestamp, offset))
+        with open(self.path, "rb") as f:
+            end_offset = f.seek(0, os.SEEK_END)
+        return {key: np.array(values, dtype=INDEX_DTYPE) for key, values in rows.items()}, end_offset
+
+    def refresh(self):
+        """Garante que o índice cobre o masterfile atual, indexando só o que falta."""
+        size = os.path.getsize(self.path)
+        meta = self._load_meta()
+        # Compara o mesmo trecho inicial que foi usado quando o índice foi salvo
+        same_head = bool(meta) and meta.get("head") == self._read_head(meta.get("head_len", _HEAD_BYTES))
+
+        if same_head and meta.get("indexed_bytes") == size:
+            self._load_arrays(meta["file_types"])
+            return
+
+        if same_head and meta.get("indexed_bytes", 0) < size:
+            # Masterfile só cresceu: indexa apenas as linhas novas
+            start_offset = meta["indexed_bytes"]
+            self._load_arrays(meta["file_types"])
+            previous = {key: np.asarray(array) for key, array in self._arrays.items()}
+            logging.info(f"Masterfile: indexando {size - start_offset} bytes novos de {self.path}")
+        else:
+            start_offset = 0
+            previous = {}
+            logging.info(f"Masterfile: construindo índice de {self.path}")
+
+        new_rows, indexed_bytes = self._scan(start_offset)
+        arrays = {}
+        for key in set(previous) | set(new_rows):
+            parts = [a for a in (previous.get(key), new_rows.get(key)) if a is not None]
+            array = np.concatenate(parts) if len(parts) > 1 else np.array(parts[0])
+            arrays[key] = array[np.argsort(array["ts"], kind="stable")]
+
+        self._arrays = {}  # Libera os memory-maps antes de substituir os arquivos
+        head_len = min(indexed_bytes, _HEAD_BYTES)
+        self._save(arrays, {
+            "head": self._read_head(head_len),
+            "head_len": head_len,
+            "indexed_bytes": indexed_bytes,
+            "file_types": sorted(arrays),
+        })
+        self._load_arrays(sorted(arrays))
+        counts = ", ".join(f"{key}={len(a)}" for key, a in sorted(self._arrays.items()))
+        logging.info(f"Masterfile: índice com {self.count()} entradas ({counts}).")
+
+    # --- Consulta ---
+    def count(self, file_type=None):
+        """Número de entradas indexadas (de um tipo ou de todos)."""
+        if file_type is not None:
+            return len(self._arrays.get(file_type, ()))
+        return sum(len(a) for a in self._arrays.values())
+
+    def select(self, start=None, end=None, streams=None):
+        """
+        Retorna as entradas entre start e end (inclusive) por busca binária.
+
+        Args:
+            start, end: date, datetime ou str YYYYMMDD[HHMMSS]; None = sem limite.
+            streams: Tipos de arquivo ('events', 'mentions', 'gkg'); None = todos.
+
+        Returns:
+            Lista de MasterfileEntry ordenada por timestamp.
+        """
+        start_ts = date_to_timestamp(start) if start is not None else np.iinfo(np.int64).min
+        end_ts = date_to_timestamp(end, end_of_day=True) if end is not None else np.iinfo(np.int64).max
+
+        selected = []
+        for file_type in streams or FILE_TYPES:
+            array = self._arrays.get(file_type)
+            if array is None or not len(array):
+                continue
+            lo = np.searchsorted(array["ts"], start_ts, side="left")
+            hi = np.searchsorted(array["ts"], end_ts, side="right")
+            selected.append(array[lo:hi])
+
+        if not selected:
+            return []
+        rows = np.concatenate(selected)
+        rows = rows[np.lexsort((rows["offset"], rows["ts"]))]
+
+        entries = []
+        with open(self.path, "rb") as f:
+            for offset in rows["offset"]:
+                f.seek(int(offset))
+                entry = parse_line(f.readline().decode("utf-8", errors="replace"))
+                if entry is not None:
+                    entries.append(entry)
+        return entries
@@ -0,0 +1,198 @@
+# mention_stats.py
+"""
+Estatísticas de menções por evento, mantidas incrementalmente na ingestão.
+
+Para cada GlobalEventID existe um documento (_id = GlobalEventID) na coleção
+config.MENTION_STATS_COLLECTION_NAME (padrão: "mention_stats"):
+
+    MentionCount          -> número de menções
+    ConfidenceSum / ConfidenceMean
+    ToneSum / ToneMean    -> MentionDocTone
+    Sources               -> fontes distintas (MentionSourceName)
+    DistinctSources       -> tamanho de Sources
+    FirstMentionTimeDate / LastMentionTimeDate
+
+Cada lote de menções é agregado no pandas (groupby por evento) e aplicado com
+um único bulk_write: um update com pipeline por evento, que soma as contagens,
+aplica min/max nas datas, une as fontes e recalcula as médias no servidor.
+Assim os dashboards leem um documento por evento em vez de rodar $group sobre
+toda a coleção de menções.
+
+O incremento só vale para menções recém-inseridas. Se ele falhar depois do
+insert, o arquivo é registrado como falho (mentions_db.write_mentions_data) e
+na nova tentativa as menções já existem: aí rebuild_stats recalcula as
+estatísticas dos eventos do arquivo a partir da coleção de menções.
+
+Configurações (opcionais em config.py):
+    MENTION_STATS_ENABLED          -> mantém as estatísticas (padrão: True)
+    MENTION_STATS_COLLECTION_NAME  -> nome da coleção (padrão: "mention_stats")
+"""
+import datetime
+import logging
+import traceback
+
+from pymongo import DeleteOne, ReplaceOne, UpdateOne
+
+import config
+import mongo_pool
+
+
+def is_enabled():
+    return getattr(config, "MENTION_STATS_ENABLED", True)
+
+
+def _collection():
+    return mongo_pool.get_collection(getattr(config, "MENTION_STATS_COLLECTION_NAME", "mention_stats"))
+
+
+_REBUILD_BATCH = 10000  # Eventos por $in no rebuild_stats
+
+
+def aggregate_batch(df):
+    """
+    Agrega um lote de menções por GlobalEventID.
+
+    Returns:
+        DataFrame indexado por GlobalEventID com count, confidence_sum,
+        tone_sum, first, last e sources (lista de fontes distintas do lote).
+    """
+    grouped = df.groupby("GlobalEventID", sort=False)
+    stats = grouped.agg(
+        count=("GlobalEventID", "size"),
+        confidence_sum=("Confidence", "sum"),
+        tone_sum=("MentionDocTone", "sum"),
+        first=("MentionTimeDate", "min"),
+        last=("MentionTimeDate", "max"),
+    )
+    sources = (
+        df[["GlobalEventID", "MentionSourceName"]]
+        .dropna()
+        .astype({"MentionSourceName": "str"})
+        .drop_duplicates()
+        .groupby("GlobalEventID", sort=False)["MentionSourceName"]
+        .agg(list)
+    )
+    stats["sources"] = sources.reindex(stats.index)
+    return stats
+
+
+def _update_pipeline(count, confidence_sum, tone_sum, first, last, sources, now):
+    return [
+        {"$set": {
+            "MentionCount": {"$add": [{"$ifNull": ["$MentionCount", 0]}, count]},
+            "ConfidenceSum": {"$add": [{"$ifNull": ["$ConfidenceSum", 0]}, confidence_sum]},
+            "ToneSum": {"$add": [{"$ifNull": ["$ToneSum", 0]}, tone_sum]},
+            "FirstMentionTimeDate": {"$min": [{"$ifNull": ["$FirstMentionTimeDate", first]}, first]},
+            "LastMentionTimeDate": {"$max": [{"$ifNull": ["$LastMentionTimeDate", last]}, last]},
+            "Sources": {"$setUnion": [{"$ifNull": ["$Sources", []]}, sources]},
+            "updated_at": now,
+        }},
+        {"$set": {
+            "ConfidenceMean": {"$divide": ["$ConfidenceSum", "$MentionCount"]},
+            "ToneMean": {"$divide": ["$ToneSum", "$MentionCount"]},
+            "DistinctSources": {"$size": "$Sources"},
+        }},
+    ]
+
+
+def update_stats(df, url=None):
+    """
+    Atualiza as estatísticas dos eventos com um lote de menções já gravado.
+
+    Args:
+        df: DataFrame de menções (GlobalEventID, Confidence, MentionDocTone,
+            MentionSourceName, MentionTimeDate).
+        url: URL de origem (usada nos logs).
+
+    Returns:
+        Número de eventos atualizados, ou None em caso de erro.
+    """
+    if not is_enabled() or df is None or df.empty:
+        return 0
+    try:
+        stats = aggregate_batch(df)
+        now = datetime.datetime.utcnow()
+        operations = [
+            UpdateOne(
+                {"_id": event_id},
+                _update_pipeline(
+                    count, confidence_sum, tone_sum, first, last,
+                    sources if isinstance(sources, list) else [],  # NaN: sem fonte no lote
+                    now,
+                ),
+                upsert=True,
+            )
+            for event_id, count, confidence_sum, tone_sum, first, last, sources in zip(
+                stats.index.tolist(),
+                stats["count"].tolist(),
+                stats["confidence_sum"].tolist(),
+                stats["tone_sum"].tolist(),
+                stats["first"].tolist(),
+                stats["last"].tolist(),
+                stats["sources"].tolist(),
+            )
+        ]
+        _collection().bulk_write(operations, ordered=False)
+        logging.info(f"Estatísticas de menções de {url}: {len(operations)} eventos atualizados.")
+        return len(operations)
+
+    except Exception as e:
+        # As menções já foram gravadas; as estatísticas podem ser refeitas depois
+        logging.error(f"Erro ao atualizar estatísticas de menções de {url}: {e}")
+        traceback.print_exc()
+        return None
+
+
+def rebuild_stats(event_ids, url=None):
+    """
+    Recalcula do zero as estatísticas dos eventos a partir da coleção de menções.
+
+    Idempotente: usado quando não se sabe se o incremento de update_stats foi
+    aplicado (ex.: reprocessamento de um arquivo cujas menções já existem).
+    Eventos sem menções perdem o documento de estatísticas.
+
+    Returns:
+        Número de eventos recalculados, ou None em caso de erro.
+    """
+    if not is_enabled():
+        return 0
+    try:
+        mentions = mongo_pool.get_collection(config.MENTIONS_COLLECTION_NAME)
+        event_ids = sorted({int(event_id) for event_id in event_ids})
+        now = datetime.datetime.utcnow()
+        rebuilt = 0
+        for start in range(0, len(event_ids), _REBUILD_BATCH):
+            batch = event_ids[start:start + _REBUILD_BATCH]
+            pipeline = [
+                {"$match": {"GlobalEventID": {"$in": batch}}},
+                {"$group": {
+                    "_id": "$GlobalEventID",
+                    "MentionCount": {"$sum": 1},
+                    "ConfidenceSum": {"$sum": "$Confidence"},
+                    "ToneSum": {"$sum": "$MentionDocTone"},
+                    "FirstMentionTimeDate": {"$min": "$MentionTimeDate"},
+                    "LastMentionTimeDate": {"$max": "$MentionTimeDate"},
+                    "Sources": {"$addToSet": "$MentionSourceName"},
+                }},
+            ]
+            operations = []
+            found = set()
+            for doc in mentions.aggregate(pipeline, allowDiskUse=True):
+                found.add(doc["_id"])
+                doc["Sources"] = sorted(source for source in doc["Sources"] if isinstance(source, str))
+                doc["ConfidenceMean"] = doc["ConfidenceSum"] / doc["MentionCount"]
+                doc["ToneMean"] = doc["ToneSum"] / doc["MentionCount"]
+                doc["DistinctSources"] = len(doc["Sources"])
+                doc["updated_at"] = now
+                operations.append(ReplaceOne({"_id": doc["_id"]}, doc, upsert=True))
+            operations.extend(DeleteOne({"_id": event_id}) for event_id in batch if event_id not in found)
+            if operations:
+                _collection().bulk_write(operations, ordered=False)
+            rebuilt += len(found)
+        logging.info(f"Estatísticas de menções de {url}: {rebuilt} eventos recalculados.")
+        return rebuilt
+
+    except Exception as e:
+        logging.error(f"Erro ao recalcular estatísticas de menções de {url}: {e}")
+        traceback.print_exc()
+        return None
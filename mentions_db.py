@@ -1,90 +1,128 @@
 # db_operations/mentions_db.py
-from pymongo import MongoClient
+import hashlib
 import logging
 import traceback
 import config
+import mongo_pool
+import sinks
+import schemas
+import mention_stats
+import archive_reader
 import pandas as pd
-import zipfile
-import io
 
 def insert_mentions_data(file_content, url):
-    """Insere dados de menções no MongoDB."""
-    client = None
+    """
+    Insere dados de menções no MongoDB.
+
+    Retorna o número de linhas gravadas, ou None se a leitura/gravação falhar.
+    """
+    df = parse_mentions_data(file_content, url)
+    if df is None:
+        logging.warning(f"Nenhum dado de menção para inserir de {url} (DataFrame não criado).")
+        return None
+    if not sinks.begin("mentions", url):
+        return None
+    return sinks.write("mentions", df, url)  # MongoDB (write_mentions_data) e demais sinks configurados
+
+
+def parse_mentions_data(file_content, url):
+    """
+    Lê o CSV de menções contido no zip e retorna um DataFrame já renomeado.
+
+    Retorna None se não houver CSV ou se a leitura falhar.
+    """
+    # --- Lógica de leitura do CSV de MENÇÕES ---
+    df = None  # Inicializa df com None
     try:
-        client = MongoClient(config.MONGODB_URL)
-        db = client[config.DB_NAME]
-        collection = db[config.MENTIONS_COLLECTION_NAME]
-
-        # --- Lógica de leitura do CSV de MENÇÕES ---
-        df = None  # Inicializa df com None
-        try:
-            with zipfile.ZipFile(file_content) as outer_zip:
-                for inner_zip_name in outer_zip.namelist():
-                    if inner_zip_name.lower().endswith('.zip'):
-                        with outer_zip.open(inner_zip_name) as inner_zip_file:
-                            with zipfile.ZipFile(io.BytesIO(inner_zip_file.read())) as inner_zip:
-                                for csv_filename in inner_zip.namelist():
-                                    if csv_filename.lower().endswith('.csv'):
-                                        with inner_zip.open(csv_filename) as csv_file:
-                                            df = pd.read_csv(csv_file, sep='\t', header=None)
-                                            logging.info(f"Arquivo CSV '{csv_filename}' lido (menções de {url}).")
-                                            df.dropna(subset=[0], inplace=True)
-                                            columns_to_drop = []  # Adapte para MENÇÕES!
-                                            existing_columns = [col for col in columns_to_drop if col in df.columns]
-                                            df.drop(columns=existing_columns, inplace=True, errors='ignore')
-                                             # --- RENOMEAR COLUNAS (Menções) ---
-                                            df = df.rename(columns={
-                                                0: "GlobalEventID",
-                                                1: "EventTimeDate",
-                                                2: "MentionTimeDate",
-                                                3: "MentionType",
-                                                4: "MentionSourceName",
-                                                5: "MentionIdentifier",
-                                                6: "SentenceID",
-                                                7: "Actor1CharOffset",
-                                                8: "Actor2CharOffset",
-                                                9: "ActionCharOffset",
-                                                10: "Confidence",
-                                                11: "MentionDocLen",
-                                                12: "MentionDocTone",
-                                                13: "MentionDocTranslationInfo",
-                                                14: "Extras"
-                                            })
-                                            df['SOURCEURL'] = df['MentionIdentifier']  # Crie a coluna SOURCEURL
-                                            break  # Sai do loop interno (csv_filename)
-                                    else:
-                                        logging.debug(f"Arquivo '{csv_filename}' dentro de '{inner_zip_name}' não é um CSV. Ignorando.") #Adicionado para evitar confusões
-                                if df is not None:  # Se achou um CSV dentro do zip interno, sai do loop (inner_zip_name)
-                                    break
-                        if df is not None: #Se achou um zip interno, sai do loop (outer_zip)
-                            break
-                if df is None: #Se não encontrou nenhum CSV válido
-                    logging.warning(f"Nenhum CSV encontrado em {url}")
-
-
-        except Exception as e:
-            logging.error(f"Erro ao ler CSV de menções de {url}: {e}")
-            traceback.print_exc()
-            return  # Sai da função se houver erro na leitura
+        # Zips flat (CSV direto) ou nested (zip dentro do zip), lidos sem cópias
+        with archive_reader.open_archive(file_content) as archive:
+            for csv_filename, csv_file in archive.iter_csv():
+                # Nomes, colunas carregadas e dtypes vêm do esquema central
+                df = pd.read_csv(csv_file, **schemas.read_csv_kwargs("mentions"))
+                logging.info(f"Arquivo CSV '{csv_filename}' lido (menções de {url}, layout {archive.layout}).")
+                df['SOURCEURL'] = df['MentionIdentifier']  # Crie a coluna SOURCEURL
+                break  # Usa apenas o primeiro CSV
+        if df is None: #Se não encontrou nenhum CSV válido
+            logging.warning(f"Nenhum CSV encontrado em {url}")
+
+
+    except Exception as e:
+        logging.error(f"Erro ao ler CSV de menções de {url}: {e}")
+        traceback.print_exc()
+        return None  # Sai da função se houver erro na leitura
+
+
+    return df
 
 
+# Colunas que identificam uma menção (mention_ids)
+MENTION_KEY_COLUMNS = [
+    "GlobalEventID", "MentionIdentifier", "SentenceID",
+    "Actor1CharOffset", "Actor2CharOffset", "ActionCharOffset",
+]
+
+
+def mention_ids(df):
+    """
+    _id determinístico de cada menção: hash (BLAKE2b, 128 bits, hex) de
+    GlobalEventID + MentionIdentifier + SentenceID + os offsets dos atores e
+    da ação. Os offsets entram na chave porque a mesma frase pode gerar
+    menções distintas (ex.: atores invertidos). Reprocessar o mesmo arquivo
+    gera os mesmos _id, então nada é duplicado.
+    """
+    keys = df["GlobalEventID"].astype("str")
+    for column in MENTION_KEY_COLUMNS[1:]:
+        keys = keys + "\x1f" + df[column].astype("str")
+    return [hashlib.blake2b(key.encode("utf-8"), digest_size=16).hexdigest() for key in keys]
+
+
+def write_mentions_data(df, url):
+    """
+    Grava um DataFrame de menções no MongoDB.
+
+    O insert é não ordenado e usa _id determinístico (mention_ids): menções
+    que já existem (chave duplicada) são ignoradas. As estatísticas por evento
+    recebem só as menções novas; se o lote tinha menções já gravadas
+    (reprocessamento, talvez depois de uma falha nas estatísticas), as
+    estatísticas dos eventos do lote são recalculadas (rebuild_stats).
+
+    Retorna o número de documentos inseridos (sem os que já existiam), ou
+    None em caso de erro (inclusive nas estatísticas, para que o arquivo
+    seja registrado como falho e processado de novo).
+    """
+    try:
+        collection = mongo_pool.get_collection(config.MENTIONS_COLLECTION_NAME)
+
         # --- Inserção (Menções) ---
-        # Só tenta inserir se o DataFrame foi criado com sucesso
-        if df is not None:
-            data_to_insert = df.to_dict("records")
-            if data_to_insert:
-                result = collection.insert_many(data_to_insert)
-                logging.info(f"Menções de {url}: Inseridos {len(result.inserted_ids)} documentos.")
+        data_to_insert = df.to_dict("records")
+        inserted = 0
+        if data_to_insert:
+            ids = mention_ids(df)
+            for record, mention_id in zip(data_to_insert, ids):
+                record["_id"] = mention_id
+            inserted, duplicates = mongo_pool.insert_unordered(collection, data_to_insert)
+            logging.info(
+                f"Menções de {url}: Inseridos {inserted} documentos ({len(duplicates)} já existiam)."
+            )
+            # Contagens, médias e fontes por evento. Repetições dentro do próprio
+            # lote são só descartadas; menções já gravadas antes disparam o rebuild
+            repeated = set(pd.Series(ids).duplicated().to_numpy().nonzero()[0].tolist())
+            if any(index not in repeated for index in duplicates):
+                stats = mention_stats.rebuild_stats(df["GlobalEventID"].unique(), url)
             else:
-                logging.info(f"Nenhum dado de menção para inserir de {url} (DataFrame vazio).")
+                new_rows = df.drop(index=df.index[duplicates]) if duplicates else df
+                stats = mention_stats.update_stats(new_rows, url)
+            if stats is None:
+                return None
         else:
-            logging.warning(f"Nenhum dado de menção para inserir de {url} (DataFrame não criado).")
+            logging.info(f"Nenhum dado de menção para inserir de {url} (DataFrame vazio).")
+        return inserted
 
 
     except Exception as e:
         logging.error(f"Erro ao inserir dados de menções de {url} no MongoDB: {e}")
         traceback.print_exc()
+        return None
+
 
-    finally:
-        if client:
-            client.close()
\ No newline at end of file
+sinks.register_mongo_writer("mentions", write_mentions_data)
@@ -0,0 +1,230 @@
+# metrics.py
+"""
+Métricas da ingestão em processo: contadores, gauges e histogramas.
+
+    inc("etl_rows_total", 649, file_type="events")        -> contador
+    set_gauge("etl_queue_depth", 3, queue="parse")         -> gauge
+    observe("etl_stage_seconds", 0.42, stage="parse")      -> histograma
+    with timer("etl_stage_seconds", stage="write"): ...    -> histograma da duração
+
+As latências dos comandos do MongoDB são medidas por um CommandListener do
+pymongo (mongo_command_seconds, por comando), instalado em todo cliente criado
+por mongo_pool.
+
+As métricas podem ser exportadas como texto do Prometheus (para o textfile
+collector do node_exporter) ou como snapshot JSON; a extensão do arquivo
+decide o formato (.prom -> Prometheus, qualquer outra -> JSON).
+
+Configurações (opcionais em config.py):
+    METRICS_ENABLED    -> coleta as métricas (padrão: True)
+    METRICS_FILE       -> arquivo exportado periodicamente e no fim (padrão: None)
+    METRICS_INTERVAL   -> segundos entre exportações (padrão: 30)
+"""
+import atexit
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from pymongo import monitoring
+
+import config
+
+# Limites superiores (segundos) dos buckets dos histogramas
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+_lock = threading.Lock()
+_counters = {}    # (nome, labels) -> valor
+_gauges = {}      # (nome, labels) -> valor
+_histograms = {}  # (nome, labels) -> [contagens por bucket..., soma, total]
+
+
+def is_enabled():
+    return getattr(config, "METRICS_ENABLED", True)
+
+
+def _key(name, labels):
+    # Valores sempre em texto (None -> ""), para que snapshot() consiga ordenar as chaves
+    return name, tuple(sorted((label, str(value) if value is not None else "") for label, value in labels.items()))
+
+
+def inc(name, value=1, **labels):
+    """Soma `value` ao contador."""
+    if not is_enabled():
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def set_gauge(name, value, **labels):
+    """Define o valor atual do gauge."""
+    if not is_enabled():
+        return
+    key = _key(name, labels)
+    with _lock:
+        _gauges[key] = value
+
+
+def observe(name, value, **labels):
+    """Registra uma observação (em segundos) no histograma."""
+    if not is_enabled():
+        return
+    key = _key(name, labels)
+    index = bisect.bisect_left(DEFAULT_BUCKETS, value)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = [0] * (len(DEFAULT_BUCKETS) + 1) + [0.0, 0]
+        histogram[index] += 1  # O último bucket é o +Inf
+        histogram[-2] += value
+        histogram[-1] += 1
+
+
+@contextmanager
+def timer(name, **labels):
+    """Mede a duração do bloco e registra no histograma `name`."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - started, **labels)
+
+
+def reset():
+    """Apaga todas as métricas (ex.: entre execuções de um benchmark)."""
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
+        _histograms.clear()
+
+
+# --- Exportação ---
+def snapshot():
+    """Cópia das métricas em um dicionário serializável em JSON."""
+    with _lock:
+        counters = dict(_counters)
+        gauges = dict(_gauges)
+        histograms = {key: list(values) for key, values in _histograms.items()}
+
+    def entries(items, convert):
+        return [{"name": name, "labels": dict(labels), **convert(value)} for (name, labels), value in sorted(items.items())]
+
+    def histogram(values):
+        buckets, total_sum, count = values[:-2], values[-2], values[-1]
+        cumulative, running = {}, 0
+        for bound, bucket_count in zip(list(DEFAULT_BUCKETS) + ["+Inf"], buckets):
+            running += bucket_count
+            cumulative[str(bound)] = running
+        return {"count": count, "sum": round(total_sum, 6), "buckets": cumulative}
+
+    return {
+        "timestamp": time.time(),
+        "counters": entries(counters, lambda v: {"value": v}),
+        "gauges": entries(gauges, lambda v: {"value": v}),
+        "histograms": entries(histograms, histogram),
+    }
+
+
+def _format_labels(labels, extra=None):
+    items = list(labels.items()) + (list(extra.items()) if extra else [])
+    if not items:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in items)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(items, escaped)) + "}"
+
+
+def to_prometheus():
+    """Métricas no formato de texto do Prometheus."""
+    data = snapshot()
+    lines = []
+    for kind, prom_type in (("counters", "counter"), ("gauges", "gauge")):
+        declared = set()
+        for entry in data[kind]:
+            if entry["name"] not in declared:
+                lines.append(f"# TYPE {entry['name']} {prom_type}")
+                declared.add(entry["name"])
+            lines.append(f"{entry['name']}{_format_labels(entry['labels'])} {entry['value']}")
+    declared = set()
+    for entry in data["histograms"]:
+        name = entry["name"]
+        if name not in declared:
+            lines.append(f"# TYPE {name} histogram")
+            declared.add(name)
+        for bound, count in entry["buckets"].items():
+            lines.append(f"{name}_bucket{_format_labels(entry['labels'], {'le': bound})} {count}")
+        lines.append(f"{name}_sum{_format_labels(entry['labels'])} {entry['sum']}")
+        lines.append(f"{name}_count{_format_labels(entry['labels'])} {entry['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def write_snapshot(path=None):
+    """Grava as métricas em `path` (padrão: config.METRICS_FILE) de forma atômica."""
+    path = path or getattr(config, "METRICS_FILE", None)
+    if not path:
+        return None
+    content = to_prometheus() if path.endswith(".prom") else json.dumps(snapshot(), indent=2)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+    return path
+
+
+_exporter = None
+_exporter_stop = threading.Event()
+
+
+def start_exporter(path=None, interval=None):
+    """Exporta as métricas periodicamente em uma thread (e uma última vez no fim)."""
+    global _exporter
+    path = path or getattr(config, "METRICS_FILE", None)
+    if not path or not is_enabled() or _exporter is not None:
+        return
+    interval = interval or getattr(config, "METRICS_INTERVAL", 30)
+
+    def run():
+        while not _exporter_stop.wait(interval):
+            try:
+                write_snapshot(path)
+            except OSError as e:
+                logging.warning("Erro ao exportar métricas para %s: %s", path, e)
+
+    _exporter = threading.Thread(target=run, name="metrics-exporter", daemon=True)
+    _exporter.start()
+    atexit.register(stop_exporter, path)
+
+
+def stop_exporter(path=None):
+    """Para a thread de exportação e grava o snapshot final."""
+    global _exporter
+    _exporter_stop.set()
+    if _exporter is not None:
+        _exporter.join(timeout=5)
+        _exporter = None
+    try:
+        write_snapshot(path)
+    except OSError as e:
+        logging.warning("Erro ao exportar métricas para %s: %s", path, e)
+    _exporter_stop.clear()
+
+
+# --- Latência do MongoDB ---
+class MongoCommandListener(monitoring.CommandListener):
+    """Histograma de latência e contador de falhas por comando do MongoDB."""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        observe("mongo_command_seconds", event.duration_micros / 1e6, command=event.command_name)
+
+    def failed(self, event):
+        observe("mongo_command_seconds", event.duration_micros / 1e6, command=event.command_name)
+        inc("mongo_command_failures_total", command=event.command_name)
+
+
+mongo_listener = MongoCommandListener()
@@ -0,0 +1,209 @@
+# mirror.py
+"""
+Espelho local dos arquivos brutos do GDELT.
+
+Com o espelho ativo, cada zip baixado fica em disco e é conferido com o
+tamanho e o MD5 da linha do masterfile ("tamanho hash url"). Reprocessar um
+arquivo (ex.: depois de mudar o schema) lê direto do disco, sem passar pelos
+servidores do GDELT. Os loaders recebem o caminho do arquivo, que o
+archive_reader abre como qualquer zip.
+
+Layout:
+    <MIRROR_DIR>/20150218/20150218224500.translation.export.CSV.zip
+    <MIRROR_DIR>/20150218/20150218224500.translation.export.CSV.zip.part  (download em andamento)
+
+O download é gravado em um arquivo .part. Se ele for interrompido, a próxima
+tentativa continua de onde parou com um pedido HTTP Range (o MD5 do trecho já
+baixado é recalculado a partir do disco). Só depois de conferido o arquivo é
+renomeado (os.replace) para o nome final. Um arquivo que não confere é
+apagado e baixado de novo.
+
+Configurações (opcionais em config.py):
+    MIRROR_ENABLED         -> usa o espelho nos downloads (padrão: False)
+    MIRROR_DIR             -> diretório (padrão: mirror/ ao lado deste arquivo)
+    MIRROR_VERIFY_ON_READ  -> confere também o MD5 ao reler do disco (padrão: False, só o tamanho)
+    MIRROR_RETRIES         -> tentativas de download por arquivo (padrão: 3)
+"""
+import hashlib
+import logging
+import os
+import threading
+import time
+import traceback
+
+import requests
+
+import config
+import data_extraction1
+import metrics
+
+_CHUNK = 1024 * 1024  # Leitura do disco (MD5)
+_NET_CHUNK = 64 * 1024  # Recebido por escrita no .part (o que se perde numa queda)
+
+
+def is_enabled():
+    return getattr(config, "MIRROR_ENABLED", False)
+
+
+def _expected_size(size):
+    size = str(size) if size is not None else ""
+    return int(size) if size.isdigit() else None
+
+
+def _file_md5(path, digest=None):
+    digest = digest or hashlib.md5()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(_CHUNK), b""):
+            digest.update(block)
+    return digest
+
+
+class Mirror:
+    """Diretório com os zips do GDELT, conferidos por tamanho e MD5."""
+
+    def __init__(self, directory=None, verify_on_read=None, retries=None):
+        self.directory = directory or getattr(config, "MIRROR_DIR", None) or os.path.join(
+            os.path.dirname(os.path.abspath(__file__)), "mirror"
+        )
+        self.verify_on_read = (
+            verify_on_read if verify_on_read is not None else getattr(config, "MIRROR_VERIFY_ON_READ", False)
+        )
+        self.retries = retries or getattr(config, "MIRROR_RETRIES", 3)
+        self._local = threading.local()  # Uma requests.Session por thread
+
+    def _session(self):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def path_for(self, url):
+        """Caminho local do arquivo (subdiretório pelo dia do timestamp do nome)."""
+        name = url.rsplit("/", 1)[-1]
+        day = name[:8] if name[:8].isdigit() else "other"
+        return os.path.join(self.directory, day, name)
+
+    @staticmethod
+    def verify(path, size=None, md5=None):
+        """Confere o arquivo com o tamanho e o MD5 esperados (os que forem informados)."""
+        expected = _expected_size(size)
+        if expected is not None and os.path.getsize(path) != expected:
+            return False
+        return not md5 or _file_md5(path).hexdigest() == md5.lower()
+
+    def fetch(self, url, size=None, md5=None):
+        """
+        Retorna o caminho local do arquivo, baixando-o (ou completando o
+        download) se necessário.
+
+        Args:
+            url: URL do arquivo.
+            size, md5: Tamanho e hash da linha do masterfile (opcionais).
+
+        Returns:
+            Caminho do arquivo conferido, ou None se não foi possível baixá-lo.
+        """
+        path = self.path_for(url)
+        if os.path.exists(path):
+            if self.verify(path, size, md5 if self.verify_on_read else None):
+                metrics.inc("mirror_requests_total", result="hit")
+                logging.debug("Espelho: %s lido do disco", path)
+                return path
+            logging.warning(f"Espelho: {path} não confere com o masterfile; baixando de novo.")
+            os.remove(path)
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        for attempt in range(1, self.retries + 1):
+            try:
+                if self._download(url, path, size, md5):
+                    return path
+            except (requests.RequestException, OSError) as e:
+                logging.warning(f"Espelho: erro ao baixar {url} (tentativa {attempt}/{self.retries}): {e}")
+            if attempt < self.retries:
+                time.sleep(min(2 ** attempt, 30))
+        metrics.inc("mirror_requests_total", result="failed")
+        logging.error(f"Espelho: não foi possível baixar {url}.")
+        return None
+
+    def _download(self, url, path, size, md5):
+        part_path = path + ".part"
+        expected = _expected_size(size)
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        if expected is not None and offset > expected:
+            offset = 0  # Trecho maior que o arquivo: recomeça
+
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+        timeout = getattr(config, "REQUEST_TIMEOUT", 30)
+        with self._session().get(url, headers=headers, stream=True, timeout=timeout) as response:
+            if response.status_code == 416 and offset:
+                # O .part já tem o arquivo inteiro (faltou só conferir e renomear)
+                return self._finish(url, part_path, path, size, md5, resumed=True)
+            response.raise_for_status()
+            resumed = offset > 0 and response.status_code == 206
+            if resumed:
+                digest = _file_md5(part_path)
+                mode = "ab"
+            else:
+                digest = hashlib.md5()
+                mode = "wb"
+            downloaded = 0
+            with open(part_path, mode) as f:
+                for block in response.iter_content(_NET_CHUNK):
+                    f.write(block)
+                    digest.update(block)
+                    downloaded += len(block)
+        metrics.inc("mirror_download_bytes_total", downloaded)
+        if resumed:
+            logging.info(f"Espelho: download de {url} retomado no byte {offset}.")
+        return self._finish(url, part_path, path, size, md5, resumed, digest)
+
+    def _finish(self, url, part_path, path, size, md5, resumed, digest=None):
+        expected = _expected_size(size)
+        actual_size = os.path.getsize(part_path)
+        if expected is not None and actual_size < expected:
+            # Conexão encerrada antes do fim: a próxima tentativa continua daqui
+            logging.warning(f"Espelho: {url} incompleto ({actual_size}/{expected} bytes).")
+            return False
+        digest = digest or _file_md5(part_path)
+        if (expected is not None and actual_size != expected) or (md5 and digest.hexdigest() != md5.lower()):
+            logging.warning(f"Espelho: {url} não confere com o masterfile (tamanho ou MD5); descartando.")
+            metrics.inc("mirror_verify_failures_total")
+            os.remove(part_path)
+            return False
+        os.replace(part_path, path)
+        metrics.inc("mirror_requests_total", result="resumed" if resumed else "downloaded")
+        return True
+
+
+_default_mirror = None
+_default_lock = threading.Lock()
+
+
+def get_mirror():
+    """Espelho padrão configurado por config.MIRROR_*, ou None se desativado."""
+    global _default_mirror
+    if not is_enabled():
+        return None
+    with _default_lock:
+        if _default_mirror is None:
+            _default_mirror = Mirror()
+        return _default_mirror
+
+
+def download(url, size=None, file_hash=None):
+    """
+    Obtém um arquivo do GDELT para os loaders.
+
+    Com o espelho ativo retorna o caminho local (conferido com size/file_hash);
+    caso contrário usa data_extraction1.download_gdelt_file (conteúdo em
+    memória). Retorna None em caso de falha.
+    """
+    mirror = get_mirror()
+    if mirror is None or not url.startswith(("http://", "https://")):
+        return data_extraction1.download_gdelt_file(url)
+    try:
+        return mirror.fetch(url, size, file_hash)
+    except Exception as e:
+        logging.error(f"Espelho: erro inesperado com {url}: {e}")
+        traceback.print_exc()
+        return None
@@ -0,0 +1,130 @@
+# mongo_pool.py
+"""
+Gerenciador de conexão com o MongoDB compartilhado pelo processo.
+
+Um único MongoClient (por URL) é criado na primeira utilização e reaproveitado
+por todos os módulos (events_db, mentions_db, gkg_db, related_events...). O
+MongoClient já é thread-safe e mantém seu próprio pool de conexões, então não
+faz sentido abrir/fechar um cliente a cada arquivo.
+
+Configurações (todas opcionais em config.py):
+    MONGO_MAX_POOL_SIZE   -> conexões máximas no pool (padrão: 100)
+    MONGO_MIN_POOL_SIZE   -> conexões mantidas abertas (padrão: 0)
+    MONGO_WRITE_CONCERN   -> dict passado para WriteConcern, ex.: {"w": 1, "j": False}
+    MONGO_CLIENT_OPTIONS  -> dict com opções extras para o MongoClient
+
+Com config.METRICS_ENABLED a latência de cada comando é registrada em
+metrics.py (listener do pymongo adicionado às opções do cliente).
+"""
+import atexit
+import logging
+import os
+import threading
+
+from pymongo import MongoClient
+from pymongo.errors import BulkWriteError
+from pymongo.write_concern import WriteConcern
+
+import config
+import metrics
+
+_clients = {}  # url -> MongoClient
+_pid = os.getpid()
+_lock = threading.Lock()
+_on_connect_hooks = []
+_on_close_hooks = []
+
+
+def register_on_connect(hook):
+    """Registra uma função hook(client) chamada logo após criar um cliente."""
+    _on_connect_hooks.append(hook)
+    return hook
+
+
+def register_on_close(hook):
+    """Registra uma função hook(client) chamada logo antes de fechar um cliente."""
+    _on_close_hooks.append(hook)
+    return hook
+
+
+def _client_options():
+    options = {
+        "maxPoolSize": getattr(config, "MONGO_MAX_POOL_SIZE", 100),
+        "minPoolSize": getattr(config, "MONGO_MIN_POOL_SIZE", 0),
+    }
+    options.update(getattr(config, "MONGO_CLIENT_OPTIONS", None) or {})
+    if metrics.is_enabled():
+        options["event_listeners"] = list(options.get("event_listeners") or []) + [metrics.mongo_listener]
+    return options
+
+
+def get_client(url=None):
+    """Retorna o MongoClient compartilhado para a URL (padrão: config.MONGODB_URL)."""
+    global _pid
+    url = url or config.MONGODB_URL
+    with _lock:
+        if os.getpid() != _pid:
+            # Processo filho (fork): os sockets do pai não podem ser reaproveitados
+            _clients.clear()
+            _pid = os.getpid()
+        client = _clients.get(url)
+        if client is None:
+            options = _client_options()
+            client = MongoClient(url, **options)
+            _clients[url] = client
+            logging.info(f"Conexão com o MongoDB criada (pool máximo: {options['maxPoolSize']}).")
+            for hook in _on_connect_hooks:
+                hook(client)
+    return client
+
+
+def get_database(name=None, url=None):
+    """Retorna o banco de dados (padrão: config.DB_NAME) usando o cliente compartilhado."""
+    return get_client(url)[name or config.DB_NAME]
+
+
+def get_collection(name, db_name=None, url=None):
+    """Retorna a coleção com o write concern configurado em config.MONGO_WRITE_CONCERN."""
+    db = get_database(db_name, url)
+    write_concern = getattr(config, "MONGO_WRITE_CONCERN", None)
+    if write_concern:
+        return db.get_collection(name, write_concern=WriteConcern(**write_concern))
+    return db[name]
+
+
+def close_client(url=None):
+    """Fecha o cliente da URL informada, ou todos os clientes se url for None."""
+    with _lock:
+        urls = [url] if url is not None else list(_clients)
+        for key in urls:
+            client = _clients.pop(key, None)
+            if client is None:
+                continue
+            for hook in _on_close_hooks:
+                try:
+                    hook(client)
+                except Exception as e:
+                    logging.warning(f"Erro em hook de fechamento do MongoDB: {e}")
+            client.close()
+            logging.info("Conexão com o MongoDB fechada.")
+
+
+def insert_unordered(collection, documents):
+    """
+    insert_many não ordenado em que chaves duplicadas não interrompem o lote.
+
+    Retorna (quantidade inserida, índices em `documents` que já existiam).
+    Qualquer outro erro de escrita é propagado (BulkWriteError).
+    """
+    try:
+        result = collection.insert_many(documents, ordered=False)
+        return len(result.inserted_ids), []
+    except BulkWriteError as e:
+        write_errors = e.details.get("writeErrors", [])
+        duplicates = [error["index"] for error in write_errors if error.get("code") == 11000]
+        if len(duplicates) != len(write_errors) or e.details.get("writeConcernErrors"):
+            raise
+        return e.details.get("nInserted", 0), duplicates
+
+
+atexit.register(close_client)
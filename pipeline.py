@@ -0,0 +1,343 @@
+# pipeline.py
+"""
+Pipeline de ingestão em estágios (download -> parse -> escrita).
+
+Cada estágio roda em seu próprio conjunto de threads e os estágios são ligados
+por filas limitadas (queue.Queue com maxsize). Quando um estágio mais lento
+enche a fila seguinte, o anterior bloqueia no put() (backpressure), então a
+memória fica limitada ao tamanho das filas, e rede, CPU e MongoDB trabalham
+ao mesmo tempo.
+
+Configurações (todas opcionais em config.py):
+    PIPELINE_ENABLED          -> usa o pipeline em main.main (padrão: False)
+    PIPELINE_DOWNLOAD_WORKERS -> threads de download (padrão: 4)
+    PIPELINE_PARSE_WORKERS    -> threads de parse/descompactação (padrão: 2)
+    PIPELINE_WRITE_WORKERS    -> threads de escrita no MongoDB (padrão: 2)
+    PIPELINE_QUEUE_SIZE       -> tamanho máximo de cada fila (padrão: 8)
+
+Os downloads passam por mirror.download (espelho local conferido por tamanho e
+MD5, se config.MIRROR_ENABLED). O estado de cada arquivo é registrado no
+manifesto (manifest.py). Duração de
+cada estágio, espera por fila cheia, profundidade das filas, linhas e bytes
+vão para metrics.py.
+
+Com config.GKG_STREAMING os arquivos GKG passam pela fila em blocos de
+config.GKG_CHUNK_SIZE linhas, então a fila limita também a memória do GKG.
+"""
+import logging
+import queue
+import threading
+import time
+import traceback
+from collections import defaultdict
+
+import config
+import manifest
+import metrics
+import mirror
+import sinks
+import utils
+from masterfile import detect_file_type
+from db_operations import events_db, mentions_db, gkg_db
+
+_STOP = object()  # Sentinela que encerra os workers de um estágio
+
+# Funções de parse para cada tipo de arquivo (a escrita passa pelos sinks)
+_PARSERS = {
+    "events": events_db.parse_events_data,
+    "mentions": mentions_db.parse_mentions_data,
+    "gkg": gkg_db.parse_gkg_data,
+}
+
+
+class _Stage:
+    """Conjunto de threads que consome uma fila de entrada e alimenta a próxima."""
+
+    def __init__(self, name, workers, handler, in_queue, out_queue, stats):
+        self.name = name
+        self.workers = max(1, int(workers))
+        self.handler = handler
+        self.in_queue = in_queue
+        self.out_queue = out_queue
+        self.stats = stats
+        self.next_workers = 0  # Quantos sentinelas enviar ao próximo estágio
+        self._alive = self.workers
+        self._lock = threading.Lock()
+        self.threads = [
+            threading.Thread(target=self._run, name=f"{name}-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+
+    def start(self):
+        for thread in self.threads:
+            thread.start()
+
+    def join(self):
+        for thread in self.threads:
+            thread.join()
+
+    def _emit(self, item):
+        if self.out_queue is not None:
+            started = time.perf_counter()
+            self.out_queue.put(item)  # Bloqueia se a fila estiver cheia (backpressure)
+            metrics.observe("etl_queue_wait_seconds", time.perf_counter() - started, stage=self.name)
+
+    def _run(self):
+        try:
+            while True:
+                item = self.in_queue.get()
+                if item is _STOP:
+                    break
+                metrics.set_gauge("etl_queue_depth", self.in_queue.qsize(), stage=self.name)
+                job = item[0]
+                busy = 0.0  # Tempo de trabalho do estágio, sem a espera na fila seguinte
+                started = time.perf_counter()
+                try:
+                    for result in self.handler(item):
+                        busy += time.perf_counter() - started
+                        self._emit(result)
+                        started = time.perf_counter()
+                except Exception as e:
+                    self.stats.failure(self.name, job, e)
+                busy += time.perf_counter() - started
+                job.stage_seconds[self.name] += busy
+                metrics.observe(
+                    "etl_stage_seconds", busy, stage=self.name, file_type=job.file_type or "unknown"
+                )
+                if job.take_report():
+                    self.stats.report(job)  # Arquivo concluído: resumo com os tempos de todos os estágios
+        finally:
+            # O último worker do estágio avisa o próximo estágio que acabou
+            with self._lock:
+                self._alive -= 1
+                last = self._alive == 0
+            if last and self.out_queue is not None:
+                for _ in range(self.next_workers):
+                    self.out_queue.put(_STOP)
+
+
+class _Job:
+    """Estado de um arquivo dentro do pipeline (pode ser gravado em vários blocos)."""
+
+    def __init__(self, url, size=None, file_hash=None):
+        self.url = url
+        self.size = size
+        self.file_hash = file_hash
+        self.file_type = detect_file_type(url)
+        self.rows_parsed = 0
+        self.rows_written = 0
+        self.bytes = 0
+        self.stage_seconds = defaultdict(float)  # estágio -> segundos (soma dos blocos)
+        self._chunks = 0  # Blocos lidos (número da próxima parte)
+        self._pending = 0  # Blocos lidos e ainda não gravados
+        self._parsed = False
+        self._failed = False
+        self._completed = False
+        self._reported = False
+        self._lock = threading.Lock()
+
+    def add_chunk(self, rows):
+        """Conta um bloco lido; retorna o número da parte (0, 1, ...)."""
+        with self._lock:
+            part = self._chunks
+            self._chunks += 1
+            self._pending += 1
+            self.rows_parsed += rows
+            return part
+
+    def finish_parse(self):
+        """Marca o fim da leitura; retorna True se todos os blocos já foram gravados."""
+        with self._lock:
+            self._parsed = True
+            return self._pending == 0 and not self._failed
+
+    def chunk_written(self, rows):
+        """Conta um bloco gravado; retorna True se foi o último do arquivo."""
+        with self._lock:
+            self._pending -= 1
+            self.rows_written += rows
+            return self._parsed and self._pending == 0 and not self._failed
+
+    def complete(self):
+        with self._lock:
+            self._completed = True
+
+    def take_report(self):
+        """Retorna True uma única vez, depois que o arquivo foi concluído com sucesso."""
+        with self._lock:
+            report = self._completed and not self._reported
+            self._reported = self._reported or report
+            return report
+
+    def fail(self):
+        """Marca o arquivo como falho; retorna True apenas na primeira falha."""
+        with self._lock:
+            first = not self._failed
+            self._failed = True
+            return first
+
+
+class _Stats:
+    """Contadores do pipeline, protegidos por lock."""
+
+    def __init__(self, total):
+        self.total = total
+        self.processed = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+
+    def success(self, job):
+        with self._lock:
+            self.processed += 1
+            processed = self.processed
+        manifest.mark(
+            job.url, manifest.WRITTEN, job.size, job.file_hash,
+            rows_parsed=job.rows_parsed, rows_written=job.rows_written,
+        )
+        job.complete()
+        metrics.inc("etl_files_total", file_type=job.file_type, status="written")
+        metrics.inc("etl_rows_total", job.rows_written, file_type=job.file_type)
+        logging.info(
+            f"Progresso: {processed}/{self.total} ({processed / self.total * 100:.2f}%) - {job.url}"
+        )
+
+    def report(self, job):
+        logging.info(
+            "Arquivo gravado: %s", job.url,
+            extra={
+                "url": job.url,
+                "file_type": job.file_type,
+                "rows": job.rows_written,
+                "bytes": job.bytes,
+                "stage_seconds": {stage: round(seconds, 4) for stage, seconds in job.stage_seconds.items()},
+            },
+        )
+
+    def failure(self, stage, job, error):
+        if not job.fail():
+            return
+        with self._lock:
+            self.failed += 1
+        metrics.inc("etl_files_total", file_type=job.file_type or "unknown", status="failed")
+        manifest.mark(job.url, manifest.FAILED, job.size, job.file_hash, error=f"{stage}: {error}")
+        logging.error(f"Falha no estágio '{stage}' para {job.url}: {error}")
+        if isinstance(error, Exception):
+            traceback.print_exc()
+
+
+def _download(stats):
+    def handler(item):
+        job = item[0]
+        if job.file_type is None:
+            logging.warning(f"Tipo de arquivo desconhecido para URL: {job.url}")
+            return
+        logging.info(f"Processando URL: {job.url}")
+        file_content = mirror.download(job.url, job.size, job.file_hash)
+        if not file_content:
+            stats.failure("download", job, "falha ao baixar")
+            return
+        job.bytes = utils.content_size(file_content)
+        metrics.inc("etl_bytes_total", job.bytes, file_type=job.file_type)
+        manifest.mark(job.url, manifest.DOWNLOADED, job.size, job.file_hash)
+        yield (job, file_content)
+    return handler
+
+
+def _iter_frames(job, file_content):
+    # O GKG pode ser lido em blocos (config.GKG_STREAMING), os demais em um único DataFrame
+    if job.file_type == "gkg" and getattr(config, "GKG_STREAMING", True):
+        return gkg_db.iter_gkg_chunks(file_content, job.url)
+    df = _PARSERS[job.file_type](file_content, job.url)
+    if df is None:
+        raise RuntimeError("nenhum dado lido do arquivo")
+    return [df]
+
+
+def _parse(stats):
+    def handler(item):
+        job, file_content = item
+        # Antes do primeiro bloco: os blocos podem ser gravados fora de ordem por vários workers
+        if not sinks.begin(job.file_type, job.url):
+            raise RuntimeError("falha ao preparar os sinks")
+        # Cada bloco segue para a escrita assim que é lido
+        for df in _iter_frames(job, file_content):
+            yield (job, df, job.add_chunk(len(df)))
+        manifest.mark(job.url, manifest.PARSED, job.size, job.file_hash, rows_parsed=job.rows_parsed)
+        if job.finish_parse():
+            stats.success(job)
+    return handler
+
+
+def _write(stats):
+    def handler(item):
+        job, df, part = item
+        rows = sinks.write(job.file_type, df, job.url, part)
+        if rows is None:
+            raise RuntimeError("falha na gravação (sinks)")
+        if job.chunk_written(rows):
+            stats.success(job)
+        return ()
+    return handler
+
+
+def _as_job(entry):
+    # Aceita uma URL ou uma tupla (size, file_hash, url) do masterfile
+    if isinstance(entry, str):
+        return _Job(entry)
+    size, file_hash, url = entry
+    return _Job(url, size, file_hash)
+
+
+def run_pipeline(entries, download_workers=None, parse_workers=None, write_workers=None, queue_size=None):
+    """
+    Processa os arquivos com os estágios de download, parse e escrita em paralelo.
+
+    Args:
+        entries: Lista de URLs ou de tuplas (size, file_hash, url) do masterfile.
+        download_workers, parse_workers, write_workers: Número de threads por
+            estágio (padrão: valores de config.PIPELINE_*).
+        queue_size: Tamanho máximo das filas entre estágios.
+
+    Returns:
+        Dicionário com os contadores 'total', 'processed' e 'failed'.
+    """
+    download_workers = download_workers or getattr(config, "PIPELINE_DOWNLOAD_WORKERS", 4)
+    parse_workers = parse_workers or getattr(config, "PIPELINE_PARSE_WORKERS", 2)
+    write_workers = write_workers or getattr(config, "PIPELINE_WRITE_WORKERS", 2)
+    queue_size = queue_size or getattr(config, "PIPELINE_QUEUE_SIZE", 8)
+
+    jobs = [_as_job(entry) for entry in entries]
+    stats = _Stats(len(jobs))
+    if not jobs:
+        return {"total": 0, "processed": 0, "failed": 0}
+
+    url_queue = queue.Queue(maxsize=queue_size)
+    downloaded_queue = queue.Queue(maxsize=queue_size)
+    parsed_queue = queue.Queue(maxsize=queue_size)
+
+    download_stage = _Stage("download", download_workers, _download(stats), url_queue, downloaded_queue, stats)
+    parse_stage = _Stage("parse", parse_workers, _parse(stats), downloaded_queue, parsed_queue, stats)
+    write_stage = _Stage("write", write_workers, _write(stats), parsed_queue, None, stats)
+    download_stage.next_workers = parse_stage.workers
+    parse_stage.next_workers = write_stage.workers
+
+    logging.info(
+        f"Pipeline iniciado: {len(jobs)} arquivos, {download_stage.workers} download / "
+        f"{parse_stage.workers} parse / {write_stage.workers} escrita, filas de {queue_size}."
+    )
+    stages = (download_stage, parse_stage, write_stage)
+    for stage in stages:
+        stage.start()
+
+    for job in jobs:
+        url_queue.put((job,))
+    for _ in range(download_stage.workers):
+        url_queue.put(_STOP)
+
+    for stage in stages:
+        stage.join()
+
+    logging.info(
+        f"Pipeline concluído: {stats.processed}/{stats.total} arquivos processados, {stats.failed} falhas."
+    )
+    return {"total": stats.total, "processed": stats.processed, "failed": stats.failed}
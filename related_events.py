@@ -1,8 +1,14 @@
 # related_events.py
-from pymongo import MongoClient
 import datetime
 import logging
+import traceback
+import numpy as np
+import pandas as pd
+from pymongo import UpdateOne
 import config
+import mongo_pool
+import db_indexes
+import keyword_index
 
 def find_related_events(mongodb_url, db_name, events_collection, mentions_collection):
     """
@@ -12,25 +18,30 @@ def find_related_events(mongodb_url, db_name, events_collection, mentions_collec
         - Ocorram dentro de um período de tempo após um evento "gatilho".
         - Tenham códigos CAMEO específicos (configuráveis).
         - Estejam em locais próximos (opcional, com base em raio configurável).
-        - (Opcional) Mencione palavras chaves em comum.
+        - (Opcional) Tenham artigos com todas as palavras de config.KEYWORDS
+          (consulta ao índice invertido de keyword_index).
 
     Os eventos relacionados são marcados no MongoDB adicionando-se um campo
     'related_to' ao evento subsequente, que aponta para o ID do evento gatilho.
 
     Args:
-        mongodb_url: String de conexão com o MongoDB.
+        mongodb_url: String de conexão com o MongoDB (o cliente é compartilhado
+            via mongo_pool, não é aberto/fechado a cada chamada).
         db_name: Nome do banco de dados.
         events_collection: Nome da coleção de eventos.
-        mentions_collection: Nome da coleção de menções (opcional, para keywords).
+        mentions_collection: Nome da coleção de menções (não usado; as
+            palavras-chave vêm de keyword_index).
 
     Returns:
         None.  Modifica os documentos no MongoDB diretamente.
     """
     try:
-        client = MongoClient(mongodb_url)
-        db = client[db_name]
+        db = mongo_pool.get_database(db_name, mongodb_url)
         events = db[events_collection]
-        # mentions = db[mentions_collection]  # Descomente se for usar keywords
+        keyword_ids = _keyword_event_ids()
+        if keyword_ids is not None:
+            # Filtrado no cliente: um $in com a lista inteira pode passar do limite de 16 MB do BSON
+            keyword_ids = set(keyword_ids.tolist())
 
         # 1. Encontrar Eventos Gatilho:
         trigger_query = {
@@ -42,12 +53,14 @@ def find_related_events(mongodb_url, db_name, events_collection, mentions_collec
         }
         trigger_events_cursor = events.find(trigger_query)
 
+        # Índices (inclusive o 2dsphere de 'loc'), verificados uma vez por processo
+        db_indexes.ensure_indexes(db)
+
         # Itera sobre os eventos gatilho
         for trigger_event in trigger_events_cursor:
             trigger_event_id = trigger_event["GlobalEventID"]
-            trigger_date = datetime.datetime(
-                trigger_event["Year"], trigger_event["MonthYear"] % 100, trigger_event["Day"]
-            )
+            # "Day" é a data completa no formato YYYYMMDD
+            trigger_date = datetime.datetime.strptime(str(trigger_event["Day"]), "%Y%m%d")
             trigger_lat = trigger_event["ActionGeo_Lat"]
             trigger_lon = trigger_event["ActionGeo_Long"]
 
@@ -76,9 +89,6 @@ def find_related_events(mongodb_url, db_name, events_collection, mentions_collec
 
             # Filtragem geográfica (opcional):
             if config.GEO_DISTANCE_THRESHOLD_KM is not None:
-                # Cria um índice 2dsphere (se ainda não existir)
-                events.create_index([("loc", "2dsphere")])
-
                 subsequent_events_query["loc"] = {
                     "$nearSphere": {
                         "$geometry": {
@@ -89,23 +99,6 @@ def find_related_events(mongodb_url, db_name, events_collection, mentions_collec
                     }
                 }
 
-            # --- (Opcional) Filtragem por palavras-chave (usando a coleção de menções) ---
-            # keyword_filter = []
-            # if config.KEYWORDS:
-            #     # Consulta a coleção de menções para encontrar URLs que mencionam o evento gatilho
-            #     mention_urls = [m["MentionIdentifier"] for m in mentions.find({"GlobalEventID": trigger_event_id}, {"MentionIdentifier": 1})]
-            #     for keyword in config.KEYWORDS:
-            #         # Cria uma expressão regular para buscar a palavra-chave em qualquer parte do texto
-            #         keyword_regex = re.compile(re.escape(keyword), re.IGNORECASE)
-            #         keyword_filter.append({"$or": [
-            #             {"SOURCEURL": {"$in": mention_urls}, "article_content": {"$regex": keyword_regex}}, #Usar os artigos baixados
-            #             #{"SOURCEURL": {"$in": mention_urls}} #Se não for usar os artigos baixados
-            #         ]})
-
-            #     if keyword_filter:
-            #       subsequent_events_query["$and"] = keyword_filter
-
-
             # Executa a consulta para eventos subsequentes
             subsequent_events_cursor = events.find(subsequent_events_query)
 
@@ -113,13 +106,16 @@ def find_related_events(mongodb_url, db_name, events_collection, mentions_collec
             related_count = 0  # Contador de eventos relacionados
             for subsequent_event in subsequent_events_cursor:
                 subsequent_event_id = subsequent_event["GlobalEventID"]
+                # --- (Opcional) Filtragem por palavras-chave (índice invertido, ver keyword_index.py) ---
+                if keyword_ids is not None and subsequent_event_id not in keyword_ids:
+                    continue
                 # Marca o evento subsequente como relacionado ao evento gatilho
                 events.update_one(
                     {"GlobalEventID": subsequent_event_id},
                     {"$set": {"related_to": trigger_event_id}}
                 )
                 related_count += 1
-                logging.debug(f"  Evento {subsequent_event_id} relacionado a {trigger_event_id}")
+                logging.debug("  Evento %s relacionado a %s", subsequent_event_id, trigger_event_id)
 
             logging.info(f"  Encontrados {related_count} eventos relacionados.")
 
@@ -128,9 +124,392 @@ def find_related_events(mongodb_url, db_name, events_collection, mentions_collec
         logging.error(f"Erro ao encontrar eventos relacionados: {e}")
         traceback.print_exc()
 
-    finally:
-        if 'client' in locals():
-            client.close()
+EARTH_RADIUS_KM = 6371.0088
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Distância (km) pela fórmula de haversine; aceita escalares ou arrays NumPy."""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=np.float64)) for v in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def _day_to_ordinal(days):
+    # YYYYMMDD (int) -> número de dias desde 1970-01-01
+    dates = pd.to_datetime(pd.Series(days).astype(str), format="%Y%m%d")
+    return dates.values.astype("datetime64[D]").astype(np.int64)
+
+
+def _ordinal_to_day(ordinal):
+    date = datetime.date(1970, 1, 1) + datetime.timedelta(days=int(ordinal))
+    return int(date.strftime("%Y%m%d"))
+
+
+def _load_events_frame(events, query):
+    # Carrega apenas os campos usados pelo motor em memória
+    projection = {"_id": 0, "GlobalEventID": 1, "Day": 1, "ActionGeo_Lat": 1, "ActionGeo_Long": 1}
+    df = pd.DataFrame(list(events.find(query, projection, batch_size=10000)),
+                      columns=["GlobalEventID", "Day", "ActionGeo_Lat", "ActionGeo_Long"])
+    df = df.dropna(subset=["GlobalEventID", "Day", "ActionGeo_Lat", "ActionGeo_Long"])
+    return df.astype({"GlobalEventID": "int64", "Day": "int64",
+                      "ActionGeo_Lat": "float64", "ActionGeo_Long": "float64"})
+
+
+def _to_unit_xyz(lat, lon):
+    lat, lon = np.radians(lat), np.radians(lon)
+    return np.column_stack((np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)))
+
+
+def _spatial_pairs(trig_xyz, cand_xyz, max_km):
+    """
+    Pares (gatilho, candidato) a no máximo max_km, usando uma grade 3D.
+
+    Os pontos são projetados na esfera unitária e agrupados em células cúbicas
+    do tamanho da corda equivalente a max_km; cada gatilho só é comparado com
+    os candidatos das 27 células vizinhas (sem problemas nos polos ou no
+    antimeridiano).
+    """
+    chord = 2 * np.sin(min(max_km / EARTH_RADIUS_KM, np.pi) / 2)
+    cell = max(chord, 1e-6)
+    base = int(np.ceil(2 / cell)) + 5
+    offset = base // 2
+
+    def cell_keys(coords):
+        return ((coords[:, 0] + offset) * base + (coords[:, 1] + offset)) * base + (coords[:, 2] + offset)
+
+    cand_cells = np.floor(cand_xyz / cell).astype(np.int64)
+    trig_cells = np.floor(trig_xyz / cell).astype(np.int64)
+    cand_keys = cell_keys(cand_cells)
+    order = np.argsort(cand_keys, kind="stable")
+    sorted_keys = cand_keys[order]
+
+    trig_parts, cand_parts = [], []
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            for dz in (-1, 0, 1):
+                keys = cell_keys(trig_cells + np.array([dx, dy, dz]))
+                lo = np.searchsorted(sorted_keys, keys, side="left")
+                hi = np.searchsorted(sorted_keys, keys, side="right")
+                counts = hi - lo
+                total = int(counts.sum())
+                if not total:
+                    continue
+                trig_idx = np.repeat(np.arange(len(keys)), counts)
+                # Posições lo..hi-1 de cada gatilho, concatenadas sem loop Python
+                starts = np.repeat(lo - np.cumsum(counts) + counts, counts)
+                cand_idx = order[starts + np.arange(total)]
+                trig_parts.append(trig_idx)
+                cand_parts.append(cand_idx)
+
+    if not trig_parts:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    return np.concatenate(trig_parts), np.concatenate(cand_parts)
+
+
+def match_related_events(triggers, candidates, window_days, max_km=None):
+    """
+    Relaciona candidatos a gatilhos em memória (vetorizado).
+
+    Um candidato é relacionado ao primeiro gatilho (ordem de Day e
+    GlobalEventID) que ocorreu entre 0 e `window_days` dias antes dele e,
+    se `max_km` não for None, a no máximo `max_km` km de distância. Um evento
+    nunca é relacionado a si mesmo.
+
+    Args:
+        triggers, candidates: DataFrames com GlobalEventID, Day (YYYYMMDD),
+            ActionGeo_Lat e ActionGeo_Long.
+        window_days: Janela de tempo (config.TIME_WINDOW_DAYS).
+        max_km: Distância máxima (config.GEO_DISTANCE_THRESHOLD_KM) ou None.
+
+    Returns:
+        Dicionário {GlobalEventID do candidato: GlobalEventID do gatilho}.
+    """
+    if triggers.empty or candidates.empty:
+        return {}
+
+    triggers = triggers.sort_values(["Day", "GlobalEventID"], kind="stable").reset_index(drop=True)
+    trig_ids = triggers["GlobalEventID"].to_numpy()
+    cand_ids = candidates["GlobalEventID"].to_numpy()
+    trig_days = _day_to_ordinal(triggers["Day"])
+    cand_days = _day_to_ordinal(candidates["Day"])
+
+    if max_km is None:
+        # Sem filtro geográfico: o primeiro gatilho da janela é o de menor Day >= Day - janela
+        first = np.searchsorted(trig_days, cand_days - window_days, side="left")
+        n = len(trig_ids)
+        is_self = (first < n) & (trig_ids[np.minimum(first, n - 1)] == cand_ids)
+        first = first + is_self
+        valid = first < n
+        valid[valid] &= trig_days[first[valid]] <= cand_days[valid]
+        return dict(zip(cand_ids[valid].tolist(), trig_ids[first[valid]].tolist()))
+
+    trig_xyz = _to_unit_xyz(triggers["ActionGeo_Lat"].to_numpy(), triggers["ActionGeo_Long"].to_numpy())
+    cand_xyz = _to_unit_xyz(candidates["ActionGeo_Lat"].to_numpy(), candidates["ActionGeo_Long"].to_numpy())
+    trig_idx, cand_idx = _spatial_pairs(trig_xyz, cand_xyz, max_km)
+
+    # Filtros de tempo, identidade e distância exata sobre todos os pares de uma vez
+    delta = cand_days[cand_idx] - trig_days[trig_idx]
+    keep = (delta >= 0) & (delta <= window_days) & (trig_ids[trig_idx] != cand_ids[cand_idx])
+    trig_idx, cand_idx = trig_idx[keep], cand_idx[keep]
+    distance = haversine_km(
+        triggers["ActionGeo_Lat"].to_numpy()[trig_idx], triggers["ActionGeo_Long"].to_numpy()[trig_idx],
+        candidates["ActionGeo_Lat"].to_numpy()[cand_idx], candidates["ActionGeo_Long"].to_numpy()[cand_idx],
+    )
+    keep = distance <= max_km
+    trig_idx, cand_idx = trig_idx[keep], cand_idx[keep]
+    if not len(cand_idx):
+        return {}
+
+    # Para cada candidato fica o gatilho de menor ordem (índice já ordenado por Day/ID)
+    order = np.lexsort((trig_idx, cand_idx))
+    trig_idx, cand_idx = trig_idx[order], cand_idx[order]
+    _, first = np.unique(cand_idx, return_index=True)
+    return dict(zip(cand_ids[cand_idx[first]].tolist(), trig_ids[trig_idx[first]].tolist()))
+
+
+def _keyword_event_ids():
+    # GlobalEventIDs com todas as palavras de config.KEYWORDS, ou None sem filtro
+    keywords = getattr(config, "KEYWORDS", None)
+    if not keywords:
+        return None
+    ids = keyword_index.lookup(keywords)
+    if ids is None:
+        logging.warning(f"Filtro de palavras-chave {keywords}: nenhuma palavra indexável; filtro ignorado.")
+        return None
+    logging.info(f"Filtro de palavras-chave {keywords}: {len(ids)} eventos.")
+    return ids
+
+
+def _trigger_query():
+    # Mesmos critérios de gatilho de find_related_events
+    return {
+        "EventRootCode": {"$in": config.TRIGGER_EVENT_TYPES},
+        "GoldsteinScale": {"$lt": config.GOLDSTEIN_THRESHOLD},
+        "ActionGeo_Lat": {"$exists": True},
+        "ActionGeo_Long": {"$exists": True},
+        "related_to": {"$exists": False}
+    }
+
+
+def _compute_links(events, trigger_query, candidate_days=None):
+    """
+    Carrega gatilhos e candidatos e faz o casamento em memória.
+
+    Sem `candidate_days`, os candidatos são todos os eventos da janela de
+    tempo dos gatilhos; com ele, só os eventos desses dias (lista de Day).
+
+    Returns:
+        Dicionário {GlobalEventID do candidato: GlobalEventID do gatilho}.
+    """
+    triggers = _load_events_frame(events, trigger_query)
+    if triggers.empty:
+        logging.info("Nenhum evento gatilho encontrado.")
+        return {}
+
+    if candidate_days is None:
+        first_day = int(triggers["Day"].min())
+        last_day = _ordinal_to_day(_day_to_ordinal([int(triggers["Day"].max())])[0] + config.TIME_WINDOW_DAYS)
+        day_filter = {"$gte": first_day, "$lte": last_day}
+        day_label = f"Day de {first_day} a {last_day}"
+    else:
+        day_filter = {"$in": candidate_days}
+        day_label = f"{len(candidate_days)} dias"
+    candidate_query = {
+        "Day": day_filter,
+        "ActionGeo_Lat": {"$exists": True},
+        "ActionGeo_Long": {"$exists": True},
+        "related_to": {"$exists": False}
+    }
+    candidates = _load_events_frame(events, candidate_query)
+    keyword_ids = _keyword_event_ids()
+    if keyword_ids is not None:
+        # Interseção com o índice invertido (em memória, sem $regex no banco)
+        candidates = candidates[np.isin(candidates["GlobalEventID"].to_numpy(), keyword_ids, assume_unique=True)]
+    logging.info(f"Relacionando {len(triggers)} gatilhos com {len(candidates)} candidatos ({day_label}).")
+    return match_related_events(
+        triggers, candidates, config.TIME_WINDOW_DAYS, config.GEO_DISTANCE_THRESHOLD_KM
+    )
+
+
+def _write_links(events, links, session=None):
+    # Um único bulk_write não ordenado com todos os 'related_to'
+    operations = [
+        UpdateOne({"GlobalEventID": event_id}, {"$set": {"related_to": trigger_id}})
+        for event_id, trigger_id in links.items()
+    ]
+    return events.bulk_write(operations, ordered=False, session=session)
+
+
+def find_related_events_batch(mongodb_url, db_name, events_collection, mentions_collection=None,
+                              start_day=None, end_day=None, added_since=None):
+    """
+    Versão em lote de find_related_events.
+
+    Carrega de uma vez os gatilhos (opcionalmente só os de `start_day` a
+    `end_day`) e os candidatos da janela de tempo correspondente, apenas com
+    os campos necessários, faz o casamento em memória (haversine vetorizado +
+    grade espacial) e grava todos os 'related_to' em um único bulk_write não
+    ordenado.
+
+    Args:
+        mongodb_url, db_name, events_collection, mentions_collection: Como em
+            find_related_events.
+        start_day, end_day: Limites (YYYYMMDD, inclusive) do Day dos gatilhos.
+        added_since: Só usa como gatilhos os eventos com DATEADDED >= este
+            valor (YYYYMMDDHHMMSS), ex.: apenas os de um arquivo recém-ingerido.
+
+    Returns:
+        Número de eventos relacionados gravados.
+    """
+    try:
+        db = mongo_pool.get_database(db_name, mongodb_url)
+        events = db[events_collection]
+
+        # 1. Gatilhos:
+        trigger_query = _trigger_query()
+        day_filter = {}
+        if start_day is not None:
+            day_filter["$gte"] = int(start_day)
+        if end_day is not None:
+            day_filter["$lte"] = int(end_day)
+        if day_filter:
+            trigger_query["Day"] = day_filter
+        if added_since is not None:
+            trigger_query["DATEADDED"] = {"$gte": int(added_since)}
+
+        # 2. Candidatos de toda a janela de tempo e casamento em memória:
+        links = _compute_links(events, trigger_query)
+        if not links:
+            logging.info("  Encontrados 0 eventos relacionados.")
+            return 0
+
+        # 3. Gravação em lote:
+        result = _write_links(events, links)
+        logging.info(f"  Encontrados {len(links)} eventos relacionados ({result.modified_count} atualizados).")
+        return len(links)
+
+    except Exception as e:
+        logging.error(f"Erro ao encontrar eventos relacionados (lote): {e}")
+        traceback.print_exc()
+        return 0
+
+
+def _state_collection(db):
+    return db[getattr(config, "ETL_STATE_COLLECTION_NAME", "etl_state")]
+
+
+def _supports_transactions(client):
+    # Transações só existem em replica set ou cluster shardeado
+    try:
+        return client.topology_description.topology_type_name in ("ReplicaSetWithPrimary", "Sharded")
+    except Exception:
+        return False
+
+
+def _expand_days(days, before, after):
+    """Todos os Day (YYYYMMDD) de `before` dias antes a `after` dias depois de cada dia de `days`."""
+    if not days:
+        return []
+    ordinals = _day_to_ordinal(sorted(days))
+    expanded = np.unique((ordinals[:, None] + np.arange(-before, after + 1)[None, :]).ravel())
+    return [_ordinal_to_day(ordinal) for ordinal in expanded]
+
+
+def find_related_events_incremental(mongodb_url, db_name, events_collection, mentions_collection=None,
+                                    state_key="related_events", full_rescan=False):
+    """
+    Passagem incremental de related_events, guiada por um watermark de ingestão.
+
+    Só olha os eventos gravados desde a última passagem (_ingested_at, posto
+    por events_db.write_events_data, acima do watermark salvo em
+    config.ETL_STATE_COLLECTION_NAME, padrão "etl_state") e os eventos da
+    janela de tempo dos seus dias:
+
+        - gatilhos: Day entre (dia - TIME_WINDOW_DAYS) e o dia de cada evento
+          novo (gatilhos novos e os antigos que podem relacionar eventos novos);
+        - candidatos: Day até TIME_WINDOW_DAYS antes ou depois desses dias.
+
+    O watermark é a hora da gravação, não DATEADDED: o backfill (maiores
+    arquivos primeiro) e as novas tentativas do manifesto gravam eventos fora
+    da ordem de DATEADDED, e um watermark em DATEADDED pularia para sempre os
+    eventos mais antigos que ele. Eventos gravados antes de existir
+    _ingested_at só entram com full_rescan=True.
+
+    Os dias são os distintos dos eventos novos (não o intervalo entre o menor e
+    o maior), então um evento novo com data antiga não faz a passagem varrer
+    meses de histórico. O custo é proporcional aos dados novos.
+
+    Os 'related_to' e o novo watermark são gravados juntos em uma transação
+    quando o servidor permite (replica set / sharded e
+    config.RELATED_EVENTS_TRANSACTIONS). Sem transações, os vínculos são
+    gravados antes do watermark: se o processo cair no meio, a próxima
+    passagem recalcula os mesmos vínculos ($set idempotente).
+
+    Args:
+        mongodb_url, db_name, events_collection, mentions_collection: Como em
+            find_related_events.
+        state_key: _id do documento de estado (um watermark por passagem).
+        full_rescan: Ignora o watermark e passa por todos os dias com eventos
+            (inclusive os sem _ingested_at); o watermark é atualizado no fim.
+
+    Returns:
+        Número de eventos relacionados gravados.
+    """
+    try:
+        db = mongo_pool.get_database(db_name, mongodb_url)
+        events = db[events_collection]
+        state = _state_collection(db)
+
+        doc = state.find_one({"_id": state_key}) or {}
+        since = None if full_rescan else doc.get("ingested_at")
+
+        # Limite superior fixo: eventos gravados durante a passagem ficam para a próxima
+        newest = events.find_one(
+            {"_ingested_at": {"$ne": None}}, {"_id": 0, "_ingested_at": 1}, sort=[("_ingested_at", -1)]
+        )
+        high = newest["_ingested_at"] if newest is not None else None
+        if not full_rescan and (high is None or (since is not None and high <= since)):
+            logging.info(f"Nenhum evento novo desde o watermark {since}.")
+            return 0
+
+        if full_rescan:
+            new_query = {}
+        elif since is None:
+            new_query = {"_ingested_at": {"$lte": high}}
+        else:
+            new_query = {"_ingested_at": {"$gt": since, "$lte": high}}
+        new_days = [int(day) for day in events.distinct("Day", new_query)]
+        window = config.TIME_WINDOW_DAYS
+        trigger_query = _trigger_query()
+        trigger_query["Day"] = {"$in": _expand_days(new_days, window, 0)}
+        logging.info(
+            f"Passagem {'completa' if full_rescan else 'incremental'}: gravados de {since} a {high}, "
+            f"{len(new_days)} dias."
+        )
+        links = _compute_links(events, trigger_query, candidate_days=_expand_days(new_days, window, window))
+
+        def persist(session=None):
+            if links:
+                _write_links(events, links, session=session)
+            fields = {"updated_at": datetime.datetime.utcnow(), "last_links": len(links)}
+            if high is not None:
+                fields["ingested_at"] = high
+            state.update_one({"_id": state_key}, {"$set": fields}, upsert=True, session=session)
+
+        client = db.client
+        if getattr(config, "RELATED_EVENTS_TRANSACTIONS", True) and _supports_transactions(client):
+            with client.start_session() as session:
+                session.with_transaction(persist)
+        else:
+            persist()  # Vínculos antes do watermark: refazer a passagem é idempotente
+
+        logging.info(f"  Encontrados {len(links)} eventos relacionados; watermark em {high}.")
+        return len(links)
+
+    except Exception as e:
+        logging.error(f"Erro na passagem incremental de eventos relacionados: {e}")
+        traceback.print_exc()
+        return 0
 
 # Exemplo de uso (você chamaria isso do main.py, *depois* de importar os dados):
 # find_related_events(config.MONGODB_URL, config.DB_NAME, config.EVENTS_COLLECTION_NAME, config.MENTIONS_COLLECTION_NAME)
\ No newline at end of file
@@ -0,0 +1,220 @@
+# schemas.py
+"""
+Registro central dos esquemas dos arquivos do GDELT 2.0.
+
+Para cada tipo de arquivo ('events', 'mentions', 'gkg') define os nomes das
+colunas (na ordem do arquivo), as colunas que realmente são carregadas e os
+dtypes compactos usados pelo pandas *durante* o parse. Assim as colunas
+descartadas nem chegam a ser lidas e os códigos repetitivos (CAMEO, países)
+viram categoricals em vez de objetos Python.
+
+Uso:
+    df = pd.read_csv(f, **schemas.read_csv_kwargs("events"))
+"""
+import csv
+
+# --- EVENTOS (GDELT 2.0 Event, 61 colunas) ---
+EVENTS_COLUMNS = [
+    "GlobalEventID", "Day", "MonthYear", "Year", "FractionDate",
+    "Actor1Code", "Actor1Name", "Actor1CountryCode", "Actor1KnownGroupCode",
+    "Actor1EthnicCode", "Actor1Religion1Code", "Actor1Religion2Code",
+    "Actor1Type1Code", "Actor1Type2Code", "Actor1Type3Code",
+    "Actor2Code", "Actor2Name", "Actor2CountryCode", "Actor2KnownGroupCode",
+    "Actor2EthnicCode", "Actor2Religion1Code", "Actor2Religion2Code",
+    "Actor2Type1Code", "Actor2Type2Code", "Actor2Type3Code",
+    "IsRootEvent", "EventCode", "EventBaseCode", "EventRootCode", "QuadClass",
+    "GoldsteinScale", "NumMentions", "NumSources", "NumArticles", "AvgTone",
+    "Actor1Geo_Type", "Actor1Geo_FullName", "Actor1Geo_CountryCode",
+    "Actor1Geo_ADM1Code", "Actor1Geo_ADM2Code", "Actor1Geo_Lat",
+    "Actor1Geo_Long", "Actor1Geo_FeatureID",
+    "Actor2Geo_Type", "Actor2Geo_FullName", "Actor2Geo_CountryCode",
+    "Actor2Geo_ADM1Code", "Actor2Geo_ADM2Code", "Actor2Geo_Lat",
+    "Actor2Geo_Long", "Actor2Geo_FeatureID",
+    "ActionGeo_Type", "ActionGeo_FullName", "ActionGeo_CountryCode",
+    "ActionGeo_ADM1Code", "ActionGeo_ADM2Code", "ActionGeo_Lat",
+    "ActionGeo_Long", "ActionGeo_FeatureID",
+    "DATEADDED", "SOURCEURL",
+]
+
+# Colunas gravadas no MongoDB (as demais não são nem lidas)
+EVENTS_USECOLS = [
+    "GlobalEventID", "Day", "MonthYear", "Year", "FractionDate",
+    "Actor1Code", "Actor1Name", "Actor1CountryCode", "Actor1Type1Code",
+    "Actor2Code", "Actor2Name", "Actor2CountryCode", "Actor2KnownGroupCode",
+    "Actor2EthnicCode",
+    "IsRootEvent", "EventCode", "EventBaseCode", "EventRootCode", "QuadClass",
+    "GoldsteinScale", "NumMentions", "NumSources", "NumArticles", "AvgTone",
+    "Actor1Geo_Type", "Actor1Geo_CountryCode", "Actor1Geo_ADM1Code",
+    "Actor1Geo_ADM2Code", "Actor1Geo_Lat", "Actor1Geo_Long",
+    "Actor2Geo_FullName", "Actor2Geo_CountryCode", "Actor2Geo_ADM1Code",
+    "Actor2Geo_ADM2Code", "Actor2Geo_Lat", "Actor2Geo_Long",
+    "ActionGeo_FullName", "ActionGeo_CountryCode", "ActionGeo_ADM1Code",
+    "ActionGeo_ADM2Code", "ActionGeo_Lat", "ActionGeo_Long",
+    "DATEADDED", "SOURCEURL",
+]
+
+EVENTS_DTYPES = {
+    "GlobalEventID": "int64",
+    "Day": "int32",
+    "MonthYear": "int32",
+    "Year": "int16",
+    "FractionDate": "float64",
+    "Actor1Code": "category",
+    "Actor1Name": "category",
+    "Actor1CountryCode": "category",
+    "Actor1Type1Code": "category",
+    "Actor2Code": "category",
+    "Actor2Name": "category",
+    "Actor2CountryCode": "category",
+    "Actor2KnownGroupCode": "category",
+    "Actor2EthnicCode": "category",
+    "IsRootEvent": "int8",
+    "EventCode": "category",  # Códigos CAMEO são texto ("036" != 36)
+    "EventBaseCode": "category",
+    "EventRootCode": "category",
+    "QuadClass": "int8",
+    "GoldsteinScale": "float32",
+    "NumMentions": "int32",
+    "NumSources": "int32",
+    "NumArticles": "int32",
+    "AvgTone": "float32",
+    "Actor1Geo_Type": "int8",
+    "Actor1Geo_CountryCode": "category",
+    "Actor1Geo_ADM1Code": "category",
+    "Actor1Geo_ADM2Code": "category",
+    "Actor1Geo_Lat": "float32",
+    "Actor1Geo_Long": "float32",
+    "Actor2Geo_FullName": "category",
+    "Actor2Geo_CountryCode": "category",
+    "Actor2Geo_ADM1Code": "category",
+    "Actor2Geo_ADM2Code": "category",
+    "Actor2Geo_Lat": "float32",
+    "Actor2Geo_Long": "float32",
+    "ActionGeo_FullName": "category",
+    "ActionGeo_CountryCode": "category",
+    "ActionGeo_ADM1Code": "category",
+    "ActionGeo_ADM2Code": "category",
+    "ActionGeo_Lat": "float32",
+    "ActionGeo_Long": "float32",
+    "DATEADDED": "int64",
+    "SOURCEURL": "str",
+}
+
+# --- MENÇÕES (GDELT 2.0 Mentions, 16 colunas) ---
+MENTIONS_COLUMNS = [
+    "GlobalEventID", "EventTimeDate", "MentionTimeDate", "MentionType",
+    "MentionSourceName", "MentionIdentifier", "SentenceID",
+    "Actor1CharOffset", "Actor2CharOffset", "ActionCharOffset", "InRawText",
+    "Confidence", "MentionDocLen", "MentionDocTone",
+    "MentionDocTranslationInfo", "Extras",
+]
+
+MENTIONS_USECOLS = MENTIONS_COLUMNS[:-1]  # "Extras" está sempre vazio
+
+MENTIONS_DTYPES = {
+    "GlobalEventID": "int64",
+    "EventTimeDate": "int64",
+    "MentionTimeDate": "int64",
+    "MentionType": "int8",
+    "MentionSourceName": "category",
+    "MentionIdentifier": "str",
+    "SentenceID": "int32",
+    "Actor1CharOffset": "int32",
+    "Actor2CharOffset": "int32",
+    "ActionCharOffset": "int32",
+    "InRawText": "int8",
+    "Confidence": "int16",
+    "MentionDocLen": "int32",
+    "MentionDocTone": "float32",
+    "MentionDocTranslationInfo": "category",
+}
+
+# --- GKG ---
+# V1.0 (sem header): nomes por posição. A posição 16 era sobrescrita pela 19
+# (ambas "V2_1Amounts"), então ela não é carregada.
+GKG_COLUMNS = [
+    "GKGRECORDID", "DATE", "SourceCollectionIdentifier", "SourceCommonName",
+    "DocumentIdentifier", "V2Themes", "V2Locations", "V2Persons",
+    "V2Organizations", "V1Counts", "V2Tone", "V2GCAM",
+    "V2_1EnhancedThemes", "V2_1EnhancedLocations", "V2_1EnhancedPersons",
+    "V2_1EnhancedOrganizations", "V2_1AmountsUnused", "V2_1Quotations",
+    "V2_1AllNames", "V2_1Amounts", "V2_1TranslationInfo", "Extras",
+]
+
+GKG_USECOLS = [name for name in GKG_COLUMNS if name != "V2_1AmountsUnused"]
+
+# V2.0/V2.1 (com header): nome no header -> nome gravado
+GKG_V2_RENAMES = {
+    "V2.1EnhancedThemes": "V2_1EnhancedThemes",
+    "V2.1EnhancedLocations": "V2_1EnhancedLocations",
+    "V2.1EnhancedPersons": "V2_1EnhancedPersons",
+    "V2.1EnhancedOrganizations": "V2_1EnhancedOrganizations",
+    "V2.1Amounts": "V2_1Amounts",
+    "V2.1Quotations": "V2_1Quotations",
+    "V2.1AllNames": "V2_1AllNames",
+    "V2.1TranslationInfo": "V2_1TranslationInfo",
+}
+
+GKG_DTYPES = {
+    "GKGRECORDID": "str",
+    "DATE": "int64",
+    "SourceCollectionIdentifier": "int8",
+    "SourceCommonName": "category",
+    "DocumentIdentifier": "str",
+    "V2Themes": "str",
+    "V2Locations": "str",
+    "V2Persons": "str",
+    "V2Organizations": "str",
+    "V1Counts": "str",
+    "V2Tone": "str",
+    "V2GCAM": "str",
+    "V2_1EnhancedThemes": "str",
+    "V2_1EnhancedLocations": "str",
+    "V2_1EnhancedPersons": "str",
+    "V2_1EnhancedOrganizations": "str",
+    "V2_1Quotations": "str",
+    "V2_1AllNames": "str",
+    "V2_1Amounts": "str",
+    "V2_1TranslationInfo": "category",
+    "Extras": "str",
+}
+
+SCHEMAS = {
+    "events": {"columns": EVENTS_COLUMNS, "usecols": EVENTS_USECOLS, "dtypes": EVENTS_DTYPES},
+    "mentions": {"columns": MENTIONS_COLUMNS, "usecols": MENTIONS_USECOLS, "dtypes": MENTIONS_DTYPES},
+    "gkg": {"columns": GKG_COLUMNS, "usecols": GKG_USECOLS, "dtypes": GKG_DTYPES},
+}
+
+
+def get_schema(file_type):
+    """Retorna o esquema ({'columns', 'usecols', 'dtypes'}) do tipo de arquivo."""
+    try:
+        return SCHEMAS[file_type]
+    except KeyError:
+        raise ValueError(f"Tipo de arquivo sem esquema: {file_type}")
+
+
+def read_csv_kwargs(file_type, columns=None):
+    """
+    Monta os argumentos de pd.read_csv para o tipo de arquivo.
+
+    Args:
+        file_type: 'events', 'mentions' ou 'gkg'.
+        columns: Nomes das colunas na ordem do arquivo, quando diferem do
+            esquema (ex.: GKG V2 lido a partir do header).
+
+    Returns:
+        Dicionário com sep, header, names, usecols, dtype e quoting.
+    """
+    schema = get_schema(file_type)
+    names = list(columns or schema["columns"])
+    wanted = set(schema["usecols"])
+    usecols = [name for name in names if name in wanted]
+    return {
+        "sep": "\t",
+        "header": None,
+        "names": names,
+        "usecols": usecols,
+        "dtype": {name: dtype for name, dtype in schema["dtypes"].items() if name in wanted},
+        "quoting": csv.QUOTE_NONE,  # O GDELT não usa aspas como delimitador de campo
+    }
@@ -0,0 +1,245 @@
+# sinks.py
+"""
+Destinos de gravação (sinks) dos DataFrames lidos pelos loaders.
+
+Os loaders não gravam mais direto no MongoDB: chamam sinks.begin(tipo, url) uma
+vez por arquivo e sinks.write(tipo, df, url, part) para cada DataFrame (o GKG
+chega em blocos numerados a partir de 0), que repassam para cada sink
+configurado em config.SINKS.
+
+    "mongo"   -> MongoSink: usa o writer do MongoDB de cada loader
+                 (events_db.write_events_data etc., registrados com
+                 register_mongo_writer)
+    "parquet" -> ParquetSink: arquivos Parquet particionados por stream e dia,
+                 para varreduras analíticas (só as colunas necessárias, com
+                 predicate pushdown). Requer o pacote pyarrow.
+
+Layout do ParquetSink (partição no estilo Hive, legível por
+pyarrow.dataset.dataset(caminho, partitioning="hive")):
+
+    <PARQUET_DIR>/events/Day=20150218/20150218224500.translation.export-0.parquet
+    <PARQUET_DIR>/mentions/Day=20150218/...   (dia de MentionTimeDate)
+    <PARQUET_DIR>/gkg/Day=20150218/...        (dia de DATE)
+
+As colunas de código (categoricals do schemas.py) são gravadas com dictionary
+encoding e cada row group tem estatísticas (min/max, nulos). O nome do arquivo
+vem da URL de origem e begin() apaga as partes antigas do arquivo antes da
+primeira gravação, então reprocessar um arquivo (no mesmo processo ou não)
+substitui as partes em vez de somar novas.
+
+Configurações (opcionais em config.py):
+    SINKS                    -> lista de sinks (padrão: ["mongo"])
+    PARQUET_DIR              -> diretório raiz (padrão: parquet/ ao lado deste arquivo)
+    PARQUET_COMPRESSION      -> codec (padrão: "zstd")
+    PARQUET_ROW_GROUP_SIZE   -> linhas por row group (padrão: 100000)
+"""
+import glob
+import logging
+import os
+import re
+import threading
+import traceback
+
+import config
+import schemas
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow é opcional (só o ParquetSink precisa)
+    pa = pq = None
+
+_mongo_writers = {}  # tipo de arquivo -> função (df, url) -> linhas ou None
+
+
+def register_mongo_writer(file_type, writer):
+    """Registra a função de gravação no MongoDB de um loader."""
+    _mongo_writers[file_type] = writer
+    return writer
+
+
+class Sink:
+    """Interface dos sinks: write() retorna o número de linhas gravadas ou None em erro."""
+
+    name = None
+
+    def begin(self, file_type, url):
+        """Chamado antes do primeiro write() de um arquivo; retorna False em erro."""
+        return True
+
+    def write(self, file_type, df, url, part=0):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class MongoSink(Sink):
+    """Grava no MongoDB com o writer registrado pelo loader do tipo de arquivo."""
+
+    name = "mongo"
+
+    def write(self, file_type, df, url, part=0):
+        writer = _mongo_writers.get(file_type)
+        if writer is None:
+            logging.error(f"Nenhum writer do MongoDB registrado para '{file_type}' ({url}).")
+            return None
+        return writer(df, url)
+
+
+# Coluna (ou função do DataFrame) que define o dia da partição de cada stream
+_PARTITION_DAY = {
+    "events": lambda df: df["Day"],
+    "mentions": lambda df: df["MentionTimeDate"] // 1000000,
+    "gkg": lambda df: df["DATE"] // 1000000,
+}
+
+
+class ParquetSink(Sink):
+    """Arquivos Parquet particionados por stream e dia (Day=YYYYMMDD)."""
+
+    name = "parquet"
+
+    def __init__(self, root=None, compression=None, row_group_size=None):
+        if pa is None:
+            raise RuntimeError("O sink 'parquet' requer o pacote pyarrow (pip install pyarrow).")
+        self.root = root or getattr(config, "PARQUET_DIR", None) or os.path.join(
+            os.path.dirname(os.path.abspath(__file__)), "parquet"
+        )
+        self.compression = compression or getattr(config, "PARQUET_COMPRESSION", "zstd")
+        self.row_group_size = row_group_size or getattr(config, "PARQUET_ROW_GROUP_SIZE", 100000)
+
+    @staticmethod
+    def _stem(url):
+        return os.path.basename(url).split(".zip")[0].removesuffix(".CSV").removesuffix(".csv")
+
+    def begin(self, file_type, url):
+        """Apaga as partes (<stem>-N.parquet, em todos os dias) de uma gravação anterior do arquivo."""
+        try:
+            stem = self._stem(url)
+            part_name = re.compile(re.escape(stem) + r"-\d+\.parquet")
+            pattern = os.path.join(
+                glob.escape(os.path.join(self.root, file_type)), "Day=*", glob.escape(stem) + "-*.parquet"
+            )
+            removed = 0
+            for path in glob.glob(pattern):
+                if part_name.fullmatch(os.path.basename(path)):
+                    os.remove(path)
+                    removed += 1
+            if removed:
+                logging.info(f"Parquet de {url}: {removed} partes antigas removidas.")
+            return True
+
+        except Exception as e:
+            logging.error(f"Erro ao remover partes Parquet antigas de {url}: {e}")
+            traceback.print_exc()
+            return False
+
+    @staticmethod
+    def _code_columns(file_type, df):
+        dtypes = schemas.get_schema(file_type)["dtypes"]
+        return [name for name in df.columns if dtypes.get(name) == "category"]
+
+    @staticmethod
+    def _to_table(df):
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if "GCAM" in df.columns:
+            # Mapa com milhares de chaves possíveis: map<string, double> em vez de struct
+            gcam = pa.array(
+                [list(value.items()) if isinstance(value, dict) else None for value in df["GCAM"]],
+                type=pa.map_(pa.string(), pa.float64()),
+            )
+            table = table.set_column(table.schema.get_field_index("GCAM"), "GCAM", gcam)
+        return table
+
+    def write(self, file_type, df, url, part=0):
+        try:
+            if df.empty:
+                return 0
+            days = _PARTITION_DAY[file_type](df).astype("int64")
+            stem = self._stem(url)
+            code_columns = self._code_columns(file_type, df)
+
+            for day, frame in df.groupby(days.to_numpy(), sort=True):
+                if file_type == "events":
+                    frame = frame.drop(columns=["Day"])  # Vem do nome da partição
+                directory = os.path.join(self.root, file_type, f"Day={day}")
+                os.makedirs(directory, exist_ok=True)
+                path = os.path.join(directory, f"{stem}-{part}.parquet")
+                tmp_path = path + ".tmp"
+                pq.write_table(
+                    self._to_table(frame),
+                    tmp_path,
+                    compression=self.compression,
+                    row_group_size=self.row_group_size,
+                    use_dictionary=[name for name in code_columns if name in frame.columns] or False,
+                    write_statistics=True,
+                )
+                os.replace(tmp_path, path)
+
+            logging.info(f"Parquet de {url}: {len(df)} linhas gravadas em {self.root}/{file_type}.")
+            return len(df)
+
+        except Exception as e:
+            logging.error(f"Erro ao gravar Parquet de {url}: {e}")
+            traceback.print_exc()
+            return None
+
+
+SINK_TYPES = {
+    "mongo": MongoSink,
+    "parquet": ParquetSink,
+}
+
+_sinks = None
+_sinks_lock = threading.Lock()
+
+
+def get_sinks():
+    """Sinks configurados em config.SINKS (criados uma vez por processo)."""
+    global _sinks
+    with _sinks_lock:
+        if _sinks is None:
+            names = getattr(config, "SINKS", None) or ["mongo"]
+            unknown = [name for name in names if name not in SINK_TYPES]
+            if unknown:
+                raise ValueError(f"Sinks desconhecidos: {unknown} (opções: {', '.join(SINK_TYPES)})")
+            _sinks = [SINK_TYPES[name]() for name in names]
+        return _sinks
+
+
+def begin(file_type, url):
+    """
+    Prepara os sinks para gravar um arquivo (ex.: remove as partes Parquet de
+    uma gravação anterior). Deve ser chamado antes do primeiro write() do
+    arquivo; retorna False se algum sink falhar.
+    """
+    return all(sink.begin(file_type, url) for sink in get_sinks())
+
+
+def write(file_type, df, url, part=0):
+    """
+    Grava o DataFrame em todos os sinks configurados.
+
+    `part` numera os blocos de um mesmo arquivo (0, 1, ...).
+
+    Retorna o número de linhas gravadas (do primeiro sink), ou None se algum
+    sink falhar.
+    """
+    written = None
+    for sink in get_sinks():
+        rows = sink.write(file_type, df, url, part)
+        if rows is None:
+            return None
+        if written is None:
+            written = rows
+    return written
+
+
+def close_sinks():
+    """Fecha os sinks abertos (ex.: no fim do processamento)."""
+    global _sinks
+    with _sinks_lock:
+        for sink in _sinks or []:
+            sink.close()
+        _sinks = None
@@ -1,5 +1,6 @@
 from pymongo import MongoClient
 import config  # Use o seu arquivo config.py
+import db_indexes
 
 client = MongoClient(config.MONGODB_URL)
 db = client[config.DB_NAME]
@@ -10,4 +11,7 @@ db.create_collection(config.EVENTS_COLLECTION_NAME)
 db.create_collection(config.MENTIONS_COLLECTION_NAME)
 db.create_collection(config.GKG_COLLECTION_NAME)
 
+# Índices (GlobalEventID único, Day, EventRootCode, loc 2dsphere, menções, GKGRECORDID único):
+db_indexes.ensure_indexes(db)
+
 client.close()
\ No newline at end of file
@@ -1,9 +1,160 @@
 # url_processing.py
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
 import logging
+import threading
 import traceback
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlsplit
 import config  # Importa as configurações
+import article_cache
+import html_extraction
+import keyword_index
+
+# --- Download concorrente ---
+# Configurações (opcionais em config.py):
+#   FETCH_MAX_WORKERS  -> downloads simultâneos no total (padrão: 32)
+#   FETCH_MAX_PER_HOST -> downloads simultâneos por host (padrão: 4)
+# O texto extraído fica no cache local de artigos (ver article_cache.py) e a
+# extração do HTML roda em um pool de processos (ver html_extraction.py).
+# extract_content_from_urls também alimenta o índice invertido de palavras
+# (ver keyword_index.py).
+
+_session = None
+_session_lock = threading.Lock()
+_host_semaphores = defaultdict(lambda: threading.BoundedSemaphore(getattr(config, "FETCH_MAX_PER_HOST", 4)))
+_host_lock = threading.Lock()
+
+
+def _get_session():
+    """Sessão HTTP compartilhada (keep-alive), com pool do tamanho do número de workers."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            workers = getattr(config, "FETCH_MAX_WORKERS", 32)
+            adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+            _session = requests.Session()
+            _session.mount("http://", adapter)
+            _session.mount("https://", adapter)
+        return _session
+
+
+def _host_semaphore(url):
+    with _host_lock:
+        return _host_semaphores[urlsplit(url).netloc.lower()]
+
+
+def extract_text(html, extractor=None):
+    """Extrai o texto dos parágrafos (<p>) de uma página HTML (no processo atual)."""
+    return html_extraction.extract(html, html_extraction.get_extractor_name(extractor))
+
+
+def _download(url):
+    """
+    Baixa uma página, consultando antes o cache de artigos.
+
+    Returns:
+        (texto, None) se o cache respondeu (entrada fresca ou revalidada com 304),
+        (None, resposta) se a página foi baixada e precisa ser extraída,
+        (None, None) em caso de erro.
+    """
+    cache = article_cache.get_cache()
+    cached = cache.get(url) if cache is not None else None
+    if cached is not None and cached.is_fresh(cache.ttl):
+        return cached.text, None  # Acerto no cache: nenhum acesso à rede
+
+    try:
+        headers = cached.conditional_headers() if cached is not None else None
+        with _host_semaphore(url):  # Limite de conexões simultâneas por host
+            article_response = _get_session().get(url, headers=headers, timeout=config.REQUEST_TIMEOUT)
+
+        if article_response.status_code == 304 and cached is not None:
+            # Página não mudou desde o último download: reaproveita o texto
+            cache.count_revalidated()
+            cache.touch(cached)
+            logging.debug("Conteúdo revalidado (304): %s", url)
+            return cached.text, None
+
+        if cached is not None:
+            cache.count_miss()  # Entrada antiga e página alterada: baixada de novo
+        article_response.raise_for_status()
+        return None, article_response
+
+    except requests.exceptions.RequestException as e:
+        logging.warning(f"Erro ao baixar URL {url}: {e}")
+
+    except Exception as e:
+        logging.error(f"Erro ao processar URL {url}: {e}")
+        traceback.print_exc()
+
+    return None, None
+
+
+def fetch_contents(urls):
+    """
+    Baixa e extrai o texto de várias URLs em paralelo.
+
+    As URLs são deduplicadas antes do download (cada artigo é baixado uma
+    única vez), artigos já presentes no cache local não são baixados de novo
+    (ou são apenas revalidados), o total de downloads simultâneos é limitado
+    por config.FETCH_MAX_WORKERS e, por host, por config.FETCH_MAX_PER_HOST.
+    Cada página baixada segue direto para o pool de extração
+    (config.EXTRACT_WORKERS processos, extrator config.HTML_EXTRACTOR).
+
+    Args:
+        urls: Iterável de URLs (pode conter repetições e valores vazios).
+
+    Returns:
+        Dicionário {url: texto extraído}; URLs com erro ficam de fora.
+    """
+    unique_urls = list(dict.fromkeys(url for url in urls if isinstance(url, str) and url))
+    if not unique_urls:
+        return {}
+
+    cache = article_cache.get_cache()
+    extractor = html_extraction.get_extractor_name()
+    extract_executor = html_extraction.get_executor()
+    contents = {}
+    extracting = {}  # futuro da extração -> (url, etag, last_modified)
+
+    workers = min(getattr(config, "FETCH_MAX_WORKERS", 32), len(unique_urls))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fetch") as executor:
+        downloads = {executor.submit(_download, url): url for url in unique_urls}
+        for future in as_completed(downloads):
+            url = downloads[future]
+            text, response = future.result()
+            if text is not None:
+                contents[url] = text
+            elif response is not None:
+                # A extração começa assim que a página chega, enquanto os downloads continuam;
+                # da resposta só ficam os cabeçalhos de validação (a conexão volta ao pool)
+                future = extract_executor.submit(html_extraction.extract, response.content, extractor)
+                extracting[future] = (url, response.headers.get("ETag"), response.headers.get("Last-Modified"))
+                response.close()
+
+    for future in as_completed(extracting):
+        url, etag, last_modified = extracting.pop(future)
+        try:
+            text = future.result()
+        except Exception as e:
+            logging.error(f"Erro ao extrair o texto de {url}: {e}")
+            traceback.print_exc()
+            continue
+        contents[url] = text
+        logging.debug("Conteúdo extraído de: %s", url)
+        if cache is not None:
+            cache.put(url, text, etag=etag, last_modified=last_modified)
+
+    if cache is not None:
+        cache.maybe_evict()  # Varre o diretório só acima do limite ou a cada ARTICLE_CACHE_EVICT_INTERVAL
+        stats = cache.stats()
+        logging.info(
+            f"Cache de artigos: {stats['hits']} acertos, {stats['misses']} faltas, "
+            f"{stats['revalidated']} revalidados (taxa de acerto {stats['hit_ratio']:.1%})."
+        )
+    return contents
+
 
 def extract_content_from_urls(df):
     """
@@ -17,31 +168,19 @@ def extract_content_from_urls(df):
         DataFrame com uma coluna adicional 'article_content' contendo o texto
         extraído (ou string vazia em caso de erro).  O DataFrame original
         NÃO é modificado.
+
+    Se o DataFrame tiver GlobalEventID, os termos dos artigos entram no
+    índice de palavras (keyword_index) usado pelo filtro de config.KEYWORDS.
     """
 
     df_copy = df.copy()  # Cria uma CÓPIA do DataFrame
-    df_copy["article_content"] = ""  # Nova coluna para o conteúdo
-    success_count = 0  # Contador de sucessos
-
-    for index, row in df_copy.iterrows():  # Itera sobre a CÓPIA
-        try:
-            article_response = requests.get(row["SOURCEURL"], timeout=config.REQUEST_TIMEOUT)
-            article_response.raise_for_status()
-            soup = BeautifulSoup(article_response.content, "html.parser")
-            # Extrai o texto (método simples, pode precisar de ajustes)
-            text = " ".join([p.text for p in soup.find_all("p")])
-            df_copy.at[index, "article_content"] = text  # Modifica a CÓPIA
-            success_count += 1
-            logging.debug(f"Conteúdo extraído de: {row['SOURCEURL']}")
-
-        except requests.exceptions.RequestException as e:
-            logging.warning(f"Erro ao baixar URL {row['SOURCEURL']}: {e}")
-            df_copy.at[index, "article_content"] = ""  # Define como vazio na CÓPIA
-
-        except Exception as e:
-            logging.error(f"Erro ao processar URL {row['SOURCEURL']}: {e}")
-            traceback.print_exc()
-            df_copy.at[index, "article_content"] = ""  # Define como vazio na CÓPIA
+    contents = fetch_contents(df_copy["SOURCEURL"])  # Cada URL distinta é baixada uma vez
+    df_copy["article_content"] = df_copy["SOURCEURL"].map(contents).fillna("")
+    success_count = int(df_copy["SOURCEURL"].isin(contents.keys()).sum())  # Contador de sucessos
 
-    logging.info(f"Conteúdo extraído de {success_count} URLs (de um total de {len(df_copy)}).")
-    return df_copy  # Retorna a CÓPIA modificada
\ No newline at end of file
+    logging.info(
+        f"Conteúdo extraído de {success_count} URLs (de um total de {len(df_copy)}, "
+        f"{len(contents)} artigos distintos)."
+    )
+    keyword_index.index_articles(contents, df_copy)
+    return df_copy  # Retorna a CÓPIA modificada
@@ -1,22 +1,79 @@
 # utils.py
+import io
+import json
 import logging
+import logging.handlers
+import os
+import config
+
+# Atributos padrão de um LogRecord (o resto veio de extra={...})
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+
+class JsonFormatter(logging.Formatter):
+    """Uma linha JSON por registro; os campos passados em extra={...} entram no objeto."""
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        for name, value in record.__dict__.items():
+            if name not in _RECORD_ATTRS and not name.startswith("_"):
+                entry[name] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
 
 def setup_logging(log_file):
-    """Configura o logging para gravar em arquivo e no console."""
+    """
+    Configura o logging para gravar em arquivo e no console.
+
+    O arquivo é rotativo (não apaga o log da execução anterior) e, por padrão,
+    tem uma linha JSON por registro; o console continua em texto.
+
+    Configurações (opcionais em config.py):
+        LOG_LEVEL         -> nível do log (padrão: "INFO")
+        LOG_JSON          -> arquivo em JSON (padrão: True)
+        LOG_MAX_BYTES     -> tamanho de cada arquivo antes de rotacionar (padrão: 50 MB)
+        LOG_BACKUP_COUNT  -> arquivos antigos mantidos (padrão: 5)
+    """
+    text_format = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")  # Formato
+    file_handler = logging.handlers.RotatingFileHandler(
+        log_file,
+        maxBytes=getattr(config, "LOG_MAX_BYTES", 50 * 1024 * 1024),
+        backupCount=getattr(config, "LOG_BACKUP_COUNT", 5),
+        encoding="utf-8",
+    )
+    file_handler.setFormatter(JsonFormatter() if getattr(config, "LOG_JSON", True) else text_format)
+    console_handler = logging.StreamHandler()  # Exibe no console
+    console_handler.setFormatter(text_format)
     logging.basicConfig(
-        level=logging.INFO,  # Nível de log: INFO, WARNING, ERROR, DEBUG
-        format="%(asctime)s - %(levelname)s - %(message)s",  # Formato
-        handlers=[
-            logging.FileHandler(log_file, mode='w'),  # Grava em arquivo ('w' sobrescreve)
-            logging.StreamHandler()  # Exibe no console
-        ]
+        level=getattr(config, "LOG_LEVEL", "INFO"),  # Nível de log: INFO, WARNING, ERROR, DEBUG
+        handlers=[file_handler, console_handler],
     )
 
+
+def content_size(file_content):
+    """Tamanho em bytes de um arquivo baixado (BytesIO, bytes ou caminho); 0 se desconhecido."""
+    if isinstance(file_content, io.BytesIO):
+        return file_content.getbuffer().nbytes
+    if isinstance(file_content, (bytes, bytearray)):
+        return len(file_content)
+    if isinstance(file_content, (str, os.PathLike)) and os.path.exists(file_content):
+        return os.path.getsize(file_content)
+    return 0
+
 # --- Exemplo de uso (em outros arquivos, como main.py) ---
 # import utils
 # import config
 # utils.setup_logging(config.LOG_FILE)  # Configura o logging no início do script
 # logging.info("Mensagem informativa")
+# logging.info("Arquivo gravado: %s", url, extra={"rows": 649})  # Campos extras vão para o JSON
 # logging.warning("Aviso!")
 # logging.error("Erro!")
-# logging.debug("Mensagem de debug (só aparece se o nível for DEBUG)")
\ No newline at end of file
+# logging.debug("Linha %d: %s", numero, linha)  # Formatação só acontece se o nível for DEBUG